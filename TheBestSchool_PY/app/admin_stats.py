@@ -0,0 +1,107 @@
+# app/admin_stats.py - статистика админ-панели с кэшированным снимком
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+USER_TYPES = ("admin", "teacher", "apprentice", "moderator")
+
+# Максимальный возраст снимка статистики в секундах (0 - всегда считать заново)
+ADMIN_STATS_MAX_AGE = float(os.getenv("ADMIN_STATS_MAX_AGE", "30"))
+
+
+async def compute_admin_stats(db: AsyncSession) -> Dict[str, Any]:
+    """Подсчет статистики двумя запросами с условными агрегатами (FILTER)"""
+    # 1. Пользователи: все счетчики за один проход по таблице
+    users_row = (await db.execute(
+        select(
+            *[
+                func.count(models.User.id).filter(models.User.type == user_type).label(user_type)
+                for user_type in USER_TYPES
+            ],
+            func.count(models.User.id).filter(models.User.active == True).label("active"),
+        )
+    )).one()
+    user_type_counts = {user_type: getattr(users_row, user_type) or 0 for user_type in USER_TYPES}
+    active_users = users_row.active or 0
+
+    # 2. Курсы по категориям + общее число зачислений
+    total_enrollments = select(func.count(models.UserCourseProgress.id)).scalar_subquery()
+    categories_result = await db.execute(
+        select(
+            models.Course.category,
+            func.count(models.Course.id).label("total"),
+            func.count(models.Course.id).filter(models.Course.is_public == True).label("public"),
+            total_enrollments.label("enrollments"),
+        )
+        .group_by(models.Course.category)
+    )
+
+    category_counts = {}
+    total_courses = 0
+    public_courses = 0
+    # Зачислений без курсов быть не может, поэтому при пустом каталоге это 0
+    enrollments = 0
+    for row in categories_result.all():
+        category_counts[row.category] = row.total
+        total_courses += row.total
+        public_courses += row.public
+        enrollments = row.enrollments or 0
+
+    total_users = sum(user_type_counts.values())
+    return {
+        "users": {
+            "total": total_users,
+            "by_type": user_type_counts,
+            "active": active_users,
+            "inactive": total_users - active_users
+        },
+        "courses": {
+            "total": total_courses,
+            "public": public_courses,
+            "private": total_courses - public_courses,
+            "by_category": category_counts
+        },
+        "enrollments": {
+            "total": enrollments,
+            "average_per_course": round(enrollments / total_courses, 2) if total_courses > 0 else 0
+        },
+        "generated_at": datetime.now().isoformat(),
+    }
+
+
+class StatsSnapshot:
+    """Снимок статистики в памяти процесса с ограничением устаревания"""
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self._value: Optional[Dict[str, Any]] = None
+        self._computed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._value is not None and time.monotonic() - self._computed_at < self.max_age
+
+    async def get(self, db: AsyncSession, force: bool = False) -> Dict[str, Any]:
+        if not force and self._is_fresh():
+            return self._value
+
+        # Одновременные запросы ждут один пересчет вместо того, чтобы нагружать БД
+        async with self._lock:
+            if not force and self._is_fresh():
+                return self._value
+            self._value = await compute_admin_stats(db)
+            self._computed_at = time.monotonic()
+            return self._value
+
+    def invalidate(self):
+        self._value = None
+
+
+admin_stats_snapshot = StatsSnapshot(ADMIN_STATS_MAX_AGE)
@@ -2,13 +2,16 @@
 from datetime import datetime, timedelta
 from typing import Optional, Annotated
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 import os
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from database import get_db
 import models
+from principal_cache import Principal, principal_cache
+from passwords import pwd_context, hash_password, verify_and_update
+from refresh_tokens import revoked_families
 from uuid import UUID
 from jose.exceptions import ExpiredSignatureError
 
@@ -17,25 +20,15 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Контекст для хэширования паролей
-pwd_context = CryptContext(
-    schemes=["argon2"],
-    argon2__time_cost=2,
-    argon2__memory_cost=102400,
-    argon2__parallelism=8,
-    argon2__hash_len=32,
-    argon2__salt_len=16,
-    deprecated="auto"
-)
-
+# Хэширование паролей - passwords.py (в обработчиках - password_hasher, без блокировки цикла)
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Упрощенная проверка пароля"""
-    print(f"DEBUG: Проверка пароля '{plain_password}' == '{hashed_password}'")
-    return plain_password == hashed_password
+    """Синхронная проверка пароля (argon2, bcrypt или старый открытый текст)"""
+    ok, _ = verify_and_update(plain_password, hashed_password)
+    return ok
 
 def get_password_hash(password: str) -> str:
-    """Возвращаем пароль как есть"""
-    return password
+    """Синхронное хэширование пароля argon2"""
+    return hash_password(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Создание JWT токена"""
@@ -44,63 +37,127 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_user_access_token(user: models.User, family_id=None) -> str:
+    """
+    Токен пользователя с ролью и активностью в claims - для проверки прав без запроса к БД.
+    family_id - цепочка refresh-токенов: при ее отзыве access-токен тоже перестает действовать.
+    """
+    claims = {
+        "sub": str(user.id),
+        "type": user.type,
+        "active": user.active is not False,
+    }
+    if family_id is not None:
+        claims["fam"] = str(family_id)
+    return create_access_token(claims)
+
 # Схема для аутентификации
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
 
-async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)],
-    db: AsyncSession = Depends(get_db)
-) -> models.User:
-    """Получить текущего пользователя из токена"""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+# Цепочка зависимостей авторизации. FastAPI вызывает каждую зависимость один раз
+# за запрос, поэтому токен декодируется и пользователь загружается однократно,
+# сколько бы зависимостей (require_role, get_current_user, ...) его ни запрашивали,
+# а сессия БД у всего запроса одна - database.get_db.
+async def get_token_payload(
+    token: Annotated[Optional[str], Depends(oauth2_scheme)]
+) -> Optional[dict]:
+    """Содержимое JWT или None, если токена нет или он недействителен"""
     if not token:
-        raise credentials_exception
-    
+        return None
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = await db.get(models.User, UUID(user_id))
-    if user is None:
-        raise credentials_exception
-    
-    return user
+    except (JWTError, ExpiredSignatureError):
+        return None
+    if payload.get("fam") in revoked_families:
+        return None
+    return payload
+
+def token_subject(headers) -> Optional[str]:
+    """
+    Пользователь из заголовка Authorization без обращения к БД - ключ для лимитов
+    до разбора запроса (uploads.UploadGuardMiddleware). Права проверяются позже.
+    """
+    scheme, _, token = (headers.get("authorization") or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except (JWTError, ExpiredSignatureError):
+        return None
+
+def _token_user_id(payload: Optional[dict]) -> Optional[UUID]:
+    if not payload or not payload.get("sub"):
+        return None
+    try:
+        return UUID(payload["sub"])
+    except ValueError:
+        return None
 
 async def get_current_user_optional(
-    token: Annotated[str, Depends(oauth2_scheme)] = None,
+    payload: Optional[dict] = Depends(get_token_payload),
     db: AsyncSession = Depends(get_db)
 ) -> Optional[models.User]:
     """Получить текущего пользователя или None если не авторизован"""
-    if not token:
+    user_id = _token_user_id(payload)
+    if user_id is None:
         return None
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            return None
-    except (JWTError, ExpiredSignatureError):
-        return None
-    
-    user = await db.get(models.User, UUID(user_id))
+    user = await db.get(models.User, user_id)
+    if user is not None:
+        principal_cache.put(Principal(id=user.id, type=user.type, active=user.active is not False))
+    return user
+
+async def get_current_user(
+    user: Optional[models.User] = Depends(get_current_user_optional)
+) -> models.User:
+    """Получить текущего пользователя из токена"""
+    if user is None:
+        raise _credentials_exception()
     return user
 
+async def get_current_principal(
+    payload: Optional[dict] = Depends(get_token_payload),
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
+    """
+    Роль и активность текущего пользователя без загрузки строки users:
+    из кэша, из claims токена или (если ни то, ни другое) одним узким запросом.
+    """
+    user_id = _token_user_id(payload)
+    if user_id is None:
+        raise _credentials_exception()
+
+    principal = principal_cache.get(user_id) or principal_cache.from_claims(user_id, payload)
+    if principal is None:
+        row = (await db.execute(
+            select(models.User.id, models.User.type, models.User.active)
+            .where(models.User.id == user_id)
+        )).one_or_none()
+        if row is None:
+            raise _credentials_exception()
+        principal = Principal(id=row.id, type=row.type, active=row.active is not False)
+        principal_cache.put(principal)
+
+    if not principal.active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Пользователь деактивирован"
+        )
+    return principal
+
 def require_role(required_role: str):
-    """Зависимость для проверки роли пользователя"""
-    async def role_checker(current_user: models.User = Depends(get_current_user)):
+    """Зависимость для проверки роли пользователя (возвращает Principal: id, type, active)"""
+    async def role_checker(current_user: Principal = Depends(get_current_principal)):
         if current_user.type != required_role:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -110,8 +167,8 @@ def require_role(required_role: str):
     return role_checker
 
 def require_roles(required_roles: list):
-    """Зависимость для проверки нескольких ролей"""
-    async def roles_checker(current_user: models.User = Depends(get_current_user)):
+    """Зависимость для проверки нескольких ролей (возвращает Principal: id, type, active)"""
+    async def roles_checker(current_user: Principal = Depends(get_current_principal)):
         if current_user.type not in required_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
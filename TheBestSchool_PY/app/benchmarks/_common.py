@@ -0,0 +1,50 @@
+"""
+Общие помощники для бенчмарков: изолированная сессия и замер времени
+"""
+
+import os
+import sys
+import time
+import statistics
+from contextlib import asynccontextmanager
+
+# Добавляем путь к приложению
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import create_engine
+
+
+@asynccontextmanager
+async def rollback_session():
+    """Сессия внутри внешней транзакции, которая откатывается в конце - база остается чистой"""
+    engine = create_engine("bench")
+    try:
+        async with engine.connect() as conn:
+            trans = await conn.begin()
+            session = AsyncSession(bind=conn, expire_on_commit=False, join_transaction_mode="create_savepoint")
+            try:
+                yield session
+            finally:
+                await session.close()
+                await trans.rollback()
+    finally:
+        await engine.dispose()
+
+
+async def measure(label: str, fn, repeat: int = 20) -> dict:
+    """Выполняет корутину fn() repeat раз и печатает p50/p99 в миллисекундах"""
+    await fn()  # прогрев
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    report = {
+        "p50": statistics.median(timings),
+        "p99": timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+    }
+    print(f"⏱  {label:<45} p50={report['p50']:8.2f} мс  p99={report['p99']:8.2f} мс")
+    return report
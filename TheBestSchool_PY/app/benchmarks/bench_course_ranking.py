@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк ранжирования BM25 (course_ranking): 50000 курсов в памяти.
+Печатает время построения матрицы, холодной загрузки с диска (mmap) и
+p50/p99 запроса в сравнении с индексом ключевых слов (course_recommender),
+а также пакет вакансий за один проход (rank_many/recommend_many) против цикла.
+
+Запуск (из каталога app):
+    python benchmarks/bench_course_ranking.py
+    BENCH_COURSES=200000 python benchmarks/bench_course_ranking.py
+"""
+
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import time
+import uuid
+from types import SimpleNamespace
+
+from _common import measure
+from course_ranking import QUERY_TITLE_WEIGHT, CourseMatrix
+from course_recommender import CourseIndex, extract_keywords
+
+COURSES = int(os.getenv("BENCH_COURSES", "50000"))
+BATCH = int(os.getenv("BENCH_BATCH", "48"))
+WORDS = (
+    "python", "javascript", "react", "backend", "frontend", "devops", "аналитика",
+    "данных", "программирование", "тестирования", "дизайн", "маркетинга", "управление",
+    "проектами", "машинное", "обучение", "сети", "безопасности", "облачные", "kubernetes",
+    "finance", "budgeting", "legal", "contracts", "seo", "content", "mining", "clinical",
+)
+CATEGORY_NAMES = ("IT", "Финансы", "Маркетинг", "Дизайн", "Управление")
+QUERIES = (
+    ("Python backend developer", "Разработка сервисов на python, работа с базами данных, docker, kubernetes"),
+    ("Аналитик данных", "SQL, python, визуализация данных, машинное обучение, A/B тесты"),
+    ("Менеджер проектов", "Управление проектами, бюджетирование, работа с командой"),
+)
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def generate_courses():
+    rng = random.Random(42)
+    return [
+        SimpleNamespace(
+            id=uuid.uuid4(),
+            name=f"{_text(rng, 3).capitalize()} {i}",
+            description=_text(rng, 60),
+            category="it",
+            category_name=rng.choice(CATEGORY_NAMES),
+            category_color="#1A535C",
+            duration="",
+            is_public=True,
+        )
+        for i in range(COURSES)
+    ]
+
+
+async def main():
+    print(f"🌱 Генерация: {COURSES} курсов...")
+    courses = generate_courses()
+    root = tempfile.mkdtemp(prefix="bench_ranking_")
+    try:
+        started = time.perf_counter()
+        matrix = CourseMatrix.build("bench", courses)
+        print(f"🏗  Построение матрицы: {(time.perf_counter() - started) * 1000:.0f} мс, "
+              f"{len(matrix.terms)} термов, {len(matrix.rows)} ненулевых весов")
+
+        started = time.perf_counter()
+        matrix.save(root)
+        print(f"💾 Сохранение: {(time.perf_counter() - started) * 1000:.0f} мс")
+
+        started = time.perf_counter()
+        matrix = CourseMatrix.load(root, "bench")
+        print(f"❄️  Холодная загрузка (mmap): {(time.perf_counter() - started) * 1000:.2f} мс")
+
+        index = CourseIndex()
+        index.rebuild(courses)
+
+        for title, description in QUERIES:
+            query = [(title, QUERY_TITLE_WEIGHT), (description, 1.0)]
+
+            async def run_bm25(query=query):
+                matrix.rank(query, limit=5)
+
+            async def run_keywords(title=title):
+                index.recommend(extract_keywords(title), limit=5)
+
+            total, _ = matrix.rank(query, limit=5)
+            await measure(f"bm25     '{title}' ({total} курсов)", run_bm25)
+            await measure(f"keywords '{title}'", run_keywords)
+
+        # Пакет из BATCH вакансий (как /analyze/batch): один проход против цикла по одной
+        batch = [[(title, QUERY_TITLE_WEIGHT), (description, 1.0)] for title, description in QUERIES] * (BATCH // len(QUERIES))
+        keyword_batch = [extract_keywords(query[0][0]) for query in batch]
+
+        async def run_bm25_loop():
+            for query in batch:
+                matrix.rank(query, limit=5)
+
+        async def run_bm25_batch():
+            matrix.rank_many(batch, limit=5)
+
+        async def run_keywords_loop():
+            for keywords in keyword_batch:
+                index.recommend(keywords, limit=5)
+
+        async def run_keywords_batch():
+            index.recommend_many(keyword_batch, limit=5)
+
+        await measure(f"bm25     {len(batch)} вакансий по одной", run_bm25_loop, repeat=5)
+        await measure(f"bm25     {len(batch)} вакансий пакетом", run_bm25_batch, repeat=5)
+        await measure(f"keywords {len(batch)} вакансий по одной", run_keywords_loop, repeat=5)
+        await measure(f"keywords {len(batch)} вакансий пакетом", run_keywords_batch, repeat=5)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    print("🚀 Бенчмарк ранжирования курсов BM25")
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк поиска по каталогу: 100000 курсов, ILIKE против полнотекстового поиска (GIN).
+
+Запуск (из каталога app, после alembic upgrade head):
+    python benchmarks/bench_course_search.py
+Все данные создаются в транзакции и откатываются по завершении.
+"""
+
+import asyncio
+import random
+import uuid
+
+from sqlalchemy import insert, select, text
+
+from _common import rollback_session, measure
+import models
+import course_search
+
+COURSES = 100000
+PAGE = 50
+WORDS = (
+    "python", "javascript", "react", "backend", "frontend", "devops", "аналитика",
+    "данные", "программирование", "тестирование", "дизайн", "маркетинг", "управление",
+    "проект", "машинное", "обучение", "сети", "безопасность", "облако", "kubernetes",
+)
+# Частые, редкие и префиксные запросы
+QUERIES = ("python", "машинное обучение", "kubernetes безопасность", "програм")
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+async def seed(db):
+    rng = random.Random(42)
+    batch = []
+    for i in range(COURSES):
+        batch.append({
+            "id": uuid.uuid4(),
+            "name": f"{_text(rng, 3).capitalize()} {i}",
+            "description": _text(rng, 60),
+            "category": "it",
+            "category_name": "IT",
+            "is_public": True,
+        })
+        if len(batch) == 5000:
+            await db.execute(insert(models.Course), batch)
+            batch = []
+    if batch:
+        await db.execute(insert(models.Course), batch)
+    await db.execute(text("ANALYZE courses"))
+
+
+async def main():
+    async with rollback_session() as db:
+        print(f"🌱 Заполнение: {COURSES} курсов...")
+        await seed(db)
+
+        base = select(models.Course).where(models.Course.is_public.is_(True))
+        for term in QUERIES:
+            async def run_ilike(term=term):
+                await db.execute(course_search.apply_course_ilike(base, term).limit(PAGE))
+
+            async def run_fts(term=term):
+                await db.execute(course_search.apply_course_search(base, term).limit(PAGE))
+
+            await measure(f"ILIKE  '{term}'", run_ilike, repeat=10)
+            await measure(f"FTS    '{term}'", run_fts, repeat=10)
+
+
+if __name__ == "__main__":
+    print("🚀 Бенчмарк поиска курсов")
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк входа под конкурентной нагрузкой: проверка пароля argon2 прямо в
+обработчике (блокирует цикл событий) против пула passwords.password_hasher.
+
+Для каждого уровня конкурентности печатает p50/p99 времени входа, пропускную
+способность и максимальную задержку цикла событий (насколько "замирают"
+остальные запросы воркера). Запрос пользователя по email - один индексный
+SELECT - не входит в замер: узкое место здесь argon2.
+
+Запуск (из каталога app):
+    python benchmarks/bench_login.py
+    PASSWORD_HASH_WORKERS=4 python benchmarks/bench_login.py
+"""
+
+import asyncio
+import statistics
+import time
+
+import _common  # noqa: F401 - добавляет каталог приложения в sys.path
+from passwords import PasswordHasher, PasswordHasherBusy, hash_password, verify_and_update
+
+LOGINS = 64
+CONCURRENCY = (1, 8, 32)
+PASSWORD = "correct horse battery staple"
+
+
+async def _inline_login(stored: str):
+    verify_and_update(PASSWORD, stored)
+
+
+async def _loop_lag(stop: asyncio.Event, lags: list, interval: float = 0.01):
+    """Насколько позже запланированного просыпается корутина - задержка цикла событий"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run(label: str, login, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    timings, lags, rejected = [], [], 0
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(_loop_lag(stop, lags))
+
+    async def one():
+        nonlocal rejected
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await login()
+            except PasswordHasherBusy:
+                rejected += 1
+                return
+            timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(LOGINS)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag_task
+
+    timings.sort()
+    p50 = statistics.median(timings) if timings else 0.0
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] if timings else 0.0
+    print(
+        f"⏱  {label:<10} x{concurrency:<3} p50={p50:8.1f} мс  p99={p99:8.1f} мс  "
+        f"{len(timings) / elapsed:6.1f} вход/с  лаг цикла max={max(lags, default=0) * 1000:7.1f} мс  "
+        f"отказов={rejected}"
+    )
+
+
+async def main():
+    stored = hash_password(PASSWORD)
+    hasher = PasswordHasher()
+    print(f"🔐 argon2, {LOGINS} входов, потоков в пуле: {hasher.workers}")
+
+    for concurrency in CONCURRENCY:
+        await run("inline", lambda: _inline_login(stored), concurrency)
+        await run("pool", lambda: hasher.verify(PASSWORD, stored), concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
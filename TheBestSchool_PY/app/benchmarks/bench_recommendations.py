@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк подбора курсов под вакансию: 50000 курсов, прежний перебор
+(каждое ключевое слово против названия и описания каждого курса) против
+инвертированного индекса course_recommender.CourseIndex.
+
+Данные генерируются в памяти: загрузка курсов из БД, которую прежний
+вариант делал на каждый запрос, в замер не входит. Для каждого запроса
+проверяется, что оба варианта дают одинаковые баллы.
+
+Запуск (из каталога app):
+    python benchmarks/bench_recommendations.py
+    BENCH_COURSES=200000 python benchmarks/bench_recommendations.py
+"""
+
+import asyncio
+import os
+import random
+import time
+import uuid
+from types import SimpleNamespace
+
+from _common import measure
+from course_recommender import CATEGORY_KEYWORDS, CourseIndex, extract_keywords
+
+COURSES = int(os.getenv("BENCH_COURSES", "50000"))
+WORDS = (
+    "python", "javascript", "react", "backend", "frontend", "devops", "аналитика",
+    "данные", "программирование", "тестирование", "дизайн", "маркетинг", "управление",
+    "проект", "машинное", "обучение", "сети", "безопасность", "облако", "kubernetes",
+    "finance", "budget", "legal", "contract", "seo", "content", "mining", "clinical",
+)
+# Частые, редкие и отсутствующие в каталоге слова
+TITLES = (
+    "Python backend developer",
+    "Senior React frontend engineer",
+    "Kubernetes DevOps инженер",
+    "Финансовый аналитик (finance analyst)",
+    "Haskell compiler engineer",
+)
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def generate_courses():
+    rng = random.Random(42)
+    categories = list(CATEGORY_KEYWORDS) + ["other"]
+    return [
+        SimpleNamespace(
+            id=uuid.uuid4(),
+            name=f"{_text(rng, 3).capitalize()} {i}",
+            description=_text(rng, 60),
+            category=rng.choice(categories),
+            category_name="",
+            category_color="#1A535C",
+            duration="",
+            is_public=True,
+        )
+        for i in range(COURSES)
+    ]
+
+
+def scan_recommend(courses, title: str):
+    """Прежний алгоритм из routers/vacancies.py: {id курса: баллы}"""
+    keywords = set(word.lower() for word in title.split() if len(word) > 2)
+    scores = {}
+    for course in courses:
+        score = 0
+        course_name_lower = course.name.lower()
+        course_desc_lower = (course.description or "").lower()
+        for keyword in keywords:
+            if keyword in course_name_lower:
+                score += 3
+            if keyword in course_desc_lower:
+                score += 1
+        if course.category in CATEGORY_KEYWORDS:
+            score += len(keywords & CATEGORY_KEYWORDS[course.category]) * 2
+        if score > 0:
+            scores[course.id] = score
+    return scores
+
+
+async def main():
+    print(f"🌱 Генерация: {COURSES} курсов...")
+    courses = generate_courses()
+
+    index = CourseIndex()
+    started = time.perf_counter()
+    index.rebuild(courses)
+    print(f"🏗  Построение индекса: {(time.perf_counter() - started) * 1000:.0f} мс")
+
+    for title in TITLES:
+        expected = scan_recommend(courses, title)
+        total, top = index.recommend(extract_keywords(title), limit=5)
+        assert total == len(expected), (title, total, len(expected))
+        assert [c["score"] for c in top] == sorted(expected.values(), reverse=True)[:5], title
+        assert all(expected[c["id"]] == c["score"] for c in top), title
+
+        async def run_scan(title=title):
+            scan_recommend(courses, title)
+
+        async def run_index(title=title):
+            index.recommend(extract_keywords(title), limit=5)
+
+        await measure(f"перебор '{title}'", run_scan, repeat=5)
+        await measure(f"индекс  '{title}' ({total} курсов)", run_index, repeat=20)
+
+    # Точечное обновление вместо перестройки
+    course = courses[0]
+    course.name = "Python для аналитиков"
+
+    async def run_upsert():
+        index.upsert(course)
+
+    await measure("upsert одного курса", run_upsert, repeat=100)
+
+
+if __name__ == "__main__":
+    print("🚀 Бенчмарк подбора курсов под вакансию")
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк дашборда преподавателя: 1000 курсов и 50000 заданий.
+Показывает, что время ответа не растет с числом курсов преподавателя.
+
+Запуск (из каталога app): python benchmarks/bench_teacher_dashboard.py
+Все данные создаются в транзакции и откатываются по завершении.
+"""
+
+import asyncio
+import uuid
+
+from sqlalchemy import insert
+
+from _common import rollback_session, measure
+import models
+import teacher_queries
+
+COURSES = 1000
+ASSIGNMENTS = 50000
+STUDENTS = 500
+# Сколько курсов охватывает каждый преподаватель
+TEACHER_SPREADS = (10, 100, 1000)
+
+
+def _user(user_type: str, i: int) -> dict:
+    return {
+        "id": uuid.uuid4(),
+        "email": f"bench-{user_type}-{i}-{uuid.uuid4().hex[:8]}@bench.local",
+        "surname": f"Фамилия{i}",
+        "name": f"Имя{i}",
+        "password": "bench",
+        "type": user_type,
+        "progress_percent": float(i % 100),
+    }
+
+
+async def seed(db):
+    """Заполняет базу курсами, уроками, студентами и заданиями"""
+    teachers = [_user("teacher", i) for i in range(len(TEACHER_SPREADS))]
+    students = [_user("apprentice", i) for i in range(STUDENTS)]
+    await db.execute(insert(models.User), teachers + students)
+
+    courses, modules, lessons = [], [], []
+    for i in range(COURSES):
+        course_id, module_id, lesson_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        courses.append({
+            "id": course_id,
+            "name": f"Бенчмарк-курс {i}",
+            "description": "Описание курса для бенчмарка",
+            "category": "it",
+            "category_name": "IT",
+        })
+        modules.append({"id": module_id, "course_id": course_id, "order": 1, "title": "Модуль 1"})
+        lessons.append({"id": lesson_id, "module_id": module_id, "order": 1, "title": "Урок 1"})
+    await db.execute(insert(models.Course), courses)
+    await db.execute(insert(models.CourseModule), modules)
+    await db.execute(insert(models.CourseLesson), lessons)
+
+    per_teacher = ASSIGNMENTS // len(teachers)
+    assignments = []
+    for teacher, spread in zip(teachers, TEACHER_SPREADS):
+        for i in range(per_teacher):
+            assignments.append({
+                "id": uuid.uuid4(),
+                "user_id": students[i % STUDENTS]["id"],
+                "lesson_id": lessons[i % spread]["id"],
+                "assigned_by": teacher["id"],
+            })
+    for offset in range(0, len(assignments), 5000):
+        await db.execute(insert(models.LessonAssignment), assignments[offset:offset + 5000])
+    await db.flush()
+    return teachers
+
+
+async def main():
+    async with rollback_session() as db:
+        print(f"🌱 Заполнение: {COURSES} курсов, {ASSIGNMENTS} заданий...")
+        teachers = await seed(db)
+
+        for teacher, spread in zip(teachers, TEACHER_SPREADS):
+            async def dashboard(teacher_id=teacher["id"]):
+                await teacher_queries.get_teacher_courses_with_counts(db, teacher_id)
+                await teacher_queries.get_teacher_stats(db, teacher_id)
+                await teacher_queries.get_recent_activities(db, teacher_id)
+
+            await measure(f"dashboard, курсов у преподавателя: {spread}", dashboard)
+
+
+if __name__ == "__main__":
+    print("🚀 Бенчмарк дашборда преподавателя")
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест загрузок: 50 студентов одновременно отправляют файлы по 50 МБ,
+а параллельно идут "посторонние" запросы к API (короткие корутины каждые 10 мс).
+
+Сравниваются:
+- sync     - прежняя запись через open()/file.file.read() прямо в обработчике;
+- pipeline - uploads.save_upload со слотом upload_limiter (асинхронная запись, лимиты загрузок).
+Для каждого варианта печатаются p50/p99/max задержки посторонних запросов и
+общее время загрузок. Файлы пишутся во временный каталог и удаляются.
+
+Запуск (из каталога app):
+    python benchmarks/bench_uploads.py
+    BENCH_UPLOADS=20 BENCH_UPLOAD_MB=10 python benchmarks/bench_uploads.py
+"""
+
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+
+import _common  # noqa: F401 - добавляет каталог приложения в sys.path
+from fastapi import UploadFile
+
+UPLOADS = int(os.getenv("BENCH_UPLOADS", "50"))
+UPLOAD_MB = int(os.getenv("BENCH_UPLOAD_MB", "50"))
+PROBE_INTERVAL = 0.01
+
+
+def _sync_save(file: UploadFile, upload_dir: str):
+    """Прежняя реализация из routers/student/submissions.py"""
+    path = os.path.join(upload_dir, f"{uuid.uuid4()}.pdf")
+    with open(path, "wb") as out:
+        while True:
+            chunk = file.file.read(1024 * 1024)
+            if not chunk:
+                break
+            out.write(chunk)
+
+
+async def _probe(stop: asyncio.Event, latencies: list):
+    """Посторонний запрос: сколько ждет короткая корутина, пока цикл событий занят"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        latencies.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+
+async def run(label: str, save, source: str):
+    latencies = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(stop, latencies))
+    await asyncio.sleep(0.1)
+
+    async def one(student: int):
+        with open(source, "rb") as fh:
+            await save(UploadFile(file=fh, filename="work.pdf"), student)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[one(i) for i in range(UPLOADS)], return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    failed = sum(1 for r in results if isinstance(r, Exception))
+    latencies.sort()
+    print(
+        f"⏱  {label:<9} посторонние запросы: p50={statistics.median(latencies):7.2f} мс  "
+        f"p99={latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:7.2f} мс  "
+        f"max={latencies[-1]:8.2f} мс  | загрузки: {elapsed:6.2f} с, ошибок {failed}"
+    )
+
+
+async def main():
+    workdir = tempfile.mkdtemp(prefix="bench_uploads_")
+    os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    import uploads  # UPLOAD_DIR читается при импорте
+
+    source = os.path.join(workdir, "source.pdf")
+    with open(source, "wb") as fh:
+        for _ in range(UPLOAD_MB):
+            fh.write(os.urandom(1024 * 1024))
+    print(f"📤 {UPLOADS} загрузок по {UPLOAD_MB} МБ, лимит одновременных: {uploads.UPLOAD_MAX_CONCURRENT}")
+
+    try:
+        os.makedirs(uploads.UPLOAD_DIR, exist_ok=True)
+
+        async def sync_save(file, student):
+            _sync_save(file, uploads.UPLOAD_DIR)
+
+        async def pipeline_save(file, student):
+            async with uploads.upload_limiter.slot(student):
+                await uploads.save_upload(file, uploads.SUBMISSION)
+
+        await run("sync", sync_save, source)
+        shutil.rmtree(uploads.UPLOAD_DIR)
+        await run("pipeline", pipeline_save, source)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
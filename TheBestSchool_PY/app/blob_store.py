@@ -0,0 +1,176 @@
+# app/blob_store.py - учет ссылок на блобы загрузок и сборка мусора
+import os
+import time
+from datetime import timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, func, literal, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+import models
+from uploads import BLOB_DIR_NAME, UPLOAD_DIR, UPLOAD_URL_PREFIX, StoredUpload, blob_path_from_url
+
+# Блоб без ссылок удаляется не раньше, чем через это время после последнего
+# использования: загрузка, которая еще не успела сохранить ссылку, не потеряет файл
+UPLOAD_BLOB_GC_GRACE_MINUTES = int(os.getenv("UPLOAD_BLOB_GC_GRACE_MINUTES", "60"))
+
+
+async def add_ref(db: AsyncSession, stored: StoredUpload):
+    """Учесть новую ссылку на блоб (урок или работа студента сохраняет stored.url)"""
+    await db.execute(
+        insert(models.UploadBlob)
+        .values(path=stored.blob_path, sha256=stored.sha256, size=stored.size, ref_count=1)
+        .on_conflict_do_update(
+            index_elements=[models.UploadBlob.path],
+            set_={
+                "ref_count": models.UploadBlob.ref_count + 1,
+                "last_used_at": func.now(),
+            },
+        )
+    )
+
+
+async def release(db: AsyncSession, url: Optional[str]):
+    """Снять ссылку на блоб по URL (старые файлы вне хранилища блобов игнорируются)"""
+    blob_path = blob_path_from_url(url)
+    if blob_path is None:
+        return
+    await db.execute(
+        update(models.UploadBlob)
+        .where(models.UploadBlob.path == blob_path)
+        .values(
+            ref_count=func.greatest(models.UploadBlob.ref_count - 1, 0),
+            last_used_at=func.now(),
+        )
+    )
+
+
+def _reference_counts():
+    """Число ссылок уроков и работ студентов на каждый URL файла - один проход с группировкой"""
+    refs = union_all(
+        select(models.CourseLesson.pptx_url.label("url")),
+        select(models.CourseLesson.homework_url.label("url")),
+        select(models.LessonSubmission.file_url.label("url")),
+    ).subquery()
+    return (
+        select(refs.c.url, func.count().label("refs"))
+        .where(refs.c.url.like(f"{UPLOAD_URL_PREFIX}/{BLOB_DIR_NAME}/%"))
+        .group_by(refs.c.url)
+        .cte("reference_counts")
+    )
+
+
+async def reconcile_ref_counts(db: AsyncSession) -> int:
+    """
+    Пересчитать ref_count по фактическим ссылкам. Счетчики ведутся в обработчиках,
+    но каскадные удаления (курс -> модули -> уроки) их не уменьшают - это
+    исправляется здесь перед сборкой мусора. Возвращает число исправленных блобов.
+    """
+    counts = _reference_counts()
+    blob = aliased(models.UploadBlob)
+    actual = (
+        select(blob.path, func.coalesce(counts.c.refs, 0).label("refs"))
+        .outerjoin(counts, counts.c.url == literal(f"{UPLOAD_URL_PREFIX}/") + blob.path)
+        .subquery()
+    )
+    result = await db.execute(
+        update(models.UploadBlob)
+        .where(
+            models.UploadBlob.path == actual.c.path,
+            models.UploadBlob.ref_count != actual.c.refs,
+        )
+        .values(ref_count=actual.c.refs, last_used_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def _recently_used(path: str, cutoff: float) -> bool:
+    try:
+        return os.stat(path).st_mtime > cutoff
+    except FileNotFoundError:
+        return False
+
+
+def _remove_file(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+async def collect_garbage(db: AsyncSession, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Удалить блобы без ссылок, файлы блобов без записи в upload_blobs
+    (загрузка сохранилась, а транзакция со ссылкой - нет) и брошенные .part.
+    Все удаляется только по истечении UPLOAD_BLOB_GC_GRACE_MINUTES.
+    """
+    stats = {"reconciled": 0, "blobs_removed": 0, "orphan_files_removed": 0, "bytes_freed": 0}
+    grace = timedelta(minutes=UPLOAD_BLOB_GC_GRACE_MINUTES)
+
+    stats["reconciled"] = await reconcile_ref_counts(db)
+
+    # Повторная загрузка того же содержимого обновляет mtime файла еще до того,
+    # как add_ref сохранит ссылку, - такие блобы не трогаем, хотя ref_count = 0
+    cutoff = time.time() - grace.total_seconds()
+    stale = models.UploadBlob.last_used_at < func.now() - grace
+    unreferenced = (await db.execute(
+        select(models.UploadBlob.path, models.UploadBlob.size)
+        .where(models.UploadBlob.ref_count == 0, stale)
+    )).all()
+    removable = [blob for blob in unreferenced if not _recently_used(os.path.join(UPLOAD_DIR, blob.path), cutoff)]
+
+    if dry_run:
+        stats["blobs_removed"] = len(removable)
+        stats["bytes_freed"] += sum(blob.size for blob in removable)
+    elif removable:
+        # Условия повторяются в DELETE: ссылка, добавленная после выборки, блоб сохраняет.
+        # Удаленные строки заблокированы до commit, add_ref на них ждет
+        deleted = (await db.execute(
+            delete(models.UploadBlob)
+            .where(
+                models.UploadBlob.path.in_([blob.path for blob in removable]),
+                models.UploadBlob.ref_count == 0,
+                stale,
+            )
+            .returning(models.UploadBlob.path, models.UploadBlob.size)
+            .execution_options(synchronize_session=False)
+        )).all()
+        for blob in deleted:
+            path = os.path.join(UPLOAD_DIR, blob.path)
+            if _recently_used(path, cutoff):
+                # Файл понадобился между выборкой и удалением - остается на диске
+                # и либо получит запись через add_ref, либо уйдет как файл без записи
+                continue
+            stats["blobs_removed"] += 1
+            stats["bytes_freed"] += blob.size
+            _remove_file(path)
+
+    # Файлы на диске, о которых база не знает
+    known = set((await db.execute(select(models.UploadBlob.path))).scalars().all())
+    blob_root = os.path.join(UPLOAD_DIR, BLOB_DIR_NAME)
+    for dirpath, _, filenames in os.walk(blob_root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            relative = os.path.relpath(path, UPLOAD_DIR).replace(os.sep, "/")
+            if relative in known:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > cutoff:
+                continue
+            stats["orphan_files_removed"] += 1
+            stats["bytes_freed"] += stat.st_size
+            if not dry_run:
+                _remove_file(path)
+
+    if dry_run:
+        await db.rollback()
+    else:
+        await db.commit()
+    return stats
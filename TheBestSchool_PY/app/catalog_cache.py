@@ -0,0 +1,211 @@
+# app/catalog_cache.py - кэш публичного каталога курсов с версионированием
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+import redis.asyncio as aioredis
+
+# Настройки кэша
+# CATALOG_CACHE_URL (redis://host:6379/0) - общий кэш для всех воркеров и реплик.
+# Без него кэш и счетчики версий живут в памяти каждого процесса: изменение курса
+# сбрасывает кэш только в том воркере, который его обработал, остальные отдают
+# старые ответы до истечения CATALOG_CACHE_TTL. Годится лишь для одного воркера.
+CATALOG_CACHE_URL = os.getenv("CATALOG_CACHE_URL", "")
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "300"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1024"))
+CATALOG_CACHE_PREFIX = "catalog"
+
+
+# ============ БЭКЕНДЫ ============
+class MemoryCacheBackend:
+    """
+    LRU-кэш в памяти процесса с TTL. Ключи без TTL (счетчики версий) не вытесняются:
+    их по одному на курс, счетчик удаленного курса убирается через delete.
+    """
+
+    def __init__(self, max_entries: int = CATALOG_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._persistent: Dict[str, str] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        if key in self._persistent:
+            return self._persistent[key]
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None, only_if_missing: bool = False):
+        if only_if_missing and await self.get(key) is not None:
+            return
+        if not ttl:
+            self._persistent[key] = value
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def incr(self, key: str) -> int:
+        value = int(self._persistent.get(key, "0")) + 1
+        self._persistent[key] = str(value)
+        return value
+
+    async def delete(self, key: str):
+        self._persistent.pop(key, None)
+        self._entries.pop(key, None)
+
+
+class RedisCacheBackend:
+    """Общий кэш для всех воркеров на любом Redis-совместимом сервере"""
+
+    def __init__(self, url: str):
+        self._client = aioredis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None, only_if_missing: bool = False):
+        await self._client.set(key, value, ex=int(ttl) if ttl else None, nx=only_if_missing)
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(key)
+
+    async def delete(self, key: str):
+        await self._client.delete(key)
+
+
+def _create_backend():
+    if CATALOG_CACHE_URL:
+        return RedisCacheBackend(CATALOG_CACHE_URL)
+    return MemoryCacheBackend()
+
+
+# ============ КЭШ КАТАЛОГА ============
+class CatalogCache:
+    """
+    Кэш ответов каталога. Ключи включают номер версии:
+    - версия каталога меняется при создании/изменении/удалении курсов (списки, категории);
+    - версия курса меняется при изменении самого курса, его модулей и уроков.
+    После изменения старые ключи просто перестают запрашиваться и вытесняются по TTL/LRU.
+    """
+
+    def __init__(self, backend, ttl: float = CATALOG_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self._fill_locks: Dict[str, asyncio.Lock] = {}
+
+    async def _version(self, name: str) -> str:
+        key = f"{CATALOG_CACHE_PREFIX}:version:{name}"
+        value = await self.backend.get(key)
+        if value is None:
+            # Начальное значение от времени: если счетчик был вытеснен,
+            # новая версия не совпадет ни с одной из старых
+            await self.backend.set(key, str(time.time_ns()), only_if_missing=True)
+            value = await self.backend.get(key)
+        return value
+
+    async def catalog_version(self) -> str:
+        return await self._version("all")
+
+    async def course_version(self, course_id) -> str:
+        return await self._version(f"course:{course_id}")
+
+    async def bump_catalog(self) -> str:
+        """Сменить версию каталога; возвращает новую версию"""
+        await self._version("all")
+        return str(await self.backend.incr(f"{CATALOG_CACHE_PREFIX}:version:all"))
+
+    async def bump_course(self, course_id):
+        await self._version(f"course:{course_id}")
+        await self.backend.incr(f"{CATALOG_CACHE_PREFIX}:version:course:{course_id}")
+
+    async def drop_course(self, course_id):
+        """Убрать счетчик версии удаленного курса; его записи вытеснятся по TTL/LRU"""
+        # Если курс с тем же id понадобится снова, _version выдаст новое значение от времени
+        await self.backend.delete(f"{CATALOG_CACHE_PREFIX}:version:course:{course_id}")
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Dict[str, str]:
+        """Вернуть запись {body, etag, last_modified}, при промахе загрузив данные через loader"""
+        full_key = f"{CATALOG_CACHE_PREFIX}:entry:{key}"
+        cached = await self.backend.get(full_key)
+        if cached is not None:
+            return json.loads(cached)
+
+        # Одновременные промахи по одному ключу ждут одну загрузку
+        lock = self._fill_locks.setdefault(full_key, asyncio.Lock())
+        try:
+            async with lock:
+                cached = await self.backend.get(full_key)
+                if cached is not None:
+                    return json.loads(cached)
+
+                body = json.dumps(jsonable_encoder(await loader()), ensure_ascii=False)
+                entry = {
+                    "body": body,
+                    "etag": f'"{hashlib.sha1(body.encode("utf-8")).hexdigest()}"',
+                    "last_modified": formatdate(usegmt=True),
+                }
+                await self.backend.set(full_key, json.dumps(entry), ttl=self.ttl)
+                return entry
+        finally:
+            # И при ошибке загрузки, и при ранней отдаче из кэша замок больше не нужен
+            self._fill_locks.pop(full_key, None)
+
+
+catalog_cache = CatalogCache(_create_backend())
+
+
+def make_key(*parts: Any) -> str:
+    """Ключ кэша из произвольных параметров запроса"""
+    raw = json.dumps([str(p) if p is not None else None for p in parts], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _not_modified_since(if_modified_since: str, last_modified: str) -> bool:
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        # Неразборчивая дата в заголовке - отдаем полный ответ
+        return False
+
+
+async def cached_json_response(
+    request: Request,
+    key: str,
+    loader: Callable[[], Awaitable[Any]]
+) -> Response:
+    """JSON-ответ из кэша с ETag/Last-Modified и поддержкой 304 Not Modified"""
+    entry = await catalog_cache.get_or_load(key, loader)
+    headers = {
+        "ETag": entry["etag"],
+        "Last-Modified": entry["last_modified"],
+        # Браузер хранит ответ, но перед использованием перепроверяет его по ETag
+        "Cache-Control": "public, no-cache",
+    }
+
+    # If-None-Match приоритетнее: If-Modified-Since проверяется только без него (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        if entry["etag"] in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and _not_modified_since(if_modified_since, entry["last_modified"]):
+            return Response(status_code=304, headers=headers)
+
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
@@ -0,0 +1,98 @@
+# app/course_queries.py - запросы каталога курсов с агрегатами
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+from typing import List, Optional, Tuple
+import models
+
+# Дерево курса: (курс, [(модуль, [уроки])])
+ModuleNode = Tuple[models.CourseModule, List[models.CourseLesson]]
+CourseTree = Tuple[models.Course, List[ModuleNode]]
+
+
+def _enrollment_counts_subquery():
+    """Число зачислений по каждому курсу"""
+    return (
+        select(
+            models.UserCourseProgress.course_id.label("course_id"),
+            func.count(models.UserCourseProgress.id).label("student_count"),
+        )
+        .group_by(models.UserCourseProgress.course_id)
+        .subquery()
+    )
+
+
+def _module_counts_subquery():
+    """Число модулей по каждому курсу"""
+    return (
+        select(
+            models.CourseModule.course_id.label("course_id"),
+            func.count(models.CourseModule.id).label("module_count"),
+        )
+        .group_by(models.CourseModule.course_id)
+        .subquery()
+    )
+
+
+def course_catalog_query() -> Select:
+    """
+    Курсы вместе с числом студентов и модулей.
+    Счетчики подтягиваются заранее сгруппированными подзапросами, поэтому
+    страница любого размера - это один SQL-запрос.
+    Строки результата: (Course, student_count, module_count)
+    """
+    enrollments = _enrollment_counts_subquery()
+    modules_count = _module_counts_subquery()
+    return (
+        select(
+            models.Course,
+            func.coalesce(enrollments.c.student_count, 0).label("student_count"),
+            func.coalesce(modules_count.c.module_count, 0).label("module_count"),
+        )
+        .outerjoin(enrollments, enrollments.c.course_id == models.Course.id)
+        .outerjoin(modules_count, modules_count.c.course_id == models.Course.id)
+    )
+
+
+async def load_course_trees(db: AsyncSession, *criteria) -> List[CourseTree]:
+    """
+    Загрузка курсов с модулями и уроками одним упорядоченным JOIN-запросом.
+    criteria - условия на Course/CourseModule/CourseLesson (например, Course.id == ...).
+    Дерево собирается за один проход по строкам результата.
+    """
+    result = await db.execute(
+        select(models.Course, models.CourseModule, models.CourseLesson)
+        .outerjoin(models.CourseModule, models.CourseModule.course_id == models.Course.id)
+        .outerjoin(models.CourseLesson, models.CourseLesson.module_id == models.CourseModule.id)
+        .where(*criteria)
+        .order_by(
+            models.Course.created_at,
+            models.Course.id,
+            models.CourseModule.order,
+            models.CourseModule.id,
+            models.CourseLesson.order,
+        )
+    )
+
+    trees: List[CourseTree] = []
+    current_course = None
+    current_module = None
+    for course, module, lesson in result.all():
+        if current_course is None or current_course[0].id != course.id:
+            current_course = (course, [])
+            trees.append(current_course)
+            current_module = None
+        if module is None:
+            continue
+        if current_module is None or current_module[0].id != module.id:
+            current_module = (module, [])
+            current_course[1].append(current_module)
+        if lesson is not None:
+            current_module[1].append(lesson)
+    return trees
+
+
+async def load_course_tree(db: AsyncSession, course_id, *criteria) -> Optional[CourseTree]:
+    """Дерево одного курса или None, если курс не найден"""
+    trees = await load_course_trees(db, models.Course.id == course_id, *criteria)
+    return trees[0] if trees else None
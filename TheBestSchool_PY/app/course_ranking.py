@@ -0,0 +1,298 @@
+# app/course_ranking.py - ранжирование курсов под вакансию по BM25 (разреженная матрица NumPy)
+import asyncio
+import hashlib
+import math
+import os
+import re
+import shutil
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from catalog_cache import catalog_cache
+from course_recommender import CATALOG_DB_CHECK_SECONDS, catalog_fingerprint
+
+import numpy as np
+import snowballstemmer
+
+COURSE_RANKING_DIR = os.getenv("COURSE_RANKING_DIR", "course_ranking_data")
+
+# Веса полей курса (как в course_recommender: название важнее категории, категория - описания)
+FIELD_WEIGHTS = (("name", 3), ("description", 1), ("category_name", 2))
+# Слова из названия вакансии весят больше, чем из ее описания и навыков
+QUERY_TITLE_WEIGHT = 2.0
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_TERM_LENGTH = 32
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_CYRILLIC_RE = re.compile(r"[а-я]")
+_STOP_WORDS = frozenset({
+    "и", "в", "во", "на", "с", "со", "по", "для", "из", "от", "до", "за", "не", "или", "как",
+    "что", "это", "к", "о", "об", "у", "а", "но", "при", "без", "мы", "вы", "вас", "наш",
+    "the", "and", "for", "with", "of", "to", "in", "on", "a", "an", "or", "is", "are", "be",
+    "we", "you", "our", "your", "at", "as", "by", "from",
+})
+_RU_STEMMER = snowballstemmer.stemmer("russian")
+_EN_STEMMER = snowballstemmer.stemmer("english")
+
+
+@lru_cache(maxsize=200_000)
+def stem(word: str) -> str:
+    """Основа слова: русский или английский стеммер в зависимости от алфавита"""
+    return (_RU_STEMMER if _CYRILLIC_RE.search(word) else _EN_STEMMER).stemWord(word)
+
+
+def _words(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower().replace("ё", "е"))
+
+
+def _is_term(word: str) -> bool:
+    return 2 <= len(word) <= MAX_TERM_LENGTH and word not in _STOP_WORDS
+
+
+def tokenize(text: Optional[str]) -> List[Tuple[str, str]]:
+    """Пары (основа, слово) без стоп-слов - основа идет в матрицу, слово в пояснения"""
+    return [(stem(word), word) for word in _words(text) if _is_term(word)]
+
+
+def term_counts(text: Optional[str]) -> Counter:
+    """Частоты основ в тексте (каждое различное слово стеммируется один раз)"""
+    counts: Counter = Counter()
+    for word, count in Counter(_words(text)).items():
+        if _is_term(word):
+            counts[stem(word)] += count
+    return counts
+
+
+def vacancy_query_text(vacancy) -> str:
+    """Название, описание и навыки сохраненной вакансии одной строкой (skills - JSON-список)"""
+    skills = vacancy.skills or []
+    if isinstance(skills, str):
+        skills = [skills]
+    names = [skill.get("name", "") if isinstance(skill, dict) else str(skill) for skill in skills]
+    return " ".join([vacancy.title or "", vacancy.description or "", *names])
+
+
+class CourseMatrix:
+    """
+    BM25-веса курсов в формате CSC (по столбцам-термам): для терма t строки курсов
+    rows[indptr[t]:indptr[t+1]] и веса weights[...]. Запрос - сумма столбцов его
+    термов, то есть разреженное произведение матрицы на вектор запроса.
+    На диске - набор .npy, которые открываются через mmap без чтения целиком.
+    """
+
+    FILES = ("terms", "indptr", "rows", "weights", "course_ids")
+
+    def __init__(self, fingerprint: str, terms, indptr, rows, weights, course_ids):
+        self.fingerprint = fingerprint
+        self.terms = terms
+        self.indptr = indptr
+        self.rows = rows
+        self.weights = weights
+        self.course_ids = course_ids
+
+    def __len__(self) -> int:
+        return len(self.course_ids)
+
+    @classmethod
+    def build(cls, fingerprint: str, courses: Iterable) -> "CourseMatrix":
+        course_ids, doc_tfs, lengths = [], [], []
+        df: Counter = Counter()
+        for course in courses:
+            tf: Counter = Counter()
+            for field, weight in FIELD_WEIGHTS:
+                for term, count in term_counts(getattr(course, field)).items():
+                    tf[term] += count * weight
+            course_ids.append(str(course.id))
+            doc_tfs.append(tf)
+            lengths.append(sum(tf.values()))
+            df.update(tf.keys())
+
+        n_docs = len(course_ids)
+        avgdl = (sum(lengths) / n_docs) if n_docs else 0.0
+        terms = sorted(df)
+        column = {term: i for i, term in enumerate(terms)}
+        idf = {term: math.log(1 + (n_docs - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+
+        postings: List[List[Tuple[int, float]]] = [[] for _ in terms]
+        for doc, (tf, length) in enumerate(zip(doc_tfs, lengths)):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avgdl) if avgdl else BM25_K1
+            for term, freq in tf.items():
+                postings[column[term]].append((doc, idf[term] * freq * (BM25_K1 + 1) / (freq + norm)))
+
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(p) for p in postings])
+        rows = np.fromiter((doc for p in postings for doc, _ in p), dtype=np.int32, count=int(indptr[-1]))
+        weights = np.fromiter((w for p in postings for _, w in p), dtype=np.float32, count=int(indptr[-1]))
+        return cls(
+            fingerprint,
+            np.array(terms, dtype=f"U{MAX_TERM_LENGTH}"),
+            indptr,
+            rows,
+            weights,
+            np.array(course_ids, dtype="U36"),
+        )
+
+    def save(self, root: str):
+        """Записать во временный каталог и переименовать: читатели не видят недописанную матрицу"""
+        os.makedirs(root, exist_ok=True)
+        target = os.path.join(root, self.fingerprint)
+        tmp = os.path.join(root, f".tmp-{uuid4()}")
+        os.makedirs(tmp)
+        try:
+            for name in self.FILES:
+                np.save(os.path.join(tmp, f"{name}.npy"), getattr(self, name))
+            os.rename(tmp, target)
+        except OSError:
+            # Другой воркер успел сохранить ту же матрицу
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.isdir(target):
+                raise
+        for entry in os.listdir(root):
+            if entry != self.fingerprint and not entry.startswith(".tmp-"):
+                shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+    @classmethod
+    def load(cls, root: str, fingerprint: str) -> Optional["CourseMatrix"]:
+        path = os.path.join(root, fingerprint)
+        if not os.path.isdir(path):
+            return None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in cls.FILES}
+        return cls(fingerprint, **arrays)
+
+    def _column(self, term: str) -> Optional[int]:
+        i = int(np.searchsorted(self.terms, term))
+        if i < len(self.terms) and self.terms[i] == term:
+            return i
+        return None
+
+    def rank(self, query: Sequence[Tuple[str, float]], limit: int = 5) -> Tuple[int, List[Tuple[str, float, List[str]]]]:
+        """
+        query - пары (текст, вес). Возвращает (сколько курсов совпало хотя бы одним
+        термом, лучшие limit в виде (id курса, балл, совпавшие слова запроса)).
+        """
+        return self.rank_many([query], limit)[0]
+
+    def rank_many(
+        self,
+        queries: Sequence[Sequence[Tuple[str, float]]],
+        limit: int = 5
+    ) -> List[Tuple[int, List[Tuple[str, float, List[str]]]]]:
+        """
+        Несколько запросов за один проход: столбец каждого терма ищется в словаре
+        один раз на пакет, баллы каждого запроса - один bincount по его столбцам.
+        """
+        n_docs = len(self.course_ids)
+        slices: Dict[str, Optional[Tuple[int, int]]] = {}
+        per_query = []
+
+        for query in queries:
+            term_weights: Counter = Counter()
+            surface: Dict[str, str] = {}
+            for text, weight in query:
+                for term, word in tokenize(text):
+                    term_weights[term] += weight
+                    surface.setdefault(term, word)
+
+            columns = []
+            for term, weight in term_weights.items():
+                if term not in slices:
+                    col = self._column(term)
+                    slices[term] = None if col is None else (int(self.indptr[col]), int(self.indptr[col + 1]))
+                if slices[term] is None:
+                    continue
+                start, end = slices[term]
+                # Повтор слова в запросе усиливает его логарифмически, а не линейно
+                qw = 1 + math.log(weight) if weight > 1 else weight
+                columns.append((surface[term], self.rows[start:end], self.weights[start:end] * qw))
+            per_query.append(columns)
+
+        results = []
+        for columns in per_query:
+            if not columns:
+                results.append((0, []))
+                continue
+            row = np.bincount(
+                np.concatenate([rows for _, rows, _ in columns]),
+                weights=np.concatenate([weights for _, _, weights in columns]),
+                minlength=n_docs,
+            )
+            total = int(np.count_nonzero(row))
+            k = min(limit, total)
+            if not k:
+                results.append((total, []))
+                continue
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top], kind="stable")]
+
+            matched = {int(doc): [] for doc in top}
+            for word, rows, _ in columns:
+                for doc in top[np.isin(top, rows)]:
+                    matched[int(doc)].append(word)
+            results.append((total, [(str(self.course_ids[doc]), float(row[doc]), matched[int(doc)]) for doc in top]))
+        return results
+
+
+class CourseRanking:
+    """
+    Матрица BM25 публичных курсов для процесса. Проверка актуальности дешевая:
+    версия каталога (catalog_cache) в памяти, а при ее смене и не реже раза
+    в CATALOG_DB_CHECK_SECONDS - отпечаток каталога одним агрегатным запросом.
+    Матрица с тем же отпечатком берется с диска (холодный воркер открывает
+    ее через mmap), иначе строится в потоке и сохраняется.
+    """
+
+    def __init__(self, root: str = COURSE_RANKING_DIR):
+        self.root = root
+        self.matrix: Optional[CourseMatrix] = None
+        self.version: Optional[str] = None
+        self._check_after = 0.0
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    async def _fingerprint(db: AsyncSession) -> str:
+        raw = await catalog_fingerprint(db) + f"|{FIELD_WEIGHTS}|{BM25_K1}|{BM25_B}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    async def ensure_current(self, db: AsyncSession) -> CourseMatrix:
+        version = await catalog_cache.catalog_version()
+        if self.matrix is not None and version == self.version and time.monotonic() < self._check_after:
+            return self.matrix
+        async with self._lock:
+            if self.matrix is not None and version == self.version and time.monotonic() < self._check_after:
+                return self.matrix
+            fingerprint = await self._fingerprint(db)
+            self._check_after = time.monotonic() + CATALOG_DB_CHECK_SECONDS
+            if self.matrix is None or self.matrix.fingerprint != fingerprint:
+                matrix = await asyncio.to_thread(CourseMatrix.load, self.root, fingerprint)
+                if matrix is None:
+                    result = await db.execute(
+                        select(
+                            models.Course.id,
+                            models.Course.name,
+                            models.Course.description,
+                            models.Course.category_name,
+                        )
+                        .where(models.Course.is_public == True)
+                        .order_by(models.Course.created_at, models.Course.id)
+                    )
+                    courses = result.all()
+                    matrix = await asyncio.to_thread(self._build_and_save, fingerprint, courses)
+                self.matrix = matrix
+            self.version = version
+            return self.matrix
+
+    def _build_and_save(self, fingerprint: str, courses) -> CourseMatrix:
+        matrix = CourseMatrix.build(fingerprint, courses)
+        matrix.save(self.root)
+        return matrix
+
+
+course_ranking = CourseRanking()
@@ -0,0 +1,305 @@
+# app/course_recommender.py - подбор курсов под вакансию по инвертированному индексу
+import asyncio
+import heapq
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from catalog_cache import catalog_cache
+
+# Веса совпадений: ключевое слово в названии, в описании, среди слов категории курса
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+CATEGORY_WEIGHT = 2
+MIN_KEYWORD_LENGTH = 3
+
+# Типичные ключевые слова по категориям
+CATEGORY_KEYWORDS: Dict[str, Set[str]] = {
+    "it": {"frontend", "backend", "react", "python", "javascript", "java", "devops", "data"},
+    "finance": {"finance", "analyst", "accounting", "budget", "investment", "bank"},
+    "law": {"law", "lawyer", "legal", "corporate", "contract", "justice"},
+    "marketing": {"marketing", "digital", "smm", "seo", "content", "advertising"},
+    "management": {"management", "project", "manager", "team", "lead", "product"},
+    "geology": {"geology", "geologist", "mining", "oil", "gas", "resources"},
+    "design": {"design", "designer", "ui", "ux", "interface", "graphic"},
+    "medicine": {"medicine", "clinical", "research", "healthcare", "medical"},
+}
+
+_FIELDS = ("name", "description")
+
+
+def extract_keywords(title: str) -> List[str]:
+    """Ключевые слова из названия вакансии: слова от трех символов, без повторов"""
+    return list(dict.fromkeys(word.lower() for word in title.split() if len(word) >= MIN_KEYWORD_LENGTH))
+
+
+def _terms(text: Optional[str]) -> Set[str]:
+    # Ключевое слово не содержит пробелов, поэтому "слово входит в текст" равносильно
+    # "слово входит в один из фрагментов текста между пробелами" - их и индексируем
+    return {term for term in (text or "").lower().split() if len(term) >= MIN_KEYWORD_LENGTH}
+
+
+def _trigrams(term: str) -> Set[str]:
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+def course_card(course) -> dict:
+    """Поля курса в ответе /analyze (без баллов и причин)"""
+    return {
+        "id": course.id,
+        "name": course.name,
+        "description": course.description,
+        "category": course.category,
+        "category_name": course.category_name,
+        "category_color": course.category_color,
+        "duration": course.duration,
+    }
+
+
+# Как часто версия каталога сверяется с базой. Без общего бэкенда (CATALOG_CACHE_URL)
+# версия в catalog_cache видна только своему процессу, и изменения из других
+# процессов (воркеры uvicorn, обработчик очереди вакансий) иначе не заметить
+CATALOG_DB_CHECK_SECONDS = float(os.getenv("CATALOG_DB_CHECK_SECONDS", "30"))
+
+
+async def catalog_fingerprint(db: AsyncSession) -> str:
+    """Отпечаток публичного каталога одним агрегатным запросом: число курсов и последние изменения"""
+    row = (await db.execute(
+        select(
+            func.count(models.Course.id),
+            func.max(models.Course.created_at),
+            func.max(models.Course.updated_at),
+        )
+        .where(models.Course.is_public == True)
+    )).one()
+    return "|".join(str(value) for value in row)
+
+
+class CourseIndex:
+    """
+    Инвертированный индекс публичных курсов: фрагмент текста -> курсы (по полям),
+    триграмма -> фрагменты (для поиска подстрокой, как в прежней проверке `in`),
+    категория -> курсы. Запрос стоит пропорционально числу совпавших фрагментов
+    и курсов, а не размеру каталога.
+
+    Индекс строится при старте и перестраивается, когда меняется версия каталога
+    (catalog_cache) или, не чаще раза в CATALOG_DB_CHECK_SECONDS, отпечаток каталога
+    в базе - так изменения, сделанные другими процессами, тоже видны.
+    Изменения в этом процессе применяются точечно через upsert/remove.
+    """
+
+    def __init__(self):
+        self.version: Optional[str] = None
+        self.fingerprint: Optional[str] = None
+        self._check_after = 0.0
+        self._lock = asyncio.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._next_doc = 0
+        self._doc_ids: Dict[str, int] = {}
+        self._cards: Dict[int, dict] = {}
+        self._doc_terms: Dict[int, Dict[str, Set[str]]] = {}
+        self._doc_category: Dict[int, Optional[str]] = {}
+        self._postings: Dict[str, Dict[str, Set[int]]] = {field: {} for field in _FIELDS}
+        self._term_refs: Dict[str, int] = {}
+        self._trigram_terms: Dict[str, Set[str]] = {}
+        self._by_category: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    # ---------- наполнение ----------
+    def _add_term(self, field: str, term: str, doc: int):
+        self._postings[field].setdefault(term, set()).add(doc)
+        refs = self._term_refs.get(term, 0)
+        if not refs:
+            for gram in _trigrams(term):
+                self._trigram_terms.setdefault(gram, set()).add(term)
+        self._term_refs[term] = refs + 1
+
+    def _drop_term(self, field: str, term: str, doc: int):
+        docs = self._postings[field][term]
+        docs.discard(doc)
+        if not docs:
+            del self._postings[field][term]
+        self._term_refs[term] -= 1
+        if not self._term_refs[term]:
+            del self._term_refs[term]
+            for gram in _trigrams(term):
+                terms = self._trigram_terms[gram]
+                terms.discard(term)
+                if not terms:
+                    del self._trigram_terms[gram]
+
+    def _unindex(self, doc: int):
+        for field, terms in self._doc_terms.pop(doc).items():
+            for term in terms:
+                self._drop_term(field, term, doc)
+        category = self._doc_category.pop(doc)
+        if category is not None:
+            self._by_category[category].discard(doc)
+            if not self._by_category[category]:
+                del self._by_category[category]
+
+    def _advance(self, version: Optional[str]):
+        # Индекс был актуален до этого изменения - значит, актуален и после
+        if version is not None and self.version is not None and version == str(int(self.version) + 1):
+            self.version = version
+
+    def upsert(self, course, version: Optional[str] = None):
+        """
+        Добавить или обновить курс (ORM-объект или строка запроса с теми же полями).
+        version - новая версия каталога, которую вернул catalog_cache.bump_catalog().
+        """
+        if not course.is_public:
+            self.remove(course.id, version)
+            return
+        key = str(course.id)
+        doc = self._doc_ids.get(key)
+        if doc is None:
+            doc = self._doc_ids[key] = self._next_doc
+            self._next_doc += 1
+        else:
+            self._unindex(doc)
+
+        self._cards[doc] = course_card(course)
+        self._doc_terms[doc] = {"name": _terms(course.name), "description": _terms(course.description)}
+        for field, terms in self._doc_terms[doc].items():
+            for term in terms:
+                self._add_term(field, term, doc)
+        self._doc_category[doc] = course.category
+        if course.category is not None:
+            self._by_category.setdefault(course.category, set()).add(doc)
+        self._advance(version)
+
+    def remove(self, course_id, version: Optional[str] = None):
+        """Убрать курс из индекса (удален или перестал быть публичным)"""
+        doc = self._doc_ids.pop(str(course_id), None)
+        if doc is not None:
+            self._unindex(doc)
+            del self._cards[doc]
+        self._advance(version)
+
+    def rebuild(self, courses: Iterable, version: Optional[str] = None):
+        self._reset()
+        for course in courses:
+            self.upsert(course)
+        self.version = version
+
+    async def ensure_current(self, db: AsyncSession):
+        """Перестроить индекс, если каталог изменился с момента последней сборки"""
+        version = await catalog_cache.catalog_version()
+        if version == self.version and time.monotonic() < self._check_after:
+            return
+        async with self._lock:
+            if version == self.version and time.monotonic() < self._check_after:
+                return
+            fingerprint = await catalog_fingerprint(db)
+            self._check_after = time.monotonic() + CATALOG_DB_CHECK_SECONDS
+            if version == self.version and fingerprint == self.fingerprint:
+                return
+            result = await db.execute(
+                select(
+                    models.Course.id,
+                    models.Course.name,
+                    models.Course.description,
+                    models.Course.category,
+                    models.Course.category_name,
+                    models.Course.category_color,
+                    models.Course.duration,
+                    models.Course.is_public,
+                )
+                .where(models.Course.is_public == True)
+                .order_by(models.Course.created_at, models.Course.id)
+            )
+            self.rebuild(result.all(), version)
+            self.fingerprint = fingerprint
+
+    # ---------- запрос ----------
+    def _terms_containing(self, keyword: str) -> Set[str]:
+        """Фрагменты, содержащие keyword подстрокой: пересечение по триграммам + проверка"""
+        candidates: Optional[Set[str]] = None
+        for gram in sorted(_trigrams(keyword), key=lambda g: len(self._trigram_terms.get(g, ()))):
+            terms = self._trigram_terms.get(gram)
+            if not terms:
+                return set()
+            candidates = set(terms) if candidates is None else candidates & terms
+            if not candidates:
+                return set()
+        return {term for term in candidates or () if keyword in term}
+
+    def _keyword_docs(self, keyword: str) -> Dict[str, Set[int]]:
+        """Курсы, у которых keyword входит в название / описание"""
+        terms = self._terms_containing(keyword)
+        docs: Dict[str, Set[int]] = {}
+        for field in _FIELDS:
+            postings = self._postings[field]
+            matched: Set[int] = set()
+            for term in terms:
+                matched |= postings.get(term, set())
+            docs[field] = matched
+        return docs
+
+    def recommend(
+        self,
+        keywords: List[str],
+        limit: int = 5,
+        _keyword_cache: Optional[Dict[str, Dict[str, Set[int]]]] = None
+    ) -> Tuple[int, List[dict]]:
+        """
+        Курсы, подходящие под ключевые слова: (сколько найдено всего, лучшие limit).
+        Баллы: NAME_WEIGHT за слово в названии, DESCRIPTION_WEIGHT - в описании,
+        CATEGORY_WEIGHT за каждое слово из CATEGORY_KEYWORDS категории курса.
+        """
+        keywords = [keyword for keyword in keywords if len(keyword) >= MIN_KEYWORD_LENGTH]
+        hits: Dict[str, Dict[int, List[str]]] = {field: {} for field in _FIELDS}
+
+        for keyword in keywords:
+            if _keyword_cache is None:
+                keyword_docs = self._keyword_docs(keyword)
+            else:
+                if keyword not in _keyword_cache:
+                    _keyword_cache[keyword] = self._keyword_docs(keyword)
+                keyword_docs = _keyword_cache[keyword]
+            for field in _FIELDS:
+                for doc in keyword_docs[field]:
+                    hits[field].setdefault(doc, []).append(keyword)
+
+        category_scores: Dict[int, int] = {}
+        keyword_set = set(keywords)
+        for category, words in CATEGORY_KEYWORDS.items():
+            matched_words = keyword_set & words
+            if matched_words:
+                for doc in self._by_category.get(category, ()):
+                    category_scores[doc] = len(matched_words) * CATEGORY_WEIGHT
+
+        candidates = set(hits["name"]) | set(hits["description"]) | set(category_scores)
+        scores = {
+            doc: len(hits["name"].get(doc, ())) * NAME_WEIGHT
+            + len(hits["description"].get(doc, ())) * DESCRIPTION_WEIGHT
+            + category_scores.get(doc, 0)
+            for doc in candidates
+        }
+        top = heapq.nsmallest(limit, candidates, key=lambda doc: (-scores[doc], doc))
+
+        recommendations = []
+        for doc in top:
+            reasons = [f"Ключевое слово '{keyword}' в названии курса" for keyword in hits["name"].get(doc, ())]
+            reasons += [f"Ключевое слово '{keyword}' в описании курса" for keyword in hits["description"].get(doc, ())]
+            if doc in category_scores:
+                reasons.append("Совпадение по категорийным ключевым словам")
+            recommendations.append({**self._cards[doc], "score": scores[doc], "reasons": reasons[:3]})
+        return len(candidates), recommendations
+
+    def recommend_many(self, keyword_lists: List[List[str]], limit: int = 5) -> List[Tuple[int, List[dict]]]:
+        """recommend для нескольких вакансий: совпадения общего ключевого слова ищутся один раз"""
+        cache: Dict[str, Dict[str, Set[int]]] = {}
+        return [self.recommend(keywords, limit, cache) for keywords in keyword_lists]
+
+
+course_index = CourseIndex()
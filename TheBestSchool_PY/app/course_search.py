@@ -0,0 +1,73 @@
+# app/course_search.py - полнотекстовый поиск по каталогу курсов (PostgreSQL FTS)
+import re
+from typing import List, Optional
+
+from sqlalchemy import func, literal_column, or_
+from sqlalchemy.sql import Select
+
+import models
+
+# Русская и английская конфигурации: запрос строится в обеих и объединяется через OR
+SEARCH_CONFIGS = ("russian", "english")
+SNIPPET_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=12, MaxFragments=2"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize_query(text: str) -> List[str]:
+    """Слова поискового запроса (только буквы/цифры - без синтаксиса tsquery)"""
+    return [token.lower() for token in _TOKEN_RE.findall(text or "")]
+
+
+def build_tsquery(text: str):
+    """
+    tsquery для строки пользователя: все слова обязательны (&), последнее
+    слово ищется по префиксу, чтобы работал поиск по мере набора.
+    Возвращает None, если в запросе нет слов.
+    """
+    tokens = tokenize_query(text)
+    if not tokens:
+        return None
+    terms = [f"{token}:*" for token in tokens]
+    raw = " & ".join(terms)
+    queries = [func.to_tsquery(literal_column(f"'{config}'::regconfig"), raw) for config in SEARCH_CONFIGS]
+    query = queries[0]
+    for extra in queries[1:]:
+        query = query.op("||")(extra)
+    return query
+
+
+def apply_course_search(query: Select, text: str, with_snippets: bool = True) -> Optional[Select]:
+    """
+    Добавить к запросу курсов полнотекстовое условие, ранжирование и фрагменты.
+    Добавляемые колонки: rank и (если with_snippets) name_highlight, description_highlight.
+    Возвращает None, если запрос пустой.
+    """
+    tsquery = build_tsquery(text)
+    if tsquery is None:
+        return None
+
+    rank = func.ts_rank_cd(models.Course.search_vector, tsquery).label("rank")
+    query = query.add_columns(rank).where(models.Course.search_vector.op("@@")(tsquery))
+
+    if with_snippets:
+        query = query.add_columns(
+            func.ts_headline(
+                literal_column("'russian'::regconfig"), models.Course.name, tsquery, SNIPPET_OPTIONS
+            ).label("name_highlight"),
+            func.ts_headline(
+                literal_column("'russian'::regconfig"), models.Course.description, tsquery, SNIPPET_OPTIONS
+            ).label("description_highlight"),
+        )
+
+    return query.order_by(rank.desc(), models.Course.created_at)
+
+
+def apply_course_ilike(query: Select, text: str) -> Select:
+    """Прежний поиск подстрокой (ILIKE) - оставлен для сравнения в бенчмарке"""
+    term = f"%{text}%"
+    return query.where(or_(
+        models.Course.name.ilike(term),
+        models.Course.description.ilike(term),
+        models.Course.category_name.ilike(term),
+    ))
@@ -4,11 +4,11 @@ from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
 import models
 import schemas
-from auth import get_password_hash
+from passwords import PasswordHasherBusy, password_hasher
 from typing import List, Optional
 import uuid
-from auth import verify_password
 from models import User
+from principal_cache import principal_cache
 
 # CRUD для User
 async def get_user(db: AsyncSession, user_id: str):
@@ -30,7 +30,7 @@ async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100):
     return result.scalars().all()
 
 async def create_user(db: AsyncSession, email: str, password: str, **extra):
-    hashed_password = get_password_hash(password)
+    hashed_password = await password_hasher.hash(password)
     payload = {"id": str(uuid.uuid4()), "email": email, "password": hashed_password}
     payload.update(extra)
     user = models.User(**payload)
@@ -55,13 +55,14 @@ async def update_user(db: AsyncSession, user_id: str, user_update: schemas.UserU
     update_data = user_update.dict(exclude_unset=True)
     
     if "password" in update_data:
-        update_data["password"] = get_password_hash(update_data["password"])
+        update_data["password"] = await password_hasher.hash(update_data["password"])
     
     for field, value in update_data.items():
         setattr(db_user, field, value)
     
     await db.commit()
     await db.refresh(db_user)
+    principal_cache.invalidate(db_user.id)
     return db_user
 
 async def delete_user(db: AsyncSession, user_id: str):
@@ -73,6 +74,7 @@ async def delete_user(db: AsyncSession, user_id: str):
     if db_user:
         await db.delete(db_user)
         await db.commit()
+        principal_cache.invalidate(db_user.id)
     
     return db_user
 
@@ -224,15 +226,22 @@ async def authenticate_user(db: AsyncSession, email: str, password: str):
             print(f"Пользователь {email} не активен")
             return False
         
-        # Проверяем пароль
-        # Проверьте, какое поле в вашей модели: password или password_hash
-        if not verify_password(password, user.password):  # ИЛИ user.password_hash
+        # Проверяем пароль (argon2 в пуле потоков)
+        ok, new_hash = await password_hasher.verify(password, user.password)
+        if not ok:
             print(f"Неверный пароль для пользователя {email}")
             return False
         
+        # Старый открытый пароль или устаревший хэш заменяем на актуальный argon2
+        if new_hash:
+            user.password = new_hash
+            await db.commit()
+        
         print(f"Успешная аутентификация для {email}")
         return user
         
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         print(f"Ошибка при аутентификации: {e}")
         return False
\ No newline at end of file
@@ -0,0 +1,184 @@
+# app/downloads.py - отдача загруженных файлов: Range, ETag, кэширование, X-Accel-Redirect
+"""
+Режимы отдачи (DOWNLOAD_MODE):
+- direct   - байты отдает приложение (по умолчанию, без прокси);
+- accel    - приложение только проверяет доступ, файл отдает nginx по X-Accel-Redirect.
+             Нужен internal-location, например:
+                 location /protected-uploads/ { internal; alias /app/uploads/; }
+- sendfile - то же через X-Sendfile (Apache mod_xsendfile, lighttpd).
+В режимах accel/sendfile Range и условные запросы к байтам обрабатывает прокси.
+"""
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+import aiofiles
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+from uploads import BLOB_DIR_NAME, UPLOAD_CHUNK_SIZE, UPLOAD_DIR
+
+DOWNLOAD_MODE = os.getenv("DOWNLOAD_MODE", "direct")
+DOWNLOAD_ACCEL_PREFIX = os.getenv("DOWNLOAD_ACCEL_PREFIX", "/protected-uploads").rstrip("/")
+
+# Имя блоба - хэш содержимого, поэтому по одному URL всегда одни и те же байты
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def _not_found() -> HTTPException:
+    return HTTPException(status_code=404, detail="Файл не найден")
+
+
+def resolve_upload_path(relative: str) -> Tuple[str, str]:
+    """
+    Абсолютный путь к файлу внутри UPLOAD_DIR и путь относительно него.
+    Выход за пределы каталога (../) и недокачанные загрузки дают 404.
+    """
+    root = os.path.realpath(UPLOAD_DIR)
+    path = os.path.realpath(os.path.join(root, relative))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        raise _not_found()
+    rel = os.path.relpath(path, root).replace(os.sep, "/")
+    if rel.startswith(f"{BLOB_DIR_NAME}/tmp/"):
+        raise _not_found()
+    return path, rel
+
+
+def etag_for(rel: str, stat: os.stat_result) -> Tuple[str, bool]:
+    """
+    (ETag, неизменяемый ли файл). Для блобов - сильный ETag из SHA-256 в имени
+    (хэш не пересчитывается), для старых файлов - слабый по mtime и размеру.
+    """
+    parts = rel.split("/")
+    if len(parts) == 3 and parts[0] == BLOB_DIR_NAME:
+        digest = os.path.splitext(parts[2])[0]
+        if _SHA256_RE.match(digest):
+            return f'"{digest}"', True
+    return f'W/"{int(stat.st_mtime)}-{stat.st_size}"', False
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Один диапазон байтов из заголовка Range (границы включительно).
+    None - отдать файл целиком: заголовка нет, диапазонов несколько или формат
+    непонятен (RFC 9110 разрешает такой Range игнорировать). Вне файла - 416.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        # bytes=-N - последние N байт
+        start, end = max(size - int(last), 0), size - 1
+        if int(last) == 0:
+            start = size
+    else:
+        return None
+
+    if start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Запрошенный диапазон вне файла",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match: слабое сравнение, как требует RFC 9110"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def content_disposition(filename: str) -> str:
+    """attachment с именем в ASCII и в UTF-8 (RFC 6266) - кириллица не ломает заголовок"""
+    fallback = re.sub(r'[^A-Za-z0-9._-]', "_", filename) or "file"
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+async def _iter_range(path: str, start: int, end: int):
+    async with aiofiles.open(path, "rb") as fh:
+        await fh.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await fh.read(min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_response(request: Request, relative: str, download_name: Optional[str] = None) -> Response:
+    """
+    Ответ с файлом из UPLOAD_DIR. Доступ проверяет вызывающий эндпоинт.
+    download_name - отдать как вложение с этим именем, иначе inline.
+    """
+    path, rel = resolve_upload_path(relative)
+    stat = os.stat(path)
+    etag, immutable = etag_for(rel, stat)
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    headers: Dict[str, str] = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if download_name:
+        headers["Content-Disposition"] = content_disposition(download_name)
+
+    if DOWNLOAD_MODE == "accel":
+        headers["X-Accel-Redirect"] = f"{DOWNLOAD_ACCEL_PREFIX}/{quote(rel)}"
+        return Response(media_type=media_type, headers=headers)
+    if DOWNLOAD_MODE == "sendfile":
+        headers["X-Sendfile"] = path
+        return Response(media_type=media_type, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range сравнивается строго: слабый ETag никогда не совпадает, файл отдается целиком
+    if range_header and if_range and (if_range.strip() != etag or etag.startswith("W/")):
+        range_header = None
+
+    byte_range = parse_range(range_header, stat.st_size)
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _iter_range(path, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers=headers,
+    )
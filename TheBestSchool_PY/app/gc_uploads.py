@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Сборка мусора в хранилище загрузок: удаляет блобы, на которые больше не
+ссылаются уроки и работы студентов, и брошенные файлы.
+
+Запуск (из каталога app, например по cron раз в сутки):
+    python gc_uploads.py            # удалить
+    python gc_uploads.py --dry-run  # только показать, что будет удалено
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import blob_store
+from database import create_engine
+
+
+async def main(dry_run: bool):
+    engine = create_engine(pool_size=1, max_overflow=0, echo=False)
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            stats = await blob_store.collect_garbage(db, dry_run=dry_run)
+    finally:
+        await engine.dispose()
+
+    mode = "будет удалено" if dry_run else "удалено"
+    print(f"🔄 Исправлено счетчиков ссылок: {stats['reconciled']}")
+    print(f"🗑️  Блобов без ссылок {mode}: {stats['blobs_removed']}")
+    print(f"🗑️  Файлов без записи в базе {mode}: {stats['orphan_files_removed']}")
+    print(f"💾 Освобождается: {stats['bytes_freed'] / (1024 * 1024):.1f} МБ")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сборка мусора в хранилище загрузок")
+    parser.add_argument("--dry-run", action="store_true", help="ничего не удалять")
+    asyncio.run(main(parser.parse_args().dry_run))
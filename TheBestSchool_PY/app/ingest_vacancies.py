@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Загрузка вакансий из выгрузок (JSONL, по объекту в строке; .gz читается без распаковки
+на диск) в таблицу vacancies. Работает только с локальными файлами, сеть не нужна.
+Вакансии с уже известным hh_id обновляются, неизмененные не переписываются.
+
+Запуск (из каталога app):
+    python ingest_vacancies.py dumps/vacancies.jsonl.gz
+    python ingest_vacancies.py dumps/*.jsonl --batch-size 10000
+    python ingest_vacancies.py dumps/vacancies.jsonl.gz --dry-run  # только разбор, без базы
+"""
+
+import argparse
+import asyncio
+
+import vacancy_ingest
+from database import create_engine
+
+
+def print_progress(stats: vacancy_ingest.IngestStats):
+    print(f"⏳ Обработано: {stats.parsed} ({stats.rows_per_second:.0f} строк/с)", end="\r", flush=True)
+
+
+async def main(paths, batch_size: int, dry_run: bool):
+    if dry_run:
+        stats = vacancy_ingest.parse_only(paths, batch_size, on_batch=print_progress)
+    else:
+        engine = create_engine(pool_size=1, max_overflow=0, echo=False)
+        try:
+            stats = await vacancy_ingest.ingest(engine, paths, batch_size, on_batch=print_progress)
+        finally:
+            await engine.dispose()
+
+    print()
+    print(f"📄 Строк в файлах: {stats.lines}, вакансий: {stats.parsed}, пропущено: {stats.skipped}")
+    if not dry_run:
+        print(f"➕ Добавлено: {stats.inserted}")
+        print(f"🔄 Обновлено: {stats.updated}")
+        print(f"⏸️  Без изменений: {stats.unchanged}")
+    print(f"⚡ {stats.elapsed:.1f} с, {stats.rows_per_second:.0f} строк/с")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Загрузка вакансий из выгрузок JSONL")
+    parser.add_argument("paths", nargs="+", help="файлы .jsonl или .jsonl.gz")
+    parser.add_argument("--batch-size", type=int, default=vacancy_ingest.INGEST_BATCH_SIZE, help="строк в одной пачке COPY")
+    parser.add_argument("--dry-run", action="store_true", help="только прочитать и проверить файлы")
+    args = parser.parse_args()
+    asyncio.run(main(args.paths, args.batch_size, args.dry_run))
@@ -1,7 +1,7 @@
+import asyncio
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from routers.auth import router as auth_router
 from routers.users import router as users_router
@@ -13,11 +13,44 @@ from routers.teachers.teachers import router as admin_teachers_router
 from routers.user_course_progress import router as user_course_progress_router
 from routers.student.submissions import router as student_submissions_router
 from routers.admin import router as admin_router
+from routers.files import router as files_router
+
+from database import AsyncSessionLocal
+from refresh_tokens import revoked_families
+from course_recommender import course_index
+import course_ranking
+from auth import token_subject
+from uploads import UploadGuardMiddleware
 
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 app = FastAPI(title="Skillmap API", version="1.0.0")
 
+_background_tasks = set()
+
+@app.on_event("startup")
+async def load_revoked_token_families():
+    """Отозванные цепочки refresh-токенов - в память, чтобы отказывать без запроса к БД"""
+    async with AsyncSessionLocal() as db:
+        await revoked_families.load(db)
+    # Отзывы, сделанные другими воркерами, дочитываются периодически
+    _background_tasks.add(asyncio.create_task(revoked_families.poll(AsyncSessionLocal)))
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+
+@app.on_event("startup")
+async def build_course_index():
+    """Индекс курсов для подбора по вакансиям строится один раз, а не на каждый запрос"""
+    async with AsyncSessionLocal() as db:
+        await course_index.ensure_current(db)
+        # С диска через mmap, если каталог не менялся; иначе строится и сохраняется
+        await course_ranking.course_ranking.ensure_current(db)
+
 # CORS настройки
 ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -26,15 +59,21 @@ ALLOWED_ORIGINS = [
     "http://localhost:5500",
 ]
 
+# Лимиты загрузок - до разбора multipart; добавляется раньше CORS, чтобы
+# ответы 411/413/429/503 тоже получали заголовки CORS
+app.add_middleware(UploadGuardMiddleware, user_key=token_subject)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Total-Count-Estimate", "X-Next-Cursor",
+        "Content-Range", "Accept-Ranges", "ETag", "Content-Disposition", "Location",
+    ],
 )
-UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 # 1. Админские роутеры (включая управление преподавателями)
 app.include_router(admin_router)
 app.include_router(admin_teachers_router)  # /api/teachers - для админов
@@ -51,3 +90,6 @@ app.include_router(vacancies_router)
 
 # 4. Роутеры студентов
 app.include_router(student_submissions_router)
+
+# 5. Загруженные файлы (/uploads)
+app.include_router(files_router)
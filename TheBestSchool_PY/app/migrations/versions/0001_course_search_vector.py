@@ -0,0 +1,45 @@
+"""Полнотекстовый поиск по курсам и индекс назначений по преподавателю
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+Таблицы могли быть созданы через create_tables.py, поэтому все операции
+идемпотентны (IF NOT EXISTS).
+"""
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+COURSE_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(category_name, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(category_name, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+
+def upgrade():
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_lesson_assignments_assigned_by "
+        "ON lesson_assignments (assigned_by)"
+    )
+    op.execute(
+        "ALTER TABLE courses ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({COURSE_SEARCH_VECTOR_SQL}) STORED"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_courses_search_vector "
+        "ON courses USING gin (search_vector)"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_courses_search_vector")
+    op.execute("ALTER TABLE courses DROP COLUMN IF EXISTS search_vector")
+    op.execute("DROP INDEX IF EXISTS ix_lesson_assignments_assigned_by")
@@ -0,0 +1,32 @@
+"""Триграммный индекс для поиска пользователей
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+Выражение индекса должно совпадать с models.USER_SEARCH_SQL и
+user_search.USER_SEARCH_TEXT, иначе планировщик его не использует.
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+USER_SEARCH_SQL = (
+    "lower(coalesce(email, '') || ' ' || coalesce(surname, '') || ' ' || coalesce(name, '') || ' ' || "
+    "coalesce(patronymic, '') || ' ' || coalesce(phone, ''))"
+)
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_users_search_trgm "
+        f"ON users USING gin (({USER_SEARCH_SQL}) gin_trgm_ops)"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_users_search_trgm")
@@ -0,0 +1,29 @@
+"""Индексы для keyset-пагинации списков пользователей и курсов
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # reg_date - ключ сортировки списка пользователей: сравнение строк с NULL отбрасывает
+    # строки, поэтому пустые даты заполняются (неизвестная дата - начало эпохи)
+    op.execute("UPDATE users SET reg_date = 'epoch' WHERE reg_date IS NULL")
+    op.execute("ALTER TABLE users ALTER COLUMN reg_date SET NOT NULL")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_users_reg_date_id ON users (reg_date, id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_users_surname_name_id ON users (surname, name, id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_courses_created_at_id ON courses (created_at, id)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_courses_created_at_id")
+    op.execute("DROP INDEX IF EXISTS ix_users_surname_name_id")
+    op.execute("DROP INDEX IF EXISTS ix_users_reg_date_id")
+    op.execute("ALTER TABLE users ALTER COLUMN reg_date DROP NOT NULL")
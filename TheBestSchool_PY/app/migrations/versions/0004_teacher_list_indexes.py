@@ -0,0 +1,28 @@
+"""Индексы списка преподавателей: роль/активность/ФИО и поиск по кафедре
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_users_type_active_surname "
+        "ON users (type, active, surname, name, id)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_users_department_trgm "
+        "ON users USING gin ((lower(coalesce(department, ''))) gin_trgm_ops)"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_users_department_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_users_type_active_surname")
@@ -0,0 +1,35 @@
+"""Таблица refresh-токенов
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS refresh_tokens (
+            id UUID PRIMARY KEY,
+            user_id UUID NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            family_id UUID NOT NULL,
+            token_hash VARCHAR(64) NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT now(),
+            expires_at TIMESTAMP NOT NULL,
+            used_at TIMESTAMP,
+            revoked_at TIMESTAMP
+        )
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_refresh_tokens_user_id ON refresh_tokens (user_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_refresh_tokens_family_id ON refresh_tokens (family_id)")
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS refresh_tokens")
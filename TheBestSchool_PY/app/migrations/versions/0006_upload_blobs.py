@@ -0,0 +1,32 @@
+"""Хранилище загрузок, адресуемое содержимым
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS upload_blobs (
+            path VARCHAR PRIMARY KEY,
+            sha256 VARCHAR(64) NOT NULL,
+            size INTEGER NOT NULL,
+            ref_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT now(),
+            last_used_at TIMESTAMP DEFAULT now()
+        )
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_upload_blobs_sha256 ON upload_blobs (sha256)")
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS upload_blobs")
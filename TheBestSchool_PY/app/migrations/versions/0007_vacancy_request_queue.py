@@ -0,0 +1,45 @@
+"""Очередь анализа вакансий на user_vacancy_requests
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        ALTER TABLE user_vacancy_requests
+            ADD COLUMN IF NOT EXISTS ranking VARCHAR NOT NULL DEFAULT 'keywords',
+            ADD COLUMN IF NOT EXISTS error TEXT,
+            ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS started_at TIMESTAMP
+        """
+    )
+    # Обработчики выбирают только незавершенные задачи - частичный индекс остается маленьким
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_user_vacancy_requests_queue
+        ON user_vacancy_requests (created_at)
+        WHERE status IN ('pending', 'processing')
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_user_vacancy_requests_queue")
+    op.execute(
+        """
+        ALTER TABLE user_vacancy_requests
+            DROP COLUMN IF EXISTS started_at,
+            DROP COLUMN IF EXISTS attempts,
+            DROP COLUMN IF EXISTS error,
+            DROP COLUMN IF EXISTS ranking
+        """
+    )
@@ -0,0 +1,28 @@
+"""Частичный индекс по revoked_at для дочитывания отозванных цепочек
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Каждый процесс API раз в REVOKED_FAMILIES_POLL_SECONDS читает недавно отозванные цепочки;
+    # отозванных токенов немного, поэтому индекс частичный
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_refresh_tokens_revoked_at
+        ON refresh_tokens (revoked_at)
+        WHERE revoked_at IS NOT NULL
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_refresh_tokens_revoked_at")
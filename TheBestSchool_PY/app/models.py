@@ -1,16 +1,34 @@
 # models.py - ПОЛНОСТЬЮ ПЕРЕПИСАННЫЙ ФАЙЛ
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, JSON, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, JSON, Text, ForeignKey, Computed, Index, DDL, event, text
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.orm import relationship, declarative_base, deferred
 import uuid
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 
 # Создаем базовый класс для моделей
 Base = declarative_base()
 
+# Триграммный поиск пользователей (расширение нужно до создания индексов)
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+# Строка поиска пользователя: должна совпадать с выражением индекса ix_users_search_trgm
+USER_SEARCH_SQL = (
+    "lower(coalesce(email, '') || ' ' || coalesce(surname, '') || ' ' || coalesce(name, '') || ' ' || "
+    "coalesce(patronymic, '') || ' ' || coalesce(phone, ''))"
+)
+
 class User(Base):
     __tablename__ = "users"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index("ix_users_search_trgm", text(f"({USER_SEARCH_SQL}) gin_trgm_ops"), postgresql_using="gin"),
+        # Ключи keyset-пагинации списков пользователей
+        Index("ix_users_reg_date_id", "reg_date", "id"),
+        Index("ix_users_surname_name_id", "surname", "name", "id"),
+        # Список преподавателей: фильтр по роли и активности, сортировка по ФИО
+        Index("ix_users_type_active_surname", "type", "active", "surname", "name", "id"),
+        Index("ix_users_department_trgm", text("(lower(coalesce(department, ''))) gin_trgm_ops"), postgresql_using="gin"),
+        {'extend_existing': True},
+    )
     
     # UUID как первичный ключ
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -22,7 +40,7 @@ class User(Base):
     password = Column(String, nullable=False)
     active = Column(Boolean, default=True)
     up_date = Column(JSON)
-    reg_date = Column(DateTime, server_default=func.now())
+    reg_date = Column(DateTime, nullable=False, server_default=func.now())  # ключ keyset-пагинации - без NULL
     type = Column(String, nullable=False)  # admin, apprentice, teacher, moderator
     
     # Поля для Admin
@@ -109,9 +127,23 @@ class Training(Base):
     teacher = relationship("User", foreign_keys=[teacher_id], back_populates="trainings_as_teacher")
     apprentice = relationship("User", foreign_keys=[apprentice_id], back_populates="trainings_as_apprentice")
 
+# Поисковый вектор курса: русская и английская морфология, веса A (название) > B (категория) > C (описание)
+COURSE_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(category_name, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(category_name, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
 class Course(Base):
     __tablename__ = "courses"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index("ix_courses_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_courses_created_at_id", "created_at", "id"),
+        {'extend_existing': True},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False, index=True)
@@ -124,6 +156,8 @@ class Course(Base):
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
     is_public = Column(Boolean, default=True)
+    # Генерируемая колонка для полнотекстового поиска (не загружается по умолчанию)
+    search_vector = deferred(Column(TSVECTOR, Computed(COURSE_SEARCH_VECTOR_SQL, persisted=True)))
 
     modules = relationship("CourseModule", back_populates="course", cascade="all, delete-orphan")
     vacancies = relationship("CourseVacancy", back_populates="course", cascade="all, delete-orphan")
@@ -208,17 +242,28 @@ class UserCourseProgress(Base):
 
 class UserVacancyRequest(Base):
     __tablename__ = "user_vacancy_requests"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Очередь анализа: обработчики выбирают только незавершенные задачи
+        Index(
+            "ix_user_vacancy_requests_queue", "created_at",
+            postgresql_where=text("status IN ('pending', 'processing')"),
+        ),
+        {'extend_existing': True},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
     vacancy_title = Column(String, nullable=False)
     vacancy_links = Column(JSON, nullable=False)
     user_level = Column(String)
-    status = Column(String, default="pending")
+    ranking = Column(String, nullable=False, default="keywords", server_default="keywords")
+    status = Column(String, default="pending")  # pending -> processing -> completed / failed
     analysis_result = Column(JSON)
+    error = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
     generated_course_id = Column(UUID(as_uuid=True), ForeignKey("courses.id"))
     created_at = Column(DateTime, server_default=func.now())
+    started_at = Column(DateTime)  # взят обработчиком; по нему находятся зависшие задачи
     processed_at = Column(DateTime)
 
     user = relationship("User", back_populates="vacancy_requests")
@@ -231,7 +276,7 @@ class LessonAssignment(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
     lesson_id = Column(UUID(as_uuid=True), ForeignKey("course_lessons.id"), nullable=False, index=True)
-    assigned_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    assigned_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
     assigned_at = Column(DateTime, server_default=func.now())
     due_date = Column(DateTime, nullable=True)
     status = Column(String, default="assigned")  # assigned, submitted, reviewed, closed
@@ -275,4 +320,34 @@ class TeacherCourseAssignment(Base):
     # Связи
     teacher = relationship("User", foreign_keys=[teacher_id], backref="course_assignments")
     course = relationship("Course", backref="teacher_assignments")
-    assigner = relationship("User", foreign_keys=[assigned_by])
\ No newline at end of file
+    assigner = relationship("User", foreign_keys=[assigned_by])
+
+class RefreshToken(Base):
+    """Refresh-токен: хранится только SHA-256, токены одной цепочки ротаций делят family_id"""
+    __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        # Процессы API периодически дочитывают недавно отозванные цепочки
+        Index("ix_refresh_tokens_revoked_at", "revoked_at", postgresql_where=text("revoked_at IS NOT NULL")),
+        {'extend_existing': True},
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    family_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True)
+    created_at = Column(DateTime, server_default=func.now())
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)     # токен обменян на новый (ротация)
+    revoked_at = Column(DateTime, nullable=True)  # выход или обнаружено повторное использование
+
+class UploadBlob(Base):
+    """Файл в хранилище, адресуемом содержимым, и число записей, которые на него ссылаются"""
+    __tablename__ = "upload_blobs"
+    __table_args__ = {'extend_existing': True}
+
+    path = Column(String, primary_key=True)  # относительно UPLOAD_DIR: blobs/ab/<sha256>.pptx
+    sha256 = Column(String(64), nullable=False, index=True)
+    size = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, server_default=func.now())
+    last_used_at = Column(DateTime, server_default=func.now())
@@ -0,0 +1,133 @@
+# app/pagination.py - keyset-пагинация списков с подписанными курсорами
+import base64
+import hashlib
+import hmac
+import json
+from datetime import date, datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, Response
+from sqlalchemy import literal, tuple_
+from sqlalchemy.sql import Select
+
+from auth import SECRET_KEY
+
+# Курсор следующей страницы отдается в заголовке, тело ответа остается списком
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+CURSOR_SIGNATURE_BYTES = 16
+
+
+# ============ КУРСОРЫ ============
+def _encode_value(value: Any):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, UUID):
+        return {"u": str(value)}
+    return value
+
+
+def _decode_value(value: Any):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "u" in value:
+            return UUID(value["u"])
+    return value
+
+
+def _sign(scope: str, payload: bytes) -> bytes:
+    digest = hmac.new(SECRET_KEY.encode("utf-8"), scope.encode("utf-8") + b"." + payload, hashlib.sha256)
+    return digest.digest()[:CURSOR_SIGNATURE_BYTES]
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def encode_cursor(scope: str, values: Sequence[Any]) -> str:
+    """
+    Непрозрачный курсор из значений ключа сортировки последней строки.
+    scope - имя списка: курсор одного эндпоинта не принимается другим.
+    """
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":")).encode("utf-8")
+    return f"{_b64encode(payload)}.{_b64encode(_sign(scope, payload))}"
+
+
+def decode_cursor(scope: str, cursor: str) -> Tuple[Any, ...]:
+    """Значения ключа из курсора; поддельный или чужой курсор - 400"""
+    try:
+        payload_part, signature_part = cursor.split(".", 1)
+        payload = _b64decode(payload_part)
+        if not hmac.compare_digest(_b64decode(signature_part), _sign(scope, payload)):
+            raise ValueError("bad signature")
+        return tuple(_decode_value(v) for v in json.loads(payload))
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
+
+
+# ============ KEYSET ============
+class Keyset:
+    """
+    Порядок списка и правило построения курсора.
+    columns - столбцы сортировки, последний из них уникален (обычно id), все
+    сортируются в одном направлении, поэтому условие "после курсора" - одно
+    сравнение строк (a, b, id) > (:a, :b, :id), которое использует составной индекс.
+    Столбцы не должны содержать NULL (сравнение с NULL отбрасывает строки).
+    """
+
+    def __init__(self, scope: str, *columns, descending: bool = False):
+        self.scope = scope
+        self.columns = columns
+        self.descending = descending
+
+    def order_by(self, query: Select) -> Select:
+        if self.descending:
+            return query.order_by(*[column.desc() for column in self.columns])
+        return query.order_by(*self.columns)
+
+    def after(self, values: Sequence[Any]):
+        """Условие "строки после ключа values" в порядке списка"""
+        if len(values) != len(self.columns):
+            raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
+        current = tuple_(*self.columns)
+        boundary = tuple_(*[literal(v, column.type) for v, column in zip(values, self.columns)])
+        return current < boundary if self.descending else current > boundary
+
+    def decode(self, cursor: str) -> Tuple[Any, ...]:
+        return decode_cursor(self.scope, cursor)
+
+    def encode(self, values: Sequence[Any]) -> str:
+        return encode_cursor(self.scope, values)
+
+    def paginate(self, query: Select, cursor: Optional[str], skip: int, limit: int) -> Select:
+        """
+        Упорядочить и ограничить запрос.
+        С курсором - keyset (skip игнорируется), без него - OFFSET для совместимости.
+        Запрашивается limit + 1 строка, чтобы узнать, есть ли следующая страница.
+        """
+        if cursor:
+            query = query.where(self.after(self.decode(cursor)))
+        elif skip:
+            query = query.offset(skip)
+        return self.order_by(query).limit(limit + 1)
+
+    def split(self, rows: List[Any], limit: int, key: Callable[[Any], Sequence[Any]]) -> Tuple[List[Any], Optional[str]]:
+        """Отрезать лишнюю строку и построить курсор следующей страницы (None - страниц больше нет)"""
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, self.encode(key(rows[-1]))
+
+
+def set_next_cursor(response: Response, cursor: Optional[str]):
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -0,0 +1,104 @@
+# app/passwords.py - хэширование паролей argon2 в отдельном ограниченном пуле потоков
+import asyncio
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+# Каждый хэш argon2 занимает argon2__memory_cost КиБ (100 МБ) на время вычисления,
+# поэтому число потоков ограничивает и CPU, и пиковую память процесса
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Сколько операций может ждать свободного потока сверх выполняемых
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+# Сколько ждать места в очереди, прежде чем ответить 503
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "2"))
+
+# Контекст для хэширования паролей; bcrypt - только для проверки старых хэшей
+# (create_admin.py), при входе они пересчитываются в argon2
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    argon2__time_cost=2,
+    argon2__memory_cost=102400,
+    argon2__parallelism=8,
+    argon2__hash_len=32,
+    argon2__salt_len=16,
+    deprecated="auto"
+)
+
+
+class PasswordHasherBusy(HTTPException):
+    """Очередь хэширования переполнена - клиенту стоит повторить запрос позже"""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Сервер перегружен, повторите попытку позже",
+            headers={"Retry-After": str(max(1, int(PASSWORD_HASH_QUEUE_TIMEOUT)))},
+        )
+
+
+def hash_password(password: str) -> str:
+    """Синхронное хэширование (для скриптов; в обработчиках - password_hasher.hash)"""
+    return pwd_context.hash(password)
+
+
+def verify_and_update(password: str, stored: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    Проверить пароль. Второе значение - новый хэш, если сохраненное значение
+    нужно заменить: пароль хранился открытым текстом (старые записи) или
+    хэш устарел (bcrypt, другие параметры argon2).
+    """
+    if not stored:
+        return False, None
+    if pwd_context.identify(stored) is None:
+        # Старые записи хранят пароль как есть
+        if not hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8")):
+            return False, None
+        return True, pwd_context.hash(password)
+    return pwd_context.verify_and_update(password, stored)
+
+
+class PasswordHasher:
+    """
+    Выполняет argon2 в пуле потоков, не блокируя цикл событий
+    (argon2-cffi отпускает GIL на время вычисления).
+    Одновременно выполняется не больше workers операций и ждет не больше
+    max_pending; остальные запросы получают 503 (PasswordHasherBusy).
+    """
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_QUEUE,
+        queue_timeout: float = PASSWORD_HASH_QUEUE_TIMEOUT
+    ):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = asyncio.Semaphore(workers + max_pending)
+
+    async def _run(self, fn, *args):
+        # asyncio.timeout, а не wait_for: wait_for (Python <= 3.11) может отменить
+        # ожидание уже после того, как семафор выдан, и место в нем пропадет навсегда
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await self._slots.acquire()
+        except TimeoutError:
+            raise PasswordHasherBusy()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, stored: Optional[str]) -> Tuple[bool, Optional[str]]:
+        return await self._run(verify_and_update, password, stored)
+
+
+password_hasher = PasswordHasher()
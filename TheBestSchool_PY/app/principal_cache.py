@@ -0,0 +1,80 @@
+# app/principal_cache.py - кэш авторизованных пользователей (роль и активность)
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+# Сколько секунд доверять закэшированной роли пользователя и claims токена после его выпуска
+AUTH_PRINCIPAL_TTL = float(os.getenv("AUTH_PRINCIPAL_TTL", "60"))
+AUTH_PRINCIPAL_MAX_ENTRIES = int(os.getenv("AUTH_PRINCIPAL_MAX_ENTRIES", "10000"))
+# Доверять ли роли и активности, записанным в JWT при входе
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "true").lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Минимум о пользователе, нужный для проверки прав: без загрузки строки users"""
+    id: UUID
+    type: str
+    active: bool
+
+
+class PrincipalCache:
+    """
+    Кэш Principal по id пользователя с TTL.
+    invalidate() вызывается при смене роли, активности и удалении: запись
+    удаляется, а токены, выпущенные до этого момента, перестают проходить
+    по claims из JWT и снова проверяются по базе.
+    Кэш и отметки invalidate() живут в процессе, поэтому claims токена принимаются
+    только в течение TTL после его выпуска (iat), дальше роль читается из базы:
+    в других воркерах изменение роли или активности вступает в силу не позже
+    чем через TTL.
+    """
+
+    def __init__(self, ttl: float = AUTH_PRINCIPAL_TTL, max_entries: int = AUTH_PRINCIPAL_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[UUID, Tuple[float, Principal]] = {}
+        self._invalidated_at: Dict[UUID, float] = {}
+
+    def get(self, user_id: UUID) -> Optional[Principal]:
+        item = self._entries.get(user_id)
+        if item is None:
+            return None
+        expires_at, principal = item
+        if expires_at < time.monotonic():
+            self._entries.pop(user_id, None)
+            return None
+        return principal
+
+    def put(self, principal: Principal):
+        if len(self._entries) >= self.max_entries:
+            # Сначала выбрасываем просроченные, при нехватке места - самые старые
+            now = time.monotonic()
+            self._entries = {k: v for k, v in self._entries.items() if v[0] >= now}
+            while len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+        self._entries[principal.id] = (time.monotonic() + self.ttl, principal)
+
+    def invalidate(self, user_id):
+        user_id = UUID(str(user_id))
+        now = time.time()
+        self._entries.pop(user_id, None)
+        # Отметки старше TTL не нужны: claims токенов, выпущенных до них, уже не принимаются
+        self._invalidated_at = {k: v for k, v in self._invalidated_at.items() if now - v <= self.ttl}
+        self._invalidated_at[user_id] = now
+
+    def from_claims(self, user_id: UUID, payload: dict) -> Optional[Principal]:
+        """Principal из claims токена, если им можно доверять"""
+        if not AUTH_TRUST_TOKEN_CLAIMS or "type" not in payload or "iat" not in payload:
+            return None
+        if time.time() - payload["iat"] > self.ttl:
+            return None
+        invalidated_at = self._invalidated_at.get(user_id)
+        if invalidated_at is not None and payload["iat"] <= invalidated_at:
+            return None
+        return Principal(id=user_id, type=payload["type"], active=bool(payload.get("active", True)))
+
+
+principal_cache = PrincipalCache()
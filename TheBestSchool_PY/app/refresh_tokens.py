@@ -0,0 +1,156 @@
+# app/refresh_tokens.py - ротация refresh-токенов с обнаружением повторного использования
+import asyncio
+import hashlib
+import os
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# Как часто каждый процесс дочитывает цепочки, отозванные другими процессами
+REVOKED_FAMILIES_POLL_SECONDS = float(os.getenv("REVOKED_FAMILIES_POLL_SECONDS", "30"))
+# Запас окна дочитывания: расхождение часов между процессами и долгие транзакции отзыва
+REVOKED_FAMILIES_POLL_OVERLAP = timedelta(seconds=60)
+
+
+def _hash_token(token: str) -> str:
+    # Токен - 256 случайных бит, поэтому быстрого SHA-256 достаточно (argon2 не нужен)
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _invalid_token_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Недействительный refresh-токен",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+class RevokedFamilies:
+    """
+    Отозванные цепочки токенов в памяти процесса: отказ без запроса к БД.
+    Access-токены несут family_id в claim "fam", поэтому отзыв цепочки отключает
+    и выданные по ней access-токены: в процессе, который отозвал, - сразу, в остальных
+    воркерах и репликах - после очередного poll, то есть с задержкой до
+    REVOKED_FAMILIES_POLL_SECONDS. Refresh-токены на это не полагаются: rotate всегда
+    проверяет revoked_at строки в БД.
+    """
+
+    def __init__(self):
+        self._families: Set[str] = set()
+        self._loaded_at: Optional[datetime] = None
+
+    def __contains__(self, family_id) -> bool:
+        return family_id is not None and str(family_id) in self._families
+
+    def add(self, family_id):
+        self._families.add(str(family_id))
+
+    async def load(self, db: AsyncSession):
+        """
+        Загрузить цепочки, отозванные в БД, пока их токены еще не истекли.
+        Повторный вызов читает только отозванные после предыдущего (с запасом).
+        """
+        started = datetime.utcnow()
+        query = (
+            select(models.RefreshToken.family_id)
+            .where(
+                models.RefreshToken.revoked_at.isnot(None),
+                models.RefreshToken.expires_at > started,
+            )
+            .distinct()
+        )
+        if self._loaded_at is not None:
+            query = query.where(models.RefreshToken.revoked_at > self._loaded_at - REVOKED_FAMILIES_POLL_OVERLAP)
+        result = await db.execute(query)
+        for family_id in result.scalars().all():
+            self.add(family_id)
+        self._loaded_at = started
+
+    async def poll(self, session_factory, interval: float = REVOKED_FAMILIES_POLL_SECONDS):
+        """Фоновая задача процесса API: раз в interval дочитывать отзывы из других процессов"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with session_factory() as db:
+                    await self.load(db)
+            except Exception as e:
+                print(f"❌ Не удалось обновить отозванные цепочки токенов: {e}")
+
+
+revoked_families = RevokedFamilies()
+
+
+async def issue(db: AsyncSession, user_id, family_id=None) -> Tuple[str, uuid.UUID]:
+    """
+    Выпустить refresh-токен (новую цепочку или следующий в цепочке family_id).
+    Токен начинается с family_id, чтобы отозванную цепочку отклонять без запроса к БД.
+    """
+    family_id = family_id or uuid.uuid4()
+    token = f"{family_id}.{secrets.token_urlsafe(32)}"
+    db.add(models.RefreshToken(
+        user_id=user_id,
+        family_id=family_id,
+        token_hash=_hash_token(token),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    await db.flush()
+    return token, family_id
+
+
+async def revoke_family(db: AsyncSession, family_id):
+    """Отозвать все токены цепочки"""
+    await db.execute(
+        update(models.RefreshToken)
+        .where(
+            models.RefreshToken.family_id == family_id,
+            models.RefreshToken.revoked_at.is_(None),
+        )
+        .values(revoked_at=datetime.utcnow())
+    )
+    revoked_families.add(family_id)
+
+
+async def rotate(db: AsyncSession, token: str) -> Tuple[models.RefreshToken, str]:
+    """
+    Обменять refresh-токен на следующий в той же цепочке.
+    Повторное предъявление уже обменянного токена означает утечку:
+    вся цепочка отзывается, и ни вор, ни владелец больше не могут ею пользоваться.
+    Возвращает (старую запись, новый токен); commit выполняет вызывающий.
+    """
+    if token.split(".", 1)[0] in revoked_families:
+        raise _invalid_token_exception()
+
+    stored = (await db.execute(
+        select(models.RefreshToken)
+        .where(models.RefreshToken.token_hash == _hash_token(token))
+        .with_for_update()
+    )).scalar_one_or_none()
+
+    if stored is None or stored.family_id in revoked_families:
+        raise _invalid_token_exception()
+    if stored.revoked_at is not None or stored.expires_at <= datetime.utcnow():
+        raise _invalid_token_exception()
+    if stored.used_at is not None:
+        await revoke_family(db, stored.family_id)
+        await db.commit()
+        raise _invalid_token_exception()
+
+    stored.used_at = datetime.utcnow()
+    new_token, _ = await issue(db, stored.user_id, stored.family_id)
+    return stored, new_token
+
+
+async def find_family(db: AsyncSession, token: str) -> Optional[uuid.UUID]:
+    """family_id токена (для выхода) или None, если токен неизвестен"""
+    return await db.scalar(
+        select(models.RefreshToken.family_id)
+        .where(models.RefreshToken.token_hash == _hash_token(token))
+    )
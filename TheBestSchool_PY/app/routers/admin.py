@@ -1,19 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from fastapi.params import Body
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, func, and_
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 import uuid
-import json
+import os
 
+import database
 from database import get_db
-from auth import require_role
+from auth import Principal, require_role
 import models
+import course_queries
+import pagination
+import teacher_queries
+import user_search
+from admin_stats import admin_stats_snapshot
+from catalog_cache import catalog_cache
+from course_recommender import course_index
+from principal_cache import principal_cache
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
+# Порядок списков: последний столбец (id) делает ключ сортировки уникальным
+USERS_KEYSET = pagination.Keyset("admin.users", models.User.reg_date, models.User.id, descending=True)
+COURSES_KEYSET = pagination.Keyset("admin.courses", models.Course.created_at, models.Course.id, descending=True)
+TEACHERS_KEYSET = pagination.Keyset("admin.teachers", models.User.surname, models.User.name, models.User.id)
+
+
 # ============ ПОМОЩНИКИ ============
 async def _get_user_or_404(db: AsyncSession, user_id: str) -> models.User:
     """Получить пользователя по ID или вернуть 404"""
@@ -118,11 +132,13 @@ def _serialize_course(course: models.Course, student_count: int = 0) -> Dict[str
 # ============ ЭНДПОИНТЫ ПОЛЬЗОВАТЕЛЕЙ ============
 @router.get("/users", response_model=List[Dict[str, Any]])
 async def get_users(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     type_filter: Optional[str] = Query(None, alias="type"),
     active_only: Optional[bool] = Query(None, alias="active"),
     search: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
     _ = Depends(require_role("admin"))
 ):
@@ -130,9 +146,11 @@ async def get_users(
     Получить список пользователей с фильтрацией
     - type: фильтр по роли (admin, teacher, apprentice, moderator)
     - active: фильтр по активности
-    - search: поиск по email, имени, фамилии, телефону
+    - search: поиск по email, имени, фамилии, отчеству, телефону
+    - cursor: значение заголовка X-Next-Cursor предыдущей страницы (вместо skip)
+    На первой странице в заголовке X-Total-Count-Estimate - оценка общего числа строк.
     """
-    query = select(models.User).order_by(models.User.reg_date.desc())
+    query = select(models.User)
     
     # Фильтры
     filters = []
@@ -140,28 +158,71 @@ async def get_users(
         filters.append(models.User.type == type_filter)
     if active_only is not None:
         filters.append(models.User.active == active_only)
-    if search:
-        search_term = f"%{search}%"
-        filters.append(or_(
-            models.User.email.ilike(search_term),
-            models.User.name.ilike(search_term),
-            models.User.surname.ilike(search_term),
-            models.User.patronymic.ilike(search_term),
-            models.User.phone.ilike(search_term),
-        ))
     
     if filters:
         query = query.where(and_(*filters))
+    query = user_search.apply_user_search(query, search)
+    
+    if not cursor and skip == 0:
+        response.headers[user_search.TOTAL_ESTIMATE_HEADER] = str(await user_search.estimate_count(db, query))
     
     # Пагинация
-    query = query.offset(skip).limit(limit)
+    query = USERS_KEYSET.paginate(query, cursor, skip, limit)
     
     # Выполнение запроса
     result = await db.execute(query)
-    users = result.scalars().all()
+    users, next_cursor = USERS_KEYSET.split(
+        result.scalars().all(), limit, lambda user: (user.reg_date, user.id)
+    )
+    pagination.set_next_cursor(response, next_cursor)
     
     return [_serialize_user(user) for user in users]
 
+# Раньше /users/{user_id}: иначе "teachers" разбирается как id пользователя
+@router.get("/users/teachers")
+async def get_all_teachers(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    search: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    _ = Depends(require_role("admin"))
+):
+    """
+    Получить всех преподавателей
+    - cursor: значение заголовка X-Next-Cursor предыдущей страницы (вместо skip)
+    """
+    if not cursor and skip == 0:
+        estimate = await user_search.estimate_count(db, teacher_queries.teachers_query(search))
+        response.headers[user_search.TOTAL_ESTIMATE_HEADER] = str(estimate)
+    
+    # Число назначенных курсов приходит в той же строке, что и преподаватель
+    query = TEACHERS_KEYSET.paginate(
+        teacher_queries.teachers_query(search, with_courses_count=True), cursor, skip, limit
+    )
+    result = await db.execute(query)
+    rows, next_cursor = TEACHERS_KEYSET.split(
+        result.all(), limit, lambda row: (row.User.surname, row.User.name, row.User.id)
+    )
+    pagination.set_next_cursor(response, next_cursor)
+    
+    teachers_list = []
+    for teacher, courses_count in rows:
+        teachers_list.append({
+            "id": str(teacher.id),
+            "name": f"{teacher.surname} {teacher.name}",
+            "email": teacher.email,
+            "phone": teacher.phone or "",
+            "department": teacher.department or "",
+            "title": teacher.title or "",
+            "active": bool(teacher.active),
+            "hire_date": teacher.hire_date or "",
+            "courses_count": courses_count
+        })
+    
+    return teachers_list
+
 @router.get("/users/{user_id}", response_model=Dict[str, Any])
 async def get_user_details(
     user_id: str,
@@ -214,6 +275,7 @@ async def update_user_role(
     db.add(user)
     await db.commit()
     await db.refresh(user)
+    principal_cache.invalidate(user.id)
     
     return {
         "message": "Роль успешно обновлена",
@@ -253,6 +315,7 @@ async def update_user_status(
     db.add(user)
     await db.commit()
     await db.refresh(user)
+    principal_cache.invalidate(user.id)
     
     action = "активирован" if user.active else "деактивирован"
     return {
@@ -305,6 +368,7 @@ async def enroll_user_to_course(
         db.add(course)
         await db.commit()
         await db.refresh(course)
+        course_index.upsert(course, await catalog_cache.bump_catalog())
     
     # Проверка, уже ли зачислен
     existing_enrollment = await db.execute(
@@ -346,35 +410,34 @@ async def enroll_user_to_course(
 # ============ ЭНДПОИНТЫ КУРСОВ ============
 @router.get("/courses", response_model=List[Dict[str, Any]])
 async def get_courses(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     category: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
     _ = Depends(require_role("admin"))
 ):
-    """Получить список курсов"""
-    query = select(models.Course).order_by(models.Course.created_at.desc())
+    """
+    Получить список курсов
+    - cursor: значение заголовка X-Next-Cursor предыдущей страницы (вместо skip)
+    """
+    query = course_queries.course_catalog_query()
     
     if category:
         query = query.where(models.Course.category == category)
     
-    query = query.offset(skip).limit(limit)
+    query = COURSES_KEYSET.paginate(query, cursor, skip, limit)
     result = await db.execute(query)
-    courses = result.scalars().all()
-    
-    # Получение количества студентов для каждого курса
-    serialized_courses = []
-    for course in courses:
-        # Подсчет студентов на курсе
-        count_result = await db.execute(
-            select(func.count(models.UserCourseProgress.id))
-            .where(models.UserCourseProgress.course_id == course.id)
-        )
-        student_count = count_result.scalar() or 0
-        
-        serialized_courses.append(_serialize_course(course, student_count))
+    rows, next_cursor = COURSES_KEYSET.split(
+        result.all(), limit, lambda row: (row.Course.created_at, row.Course.id)
+    )
+    pagination.set_next_cursor(response, next_cursor)
     
-    return serialized_courses
+    return [
+        _serialize_course(course, student_count)
+        for course, student_count, module_count in rows
+    ]
 
 @router.get("/courses/{course_id}", response_model=Dict[str, Any])
 async def get_course_details(
@@ -383,7 +446,11 @@ async def get_course_details(
     _ = Depends(require_role("admin"))
 ):
     """Получить детальную информацию о курсе"""
-    course = await _get_course_or_404(db, course_id)
+    # Курс, модули и уроки - одним запросом
+    tree = await course_queries.load_course_tree(db, course_id)
+    if not tree:
+        raise HTTPException(status_code=404, detail="Курс не найден")
+    course, modules = tree
     
     # Подсчет студентов
     count_result = await db.execute(
@@ -392,25 +459,17 @@ async def get_course_details(
     )
     student_count = count_result.scalar() or 0
     
-    # Загрузка связанных данных (модули, уроки)
-    course_with_modules = await db.execute(
-        select(models.Course)
-        .options(selectinload(models.Course.modules).selectinload(models.CourseModule.lessons))
-        .where(models.Course.id == course.id)
-    )
-    course = course_with_modules.scalar_one()
-    
     course_data = _serialize_course(course, student_count)
     
     # Добавление информации о модулях и уроках
     modules_data = []
-    for module in course.modules:
+    for module, lessons in modules:
         module_data = {
             "id": str(module.id),
             "title": module.title or "",
             "description": module.description or "",
             "order": module.order or 0,
-            "lesson_count": len(module.lessons) if module.lessons else 0,
+            "lesson_count": len(lessons),
             "lessons": [
                 {
                     "id": str(lesson.id),
@@ -419,8 +478,8 @@ async def get_course_details(
                     "has_pptx": bool(lesson.pptx_url),
                     "has_homework": bool(lesson.homework_url)
                 }
-                for lesson in module.lessons
-            ] if module.lessons else []
+                for lesson in lessons
+            ]
         }
         modules_data.append(module_data)
     
@@ -479,6 +538,7 @@ async def create_course(
     db.add(course)
     await db.commit()
     await db.refresh(course)
+    course_index.upsert(course, await catalog_cache.bump_catalog())
     
     return {
         "message": "Курс успешно создан",
@@ -532,6 +592,8 @@ async def update_course(
     db.add(course)
     await db.commit()
     await db.refresh(course)
+    course_index.upsert(course, await catalog_cache.bump_catalog())
+    await catalog_cache.bump_course(course.id)
     
     # Подсчет студентов для ответа
     count_result = await db.execute(
@@ -569,6 +631,8 @@ async def delete_course(
     
     await db.delete(course)
     await db.commit()
+    course_index.remove(course_id, await catalog_cache.bump_catalog())
+    await catalog_cache.drop_course(course_id)
     
     return {
         "message": "Курс успешно удален",
@@ -579,73 +643,23 @@ async def delete_course(
 # ============ СТАТИСТИКА ============
 @router.get("/stats")
 async def get_admin_stats(
+    fresh: bool = Query(False),
     db: AsyncSession = Depends(get_db),
     _ = Depends(require_role("admin"))
 ):
-    """Получить статистику для админ-панели"""
-    
-    # Общее количество пользователей по типам
-    user_type_counts = {}
-    for user_type in ["admin", "teacher", "apprentice", "moderator"]:
-        count_result = await db.execute(
-            select(func.count(models.User.id))
-            .where(models.User.type == user_type)
-        )
-        user_type_counts[user_type] = count_result.scalar() or 0
-    
-    # Активные пользователи
-    active_users_result = await db.execute(
-        select(func.count(models.User.id))
-        .where(models.User.active == True)
-    )
-    active_users = active_users_result.scalar() or 0
-    
-    # Всего курсов
-    total_courses_result = await db.execute(
-        select(func.count(models.Course.id))
-    )
-    total_courses = total_courses_result.scalar() or 0
-    
-    # Публичные курсы
-    public_courses_result = await db.execute(
-        select(func.count(models.Course.id))
-        .where(models.Course.is_public == True)
-    )
-    public_courses = public_courses_result.scalar() or 0
-    
-    # Всего зачислений
-    total_enrollments_result = await db.execute(
-        select(func.count(models.UserCourseProgress.id))
-    )
-    total_enrollments = total_enrollments_result.scalar() or 0
-    
-    # Курсы по категориям
-    category_counts = {}
-    categories_result = await db.execute(
-        select(models.Course.category, func.count(models.Course.id))
-        .group_by(models.Course.category)
-    )
-    for category, count in categories_result.all():
-        category_counts[category] = count
-    
-    return {
-        "users": {
-            "total": sum(user_type_counts.values()),
-            "by_type": user_type_counts,
-            "active": active_users,
-            "inactive": sum(user_type_counts.values()) - active_users
-        },
-        "courses": {
-            "total": total_courses,
-            "public": public_courses,
-            "private": total_courses - public_courses,
-            "by_category": category_counts
-        },
-        "enrollments": {
-            "total": total_enrollments,
-            "average_per_course": round(total_enrollments / total_courses, 2) if total_courses > 0 else 0
-        }
-    }
+    """
+    Получить статистику для админ-панели
+    - fresh: пересчитать, не дожидаясь устаревания снимка (ADMIN_STATS_MAX_AGE)
+    """
+    return await admin_stats_snapshot.get(db, force=fresh)
+
+@router.get("/db/pool")
+async def get_db_pool_stats(_ = Depends(require_role("admin"))):
+    """
+    Состояние пула соединений этого воркера: занятость (saturation), ожидание
+    соединения (wait_*_ms) и таймауты. Метрики считаются на процесс uvicorn.
+    """
+    return {"profile": database.DB_PROFILE, "pid": os.getpid(), **database.pool_stats()}
     
 @router.get("/users/{user_id}/courses-as-student")
 async def get_user_courses_as_student(
@@ -696,32 +710,19 @@ async def get_user_courses_as_teacher(
     """Получить курсы, которые ведет пользователь как преподаватель"""
     user = await _get_user_or_404(db, user_id)
     
-    # Получаем курсы, где пользователь является преподавателем
-    # (предполагаем, что в модели Course есть поле teacher_id)
+    # Курсы, на которые пользователь назначен преподавателем
+    assigned_course_ids = select(models.TeacherCourseAssignment.course_id).where(
+        models.TeacherCourseAssignment.teacher_id == user.id,
+        models.TeacherCourseAssignment.status == "active"
+    )
     result = await db.execute(
-        select(models.Course)
-        .where(models.Course.teacher_id == user.id)
+        course_queries.course_catalog_query()
+        .where(models.Course.id.in_(assigned_course_ids))
         .order_by(models.Course.created_at.desc())
     )
     
-    courses = result.scalars().all()
-    
     formatted_courses = []
-    for course in courses:
-        # Подсчитываем количество студентов на курсе
-        student_count_result = await db.execute(
-            select(func.count(models.UserCourseProgress.id))
-            .where(models.UserCourseProgress.course_id == course.id)
-        )
-        student_count = student_count_result.scalar() or 0
-        
-        # Подсчитываем количество модулей
-        module_count_result = await db.execute(
-            select(func.count(models.CourseModule.id))
-            .where(models.CourseModule.course_id == course.id)
-        )
-        module_count = module_count_result.scalar() or 0
-        
+    for course, student_count, module_count in result.all():
         formatted_courses.append({
             "course_id": str(course.id),
             "course_name": course.name,
@@ -780,7 +781,7 @@ async def assign_teacher_to_course(
     course_id: uuid.UUID,
     payload: Dict[str, Any] = Body(...),
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("admin"))
+    current_user: Principal = Depends(require_role("admin"))
 ):
     """Назначить преподавателя на курс"""
     teacher_id = payload.get("teacher_id")
@@ -868,112 +869,34 @@ async def remove_teacher_from_course(
 @router.get("/teachers/available")
 async def get_available_teachers(
     course_id: Optional[uuid.UUID] = Query(None),
+    search: Optional[str] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
     db: AsyncSession = Depends(get_db),
     _ = Depends(require_role("admin"))
 ):
-    """Получить доступных преподавателей (не назначенных на курс)"""
-    # Получаем всех преподавателей
-    teachers_query = select(models.User).where(
-        models.User.type == "teacher",
-        models.User.active == True
-    ).order_by(models.User.surname, models.User.name)
-    
-    result = await db.execute(teachers_query)
-    all_teachers = result.scalars().all()
+    """
+    Получить доступных преподавателей (не назначенных на курс)
+    - course_id: отметить is_assigned для этого курса
+    - search: поиск по имени, фамилии, email, отделу
+    - skip/limit: необязательная пагинация; по умолчанию - весь список (для окна назначения)
+    """
+    rows = await teacher_queries.get_teachers_with_course_assignments(
+        db, course_id=course_id, search=search, skip=skip, limit=limit
+    )
     
     available_teachers = []
-    
-    for teacher in all_teachers:
+    for teacher, assigned_courses, is_assigned in rows:
         teacher_data = {
             "id": str(teacher.id),
             "name": f"{teacher.surname} {teacher.name}",
             "email": teacher.email,
             "department": teacher.department or "",
             "title": teacher.title or "",
-            "assigned_courses": []
+            "assigned_courses": assigned_courses,
         }
-        
-        # Если указан course_id, проверяем назначен ли уже преподаватель на этот курс
         if course_id:
-            assignment_result = await db.execute(
-                select(models.TeacherCourseAssignment).where(
-                    models.TeacherCourseAssignment.course_id == course_id,
-                    models.TeacherCourseAssignment.teacher_id == teacher.id,
-                    models.TeacherCourseAssignment.status == "active"
-                )
-            )
-            
-            is_assigned = assignment_result.scalar_one_or_none() is not None
-            teacher_data["is_assigned"] = is_assigned
-        
-        # Получаем курсы на которые назначен преподаватель
-        assignments_result = await db.execute(
-            select(models.TeacherCourseAssignment, models.Course)
-            .join(models.Course, models.TeacherCourseAssignment.course_id == models.Course.id)
-            .where(
-                models.TeacherCourseAssignment.teacher_id == teacher.id,
-                models.TeacherCourseAssignment.status == "active"
-            )
-        )
-        
-        for assignment, course in assignments_result.all():
-            teacher_data["assigned_courses"].append({
-                "course_id": str(course.id),
-                "course_name": course.name,
-                "assigned_at": assignment.assigned_at.isoformat() if assignment.assigned_at else None
-            })
-        
+            teacher_data["is_assigned"] = bool(is_assigned)
         available_teachers.append(teacher_data)
     
-    return available_teachers
-
-@router.get("/users/teachers")
-async def get_all_teachers(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=1000),
-    search: Optional[str] = Query(None),
-    db: AsyncSession = Depends(get_db),
-    _ = Depends(require_role("admin"))
-):
-    """Получить всех преподавателей"""
-    query = select(models.User).where(
-        models.User.type == "teacher"
-    ).order_by(models.User.surname, models.User.name)
-    
-    if search:
-        search_term = f"%{search}%"
-        query = query.where(or_(
-            models.User.name.ilike(search_term),
-            models.User.surname.ilike(search_term),
-            models.User.email.ilike(search_term),
-        ))
-    
-    query = query.offset(skip).limit(limit)
-    result = await db.execute(query)
-    teachers = result.scalars().all()
-    
-    teachers_list = []
-    for teacher in teachers:
-        # Подсчитываем количество назначенных курсов
-        courses_count_result = await db.execute(
-            select(func.count(models.TeacherCourseAssignment.id))
-            .where(
-                models.TeacherCourseAssignment.teacher_id == teacher.id,
-                models.TeacherCourseAssignment.status == "active"
-            )
-        )
-        courses_count = courses_count_result.scalar() or 0
-        
-        teachers_list.append({
-            "id": str(teacher.id),
-            "name": f"{teacher.surname} {teacher.name}",
-            "email": teacher.email,
-            "phone": teacher.phone or "",
-            "department": teacher.department or "",
-            "title": teacher.title or "",
-            "active": bool(teacher.active),
-            "hire_date": teacher.hire_date or "",
-            "courses_count": courses_count
-        })
-    
-    return teachers_list
\ No newline at end of file
+    return available_teachers
\ No newline at end of file
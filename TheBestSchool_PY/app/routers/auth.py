@@ -3,10 +3,10 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 import crud
+import models
+import refresh_tokens
 from pydantic import BaseModel, EmailStr, Field
-from auth import create_access_token
-from datetime import timedelta
-import os
+from auth import create_user_access_token
 import schemas
 from typing import Optional
 
@@ -26,7 +26,10 @@ class LoginRequest(BaseModel):
 
 class TokenResponse(BaseModel):
     access: str
-    refresh: str | None = None  # можно добавить refresh token позже
+    refresh: str | None = None
+
+class RefreshRequest(BaseModel):
+    refresh: str
 
 @router.post("/register")
 async def register(
@@ -67,15 +70,18 @@ async def register(
             expected_graduation=""
         )
 
-        # Создаём токен для автоматического входа
-        access_token = create_access_token({"sub": str(user.id)})
+        # Создаём токены для автоматического входа
+        tokens = await _issue_tokens(db, user)
         
         return {
             "ok": True, 
             "user_id": str(user.id),
-            "access": access_token  # Возвращаем токен сразу
+            "access": tokens["access"],  # Возвращаем токен сразу
+            "refresh": tokens["refresh"],
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         # Проверяем, если это ошибка уникальности (дубликат email или телефона)
         if "unique" in str(e).lower() or "duplicate" in str(e).lower():
@@ -88,10 +94,39 @@ async def register(
             detail=f"Ошибка при создании пользователя: {str(e)}"
         )
 
+async def _issue_tokens(db: AsyncSession, user) -> dict:
+    """Новая цепочка refresh-токенов и access-токен к ней"""
+    refresh_token, family_id = await refresh_tokens.issue(db, user.id)
+    await db.commit()
+    return {"access": create_user_access_token(user, family_id), "refresh": refresh_token}
+
 @router.post("/login", response_model=TokenResponse)
 async def login(payload: LoginRequest, db: AsyncSession = Depends(get_db)):
     user = await crud.authenticate_user(db, payload.username, payload.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect email or password")
-    access_token = create_access_token({"sub": str(user.id)})  # Преобразуем UUID в строку
-    return {"access": access_token, "refresh": None}
\ No newline at end of file
+    return await _issue_tokens(db, user)
+
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh(payload: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Обменять refresh-токен на новую пару без проверки пароля.
+    Каждый refresh-токен одноразовый; повторное использование отзывает всю цепочку.
+    """
+    stored, refresh_token = await refresh_tokens.rotate(db, payload.refresh)
+    user = await db.get(models.User, stored.user_id)
+    if user is None or user.active is False:
+        await refresh_tokens.revoke_family(db, stored.family_id)
+        await db.commit()
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Недействительный refresh-токен")
+    await db.commit()
+    return {"access": create_user_access_token(user, stored.family_id), "refresh": refresh_token}
+
+@router.post("/logout")
+async def logout(payload: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    """Выход: отозвать цепочку refresh-токенов и выданные по ней access-токены"""
+    family_id = await refresh_tokens.find_family(db, payload.refresh)
+    if family_id is not None:
+        await refresh_tokens.revoke_family(db, family_id)
+        await db.commit()
+    return {"ok": True}
\ No newline at end of file
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from typing import List, Optional
 from uuid import UUID
 
 import models
-from dependencies import get_db
+import course_queries
+import course_search
+from catalog_cache import catalog_cache, cached_json_response, make_key
+from database import get_db
 
 router = APIRouter(prefix="/api/courses", tags=["courses"])
 
@@ -14,47 +17,79 @@ router = APIRouter(prefix="/api/courses", tags=["courses"])
 # -------------------------------------------------
 @router.get("/", response_model=List[dict])
 async def get_courses(
+    request: Request,
     category: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
 ):
+    version = await catalog_cache.catalog_version()
+    return await cached_json_response(
+        request,
+        make_key("courses", version, category, search),
+        lambda: _load_courses(db, category, search),
+    )
+
+
+async def _load_courses(db: AsyncSession, category: Optional[str], search: Optional[str]) -> List[dict]:
     query = select(models.Course).where(models.Course.is_public.is_(True))
 
     if category:
         query = query.where(models.Course.category == category)
 
     if search:
-        term = f"%{search}%"
-        query = query.where(
-            models.Course.name.ilike(term)
-            | models.Course.description.ilike(term)
-            | models.Course.category_name.ilike(term)
-        )
+        # Полнотекстовый поиск с ранжированием и подсветкой совпадений
+        search_query = course_search.apply_course_search(query, search)
+        if search_query is None:
+            # В запросе нет слов (только знаки) - ищем подстроку как раньше
+            query = course_search.apply_course_ilike(query, search)
+        else:
+            result = await db.execute(search_query)
+            return [
+                {
+                    **_serialize_public_course(row.Course),
+                    "rank": float(row.rank),
+                    "highlight": {
+                        "name": row.name_highlight,
+                        "description": row.description_highlight,
+                    },
+                }
+                for row in result.all()
+            ]
 
     result = await db.execute(query.order_by(models.Course.created_at))
     courses = result.scalars().all()
 
-    return [
-        {
-            "id": str(c.id),
-            "name": c.name,
-            "description": c.description,
-            "category": c.category,
-            "category_name": c.category_name,
-            "category_color": c.category_color,
-            "icon": c.icon,
-            "duration": c.duration,
-            "is_public": c.is_public,
-            "created_at": c.created_at.isoformat() if c.created_at else None,
-        }
-        for c in courses
-    ]
+    return [_serialize_public_course(c) for c in courses]
+
+
+def _serialize_public_course(c: models.Course) -> dict:
+    return {
+        "id": str(c.id),
+        "name": c.name,
+        "description": c.description,
+        "category": c.category,
+        "category_name": c.category_name,
+        "category_color": c.category_color,
+        "icon": c.icon,
+        "duration": c.duration,
+        "is_public": c.is_public,
+        "created_at": c.created_at.isoformat() if c.created_at else None,
+    }
 
 # -------------------------------------------------
 # Категории
 # -------------------------------------------------
 @router.get("/categories", response_model=List[dict])
-async def get_categories(db: AsyncSession = Depends(get_db)):
+async def get_categories(request: Request, db: AsyncSession = Depends(get_db)):
+    version = await catalog_cache.catalog_version()
+    return await cached_json_response(
+        request,
+        make_key("categories", version),
+        lambda: _load_categories(db),
+    )
+
+
+async def _load_categories(db: AsyncSession) -> List[dict]:
     result = await db.execute(
         select(
             models.Course.category,
@@ -85,7 +120,16 @@ async def get_categories(db: AsyncSession = Depends(get_db)):
 # Один курс
 # -------------------------------------------------
 @router.get("/{course_id}", response_model=dict)
-async def get_course(course_id: UUID, db: AsyncSession = Depends(get_db)):
+async def get_course(request: Request, course_id: UUID, db: AsyncSession = Depends(get_db)):
+    version = await catalog_cache.course_version(course_id)
+    return await cached_json_response(
+        request,
+        make_key("course", course_id, version),
+        lambda: _load_course(db, course_id),
+    )
+
+
+async def _load_course(db: AsyncSession, course_id: UUID) -> dict:
     course = await db.scalar(
         select(models.Course).where(
             models.Course.id == course_id,
@@ -192,50 +236,42 @@ async def get_module_lessons(
 # Полный курс
 # -------------------------------------------------
 @router.get("/{course_id}/full", response_model=dict)
-async def get_full_course(course_id: UUID, db: AsyncSession = Depends(get_db)):
-    course = await db.scalar(
-        select(models.Course).where(
-            models.Course.id == course_id,
-            models.Course.is_public.is_(True),
-        )
+async def get_full_course(request: Request, course_id: UUID, db: AsyncSession = Depends(get_db)):
+    version = await catalog_cache.course_version(course_id)
+    return await cached_json_response(
+        request,
+        make_key("full", course_id, version),
+        lambda: _load_full_course(db, course_id),
     )
-    if not course:
-        raise HTTPException(status_code=404, detail="Курс не найден")
 
-    modules_result = await db.execute(
-        select(models.CourseModule)
-        .where(models.CourseModule.course_id == course_id)
-        .order_by(models.CourseModule.order)
+
+async def _load_full_course(db: AsyncSession, course_id: UUID) -> dict:
+    tree = await course_queries.load_course_tree(
+        db, course_id, models.Course.is_public.is_(True)
     )
-    modules = modules_result.scalars().all()
-    modules_data = []
-
-    for module in modules:
-        lessons_result = await db.execute(
-            select(models.CourseLesson)
-            .where(models.CourseLesson.module_id == module.id)
-            .order_by(models.CourseLesson.order)
-        )
-        lessons = lessons_result.scalars().all()
-
-        modules_data.append(
-            {
-                "id": str(module.id),
-                "order": module.order,
-                "title": module.title,
-                "description": module.description,
-                "recommended_time": module.recommended_time,
-                "lessons": [
-                    {
-                        "id": str(l.id),
-                        "order": l.order,
-                        "title": l.title,
-                        "description": l.description,
-                    }
-                    for l in lessons
-                ],
-            }
-        )
+    if not tree:
+        raise HTTPException(status_code=404, detail="Курс не найден")
+
+    course, modules = tree
+    modules_data = [
+        {
+            "id": str(module.id),
+            "order": module.order,
+            "title": module.title,
+            "description": module.description,
+            "recommended_time": module.recommended_time,
+            "lessons": [
+                {
+                    "id": str(l.id),
+                    "order": l.order,
+                    "title": l.title,
+                    "description": l.description,
+                }
+                for l in lessons
+            ],
+        }
+        for module, lessons in modules
+    ]
 
     return {
         "course": {
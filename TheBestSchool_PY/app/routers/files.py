@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Request
+
+import downloads
+
+# Публичные URL загрузок (/uploads/...), которые раньше отдавал StaticFiles:
+# теперь с докачкой по Range, ETag и immutable-кэшированием блобов
+router = APIRouter(prefix="/uploads", tags=["files"])
+
+
+@router.api_route("/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_upload(path: str, request: Request):
+    return downloads.file_response(request, path)
@@ -1,23 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, distinct
+from sqlalchemy import select, func
 from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
 import os
-import shutil
-from uuid import uuid4, UUID
-import asyncio
-from fastapi.responses import FileResponse
-import mimetypes
-import aiofiles
-import aiofiles.os as aios
-from sqlalchemy.orm import selectinload
+from uuid import UUID
 from database import get_db
-from auth import require_role
+from auth import Principal, require_role
 import models
 import schemas
-
-UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+import pagination
+import teacher_queries
+import user_search
+import course_queries
+import uploads
+import blob_store
+import downloads
+from catalog_cache import catalog_cache
 
 router = APIRouter(prefix="/api/teacher", tags=["teacher"])
 
@@ -82,110 +80,41 @@ def _serialize_assignment(assignment: models.LessonAssignment,
     
     return data
 
-# app/routers/teachers/teacher_panel.py
-# app/routers/teachers/teacher_panel.py
-import aiofiles
-import aiofiles.os as aios
-
-async def save_file(f: UploadFile) -> Optional[str]:
-    """Асинхронное сохранение файла"""
-    if not f:
-        return None
-    
-    try:
-        # Создаем папку, если ее нет
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-        
-        ext = os.path.splitext(f.filename)[1]
-        name = f"{uuid4()}{ext}"
-        path = os.path.join(UPLOAD_DIR, name)
-        
-        # Асинхронная запись файла
-        async with aiofiles.open(path, "wb") as out:
-            content = await f.read()
-            await out.write(content)
-        
-        # Сбрасываем указатель файла на начало
-        await f.seek(0)
-        
-        return f"/uploads/{name}"
-    except Exception as e:
-        print(f"Ошибка сохранения файла {f.filename}: {e}")
-        return None
-
 # ============ ОСНОВНЫЕ ЭНДПОИНТЫ ============
 @router.get("/dashboard")
 async def get_teacher_dashboard(
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Дашборд преподавателя - основан на назначенных заданиях"""
-    
-    # 1. Курсы, где преподаватель назначил задания
-    courses_query = select(
-        distinct(models.CourseModule.course_id)
-    ).select_from(
-        models.LessonAssignment
-    ).join(
-        models.CourseLesson, models.LessonAssignment.lesson_id == models.CourseLesson.id
-    ).join(
-        models.CourseModule, models.CourseLesson.module_id == models.CourseModule.id
-    ).where(
-        models.LessonAssignment.assigned_by == current_user.id
-    )
-    
-    course_ids_result = await db.execute(courses_query)
-    course_ids = [row[0] for row in course_ids_result.all()]
-    
-    # Получаем информацию о курсах
-    teacher_courses = []
-    for course_id in course_ids:
-        course_result = await db.execute(
-            select(models.Course).where(models.Course.id == course_id)
-        )
-        course = course_result.scalar_one_or_none()
-        if course:
-            teacher_courses.append(_serialize_course_for_teacher(course))
-    
-    # 2. Студенты, которым преподаватель назначил задания
-    students_query = select(
-        distinct(models.LessonAssignment.user_id)
-    ).where(
-        models.LessonAssignment.assigned_by == current_user.id
-    )
-    
-    student_ids_result = await db.execute(students_query)
-    student_ids = [row[0] for row in student_ids_result.all()]
-    
-    # 3. Статистика
-    total_assignments_result = await db.execute(
-        select(func.count(models.LessonAssignment.id))
-        .where(models.LessonAssignment.assigned_by == current_user.id)
-    )
-    total_assignments = total_assignments_result.scalar() or 0
-    
-    # Средний прогресс студентов (по всем курсам)
-    avg_progress_result = await db.execute(
-        select(func.avg(models.User.progress_percent))
-        .where(models.User.id.in_(student_ids) if student_ids else False)
-    )
-    avg_progress = float(avg_progress_result.scalar() or 0)
+    # require_role отдает только id/type/active - профиль для карточки читаем отдельно
+    teacher = await db.get(models.User, current_user.id)
+    if teacher is None:
+        raise HTTPException(status_code=404, detail="Преподаватель не найден")
+
+    # Фиксированное число запросов независимо от количества курсов
+    course_rows = await teacher_queries.get_teacher_courses_with_counts(db, current_user.id)
+    teacher_courses = [
+        _serialize_course_for_teacher(course, student_count)
+        for course, student_count in course_rows
+    ]
+    stats = await teacher_queries.get_teacher_stats(db, current_user.id)
     
     return {
         "teacher": {
             "id": current_user.id,
-            "email": current_user.email,
-            "name": current_user.name or "",
-            "surname": current_user.surname or "",
-            "department": current_user.department or "",
-            "title": current_user.title or "",
-            "hire_date": current_user.hire_date or "",
+            "email": teacher.email,
+            "name": teacher.name or "",
+            "surname": teacher.surname or "",
+            "department": teacher.department or "",
+            "title": teacher.title or "",
+            "hire_date": teacher.hire_date or "",
         },
         "stats": {
             "courses_count": len(teacher_courses),
-            "students_count": len(student_ids),
-            "assignments_count": total_assignments,
-            "avg_progress": round(avg_progress, 1),
+            "students_count": stats["students"],
+            "assignments_count": stats["assignments"],
+            "avg_progress": stats["avg_progress"],
         },
         "courses": teacher_courses,
         "recent_activities": await _get_recent_activities(current_user.id, db)
@@ -194,161 +123,57 @@ async def get_teacher_dashboard(
 @router.get("/stats")
 async def get_teacher_stats(
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Статистика преподавателя"""
-    
-    # Студенты
-    student_ids_result = await db.execute(
-        select(distinct(models.LessonAssignment.user_id))
-        .where(models.LessonAssignment.assigned_by == current_user.id)
-    )
-    student_ids = [row[0] for row in student_ids_result.all()]
-    students_count = len(student_ids)
-    
-    # Курсы
-    course_ids_result = await db.execute(
-        select(distinct(models.CourseModule.course_id))
-        .select_from(models.LessonAssignment)
-        .join(models.CourseLesson, models.LessonAssignment.lesson_id == models.CourseLesson.id)
-        .join(models.CourseModule, models.CourseLesson.module_id == models.CourseModule.id)
-        .where(models.LessonAssignment.assigned_by == current_user.id)
-    )
-    course_ids = [row[0] for row in course_ids_result.all()]
-    courses_count = len(course_ids)
-    
-    # Назначения
-    assignments_count_result = await db.execute(
-        select(func.count(models.LessonAssignment.id))
-        .where(models.LessonAssignment.assigned_by == current_user.id)
-    )
-    assignments_count = assignments_count_result.scalar() or 0
-    
-    # Средний прогресс
-    avg_progress_result = await db.execute(
-        select(func.avg(models.User.progress_percent))
-        .where(models.User.id.in_(student_ids) if student_ids else False)
-    )
-    avg_progress = float(avg_progress_result.scalar() or 0)
-    
-    return {
-        "courses": courses_count,
-        "students": students_count,
-        "assignments": assignments_count,
-        "avg_progress": round(avg_progress, 1)
-    }
+    return await teacher_queries.get_teacher_stats(db, current_user.id)
 
 @router.get("/courses")
 async def get_teacher_courses(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Курсы, где преподаватель назначил задания"""
-    
-    query = select(
-        distinct(models.Course)
-    ).select_from(
-        models.LessonAssignment
-    ).join(
-        models.CourseLesson, models.LessonAssignment.lesson_id == models.CourseLesson.id
-    ).join(
-        models.CourseModule, models.CourseLesson.module_id == models.CourseModule.id
-    ).join(
-        models.Course, models.CourseModule.course_id == models.Course.id
-    ).where(
-        models.LessonAssignment.assigned_by == current_user.id
-    ).order_by(models.Course.created_at.desc())
-    
-    query = query.offset(skip).limit(limit)
-    result = await db.execute(query)
-    courses = result.scalars().all()
-    
-    serialized_courses = []
-    for course in courses:
-        # Подсчет студентов на этом курсе (которым этот преподаватель назначал задания)
-        student_count_result = await db.execute(
-            select(func.count(distinct(models.LessonAssignment.user_id)))
-            .select_from(models.LessonAssignment)
-            .join(models.CourseLesson, models.LessonAssignment.lesson_id == models.CourseLesson.id)
-            .join(models.CourseModule, models.CourseLesson.module_id == models.CourseModule.id)
-            .where(
-                models.LessonAssignment.assigned_by == current_user.id,
-                models.CourseModule.course_id == course.id
-            )
-        )
-        student_count = student_count_result.scalar() or 0
-        
-        serialized_courses.append(_serialize_course_for_teacher(course, student_count))
-    
-    return serialized_courses
+    course_rows = await teacher_queries.get_teacher_courses_with_counts(
+        db, current_user.id, skip=skip, limit=limit
+    )
+    return [
+        _serialize_course_for_teacher(course, student_count)
+        for course, student_count in course_rows
+    ]
 
 @router.get("/students")
 async def get_teacher_students(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     search: str = Query(None),
+    cursor: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
-    """Студенты, которым преподаватель назначил задания"""
-    
-    # Получаем ID студентов
-    subquery = select(
-        distinct(models.LessonAssignment.user_id)
-    ).where(
-        models.LessonAssignment.assigned_by == current_user.id
-    ).subquery()
-    
-    query = select(models.User).where(models.User.id.in_(select(subquery)))
-    
-    # Поиск
-    if search:
-        search_term = f"%{search}%"
-        query = query.where(or_(
-            models.User.name.ilike(search_term),
-            models.User.surname.ilike(search_term),
-            models.User.email.ilike(search_term),
-            models.User.phone.ilike(search_term),
+    """
+    Студенты, которым преподаватель назначил задания
+    - cursor: значение заголовка X-Next-Cursor предыдущей страницы
+      (keyset-пагинация, skip в этом случае игнорируется)
+    На первой странице в заголовке X-Total-Count-Estimate - оценка общего числа студентов.
+    """
+    if not cursor and skip == 0:
+        response.headers[user_search.TOTAL_ESTIMATE_HEADER] = str(await user_search.estimate_count(
+            db, teacher_queries.teacher_students_query(current_user.id, search)
         ))
     
-    query = query.order_by(models.User.surname, models.User.name)
-    query = query.offset(skip).limit(limit)
-    
-    result = await db.execute(query)
-    students = result.scalars().all()
-    
-    serialized_students = []
-    for student in students:
-        # Подсчет заданий для этого студента
-        assignments_count_result = await db.execute(
-            select(func.count(models.LessonAssignment.id))
-            .where(
-                models.LessonAssignment.assigned_by == current_user.id,
-                models.LessonAssignment.user_id == student.id
-            )
-        )
-        assignments_count = assignments_count_result.scalar() or 0
-        
-        # Подсчет курсов для этого студента
-        courses_count_result = await db.execute(
-            select(func.count(distinct(models.CourseModule.course_id)))
-            .select_from(models.LessonAssignment)
-            .join(models.CourseLesson, models.LessonAssignment.lesson_id == models.CourseLesson.id)
-            .join(models.CourseModule, models.CourseLesson.module_id == models.CourseModule.id)
-            .where(
-                models.LessonAssignment.assigned_by == current_user.id,
-                models.LessonAssignment.user_id == student.id
-            )
-        )
-        course_count = courses_count_result.scalar() or 0
-        
-        serialized_students.append(
-            _serialize_student_for_teacher(student, course_count, student.progress_percent or 0)
-        )
+    rows, next_cursor = await teacher_queries.get_teacher_students_with_counts(
+        db, current_user.id, search=search, skip=skip, limit=limit, cursor=cursor
+    )
+    pagination.set_next_cursor(response, next_cursor)
     
-    return serialized_students
+    return [
+        _serialize_student_for_teacher(student, course_count, student.progress_percent or 0)
+        for student, assignments_count, course_count in rows
+    ]
 
 @router.get("/assignments")
 async def get_teacher_assignments(
@@ -357,7 +182,7 @@ async def get_teacher_assignments(
     status: str = Query(None),
     student_id: str = Query(None),
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Назначения преподавателя"""
     
@@ -395,7 +220,7 @@ async def get_teacher_assignments(
 async def create_assignment(
     payload: schemas.LessonAssignmentCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Создание нового назначения"""
     assignment = models.LessonAssignment(
@@ -415,7 +240,7 @@ async def create_assignment(
 async def get_recent_activities(
     limit: int = Query(10, ge=1, le=50),
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Последние активности преподавателя"""
     activities = await _get_recent_activities(current_user.id, db, limit)
@@ -425,7 +250,7 @@ async def get_recent_activities(
 async def get_student_details(
     student_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Детали студента"""
     
@@ -476,7 +301,7 @@ async def get_student_details(
 async def get_submissions(
     assignment_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Получение сабмишенов по заданию"""
     result = await db.execute(
@@ -488,106 +313,39 @@ async def get_submissions(
 # ============ ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ============
 async def _get_recent_activities(teacher_id: str, db: AsyncSession, limit: int = 10) -> List[Dict[str, Any]]:
     """Получить последние активности преподавателя"""
-    activities = []
-    
-    # Последние назначения
-    assignments_result = await db.execute(
-        select(models.LessonAssignment, models.User, models.CourseLesson)
-        .join(models.User, models.LessonAssignment.user_id == models.User.id)
-        .join(models.CourseLesson, models.LessonAssignment.lesson_id == models.CourseLesson.id)
-        .where(models.LessonAssignment.assigned_by == teacher_id)
-        .order_by(models.LessonAssignment.assigned_at.desc())
-        .limit(5)
-    )
-    
-    for assignment, student, lesson in assignments_result.all():
-        activities.append({
-            "id": f"assignment_{assignment.id}",
-            "type": "assignment",
-            "message": f"Назначен урок '{lesson.title}' студенту {student.surname} {student.name}",
-            "date": assignment.assigned_at.isoformat() if assignment.assigned_at else None,
-            "icon": "fa-tasks",
-            "color": "text-blue-600",
-        })
-    
-    # Последние сданные работы
-    week_ago = datetime.now() - timedelta(days=7)
-    submissions_result = await db.execute(
-        select(models.LessonSubmission, models.LessonAssignment, models.User)
-        .join(models.LessonAssignment, models.LessonSubmission.assignment_id == models.LessonAssignment.id)
-        .join(models.User, models.LessonSubmission.user_id == models.User.id)
-        .where(
-            models.LessonAssignment.assigned_by == teacher_id,
-            models.LessonSubmission.created_at >= week_ago
-        )
-        .order_by(models.LessonSubmission.created_at.desc())
-        .limit(5)
-    )
-    
-    for submission, assignment, student in submissions_result.all():
-        activities.append({
-            "id": f"submission_{submission.id}",
-            "type": "submission",
-            "message": f"Студент {student.surname} {student.name} сдал задание",
-            "date": submission.created_at.isoformat() if submission.created_at else None,
-            "icon": "fa-file-upload",
-            "color": "text-green-600",
-        })
-    
-    # Сортируем по дате и ограничиваем
-    activities.sort(key=lambda x: x["date"] or "", reverse=True)
-    return activities[:limit]
+    return await teacher_queries.get_recent_activities(db, teacher_id, limit)
 
 # app/routers/teachers/teacher_panel.py - ДОБАВИТЬ ЭТИ ЭНДПОИНТЫ
 
 @router.get("/assigned-courses")
 async def get_assigned_courses(
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Получить курсы, на которые назначен преподаватель"""
-    # Находим назначения преподавателя на курсы
-    assignments_result = await db.execute(
-        select(models.TeacherCourseAssignment)
-        .where(models.TeacherCourseAssignment.teacher_id == current_user.id)
-        .where(models.TeacherCourseAssignment.status == "active")
+    assigned_course_ids = select(models.TeacherCourseAssignment.course_id).where(
+        models.TeacherCourseAssignment.teacher_id == current_user.id,
+        models.TeacherCourseAssignment.status == "active"
+    )
+    result = await db.execute(
+        course_queries.course_catalog_query()
+        .where(models.Course.id.in_(assigned_course_ids))
     )
-    assignments = assignments_result.scalars().all()
     
     courses_data = []
-    for assignment in assignments:
-        course_result = await db.execute(
-            select(models.Course).where(models.Course.id == assignment.course_id)
-        )
-        course = course_result.scalar_one_or_none()
-        
-        if course:
-            # Считаем студентов на курсе
-            student_count_result = await db.execute(
-                select(func.count(models.UserCourseProgress.id))
-                .where(models.UserCourseProgress.course_id == course.id)
-            )
-            student_count = student_count_result.scalar() or 0
-            
-            # Считаем модули курса
-            module_count_result = await db.execute(
-                select(func.count(models.CourseModule.id))
-                .where(models.CourseModule.course_id == course.id)
-            )
-            module_count = module_count_result.scalar() or 0
-            
-            courses_data.append({
-                "id": str(course.id),
-                "name": course.name,
-                "description": course.description or "",
-                "category": course.category or "",
-                "category_name": course.category_name or "",
-                "category_color": course.category_color or "#1A535C",
-                "student_count": student_count,
-                "module_count": module_count,
-                "duration": course.duration or "",
-                "created_at": course.created_at.isoformat() if course.created_at else None,
-            })
+    for course, student_count, module_count in result.all():
+        courses_data.append({
+            "id": str(course.id),
+            "name": course.name,
+            "description": course.description or "",
+            "category": course.category or "",
+            "category_name": course.category_name or "",
+            "category_color": course.category_color or "#1A535C",
+            "student_count": student_count,
+            "module_count": module_count,
+            "duration": course.duration or "",
+            "created_at": course.created_at.isoformat() if course.created_at else None,
+        })
     
     return courses_data
 
@@ -595,7 +353,7 @@ async def get_assigned_courses(
 async def get_teacher_modules(
     course_id: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Получить модули курсов преподавателя"""
     # Сначала получаем курсы преподавателя
@@ -615,38 +373,22 @@ async def get_teacher_modules(
             raise HTTPException(status_code=403, detail="Нет доступа к этому курсу")
         course_ids = [UUID(course_id)]
     
-    # Получаем модули
-    query = select(
-        models.CourseModule,
-        models.Course.name.label("course_name")
-    ).join(
-        models.Course, models.CourseModule.course_id == models.Course.id
-    ).where(
-        models.CourseModule.course_id.in_(course_ids)
-    ).order_by(models.CourseModule.course_id, models.CourseModule.order)
-    
-    result = await db.execute(query)
-    rows = result.all()
+    # Модули и уроки всех курсов преподавателя - одним запросом
+    trees = await course_queries.load_course_trees(db, models.Course.id.in_(course_ids))
     
     modules = []
-    for module, course_name in rows:
-        # Считаем уроки в модуле
-        lesson_count_result = await db.execute(
-            select(func.count(models.CourseLesson.id))
-            .where(models.CourseLesson.module_id == module.id)
-        )
-        lesson_count = lesson_count_result.scalar() or 0
-        
-        modules.append({
-            "id": str(module.id),
-            "course_id": str(module.course_id),
-            "course_name": course_name,
-            "title": module.title,
-            "description": module.description or "",
-            "order": module.order,
-            "recommended_time": module.recommended_time or "",
-            "lesson_count": lesson_count,
-        })
+    for course, course_modules in trees:
+        for module, lessons in course_modules:
+            modules.append({
+                "id": str(module.id),
+                "course_id": str(module.course_id),
+                "course_name": course.name,
+                "title": module.title,
+                "description": module.description or "",
+                "order": module.order,
+                "recommended_time": module.recommended_time or "",
+                "lesson_count": len(lessons),
+            })
     
     return modules
 
@@ -654,7 +396,7 @@ async def get_teacher_modules(
 async def create_module(
     payload: schemas.ModuleCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Создать модуль в курсе преподавателя"""
     # Проверяем, что преподаватель имеет доступ к курсу
@@ -692,6 +434,7 @@ async def create_module(
     db.add(module)
     await db.commit()
     await db.refresh(module)
+    await catalog_cache.bump_course(module.course_id)
     
     return {
         "id": str(module.id),
@@ -707,7 +450,7 @@ async def get_teacher_lessons(
     course_id: Optional[str] = Query(None),
     module_id: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Получить уроки преподавателя"""
     # Получаем курсы преподавателя
@@ -721,46 +464,31 @@ async def get_teacher_lessons(
     if not teacher_course_ids:
         return []
     
-    # Построение запроса С ПРЕДВАРИТЕЛЬНОЙ ЗАГРУЗКОЙ
-    query = select(
-        models.CourseLesson
-    ).options(
-        selectinload(models.CourseLesson.module).selectinload(models.CourseModule.course)
-    ).join(
-        models.CourseModule, models.CourseLesson.module_id == models.CourseModule.id
-    ).join(
-        models.Course, models.CourseModule.course_id == models.Course.id
-    ).where(
-        models.CourseModule.course_id.in_(teacher_course_ids)
-    )
-    
     # Фильтры
+    criteria = [models.Course.id.in_(teacher_course_ids)]
     if course_id:
-        query = query.where(models.CourseModule.course_id == UUID(course_id))
-    
+        criteria.append(models.Course.id == UUID(course_id))
     if module_id:
-        query = query.where(models.CourseLesson.module_id == UUID(module_id))
-    
-    query = query.order_by(models.CourseLesson.module_id, models.CourseLesson.order)
+        criteria.append(models.CourseModule.id == UUID(module_id))
     
-    result = await db.execute(query)
-    lessons = result.scalars().all()
+    trees = await course_queries.load_course_trees(db, *criteria)
     
-    # Теперь можно безопасно обращаться к связанным данным
     serialized_lessons = []
-    for lesson in lessons:
-        serialized_lessons.append({
-            "id": str(lesson.id),
-            "module_id": str(lesson.module_id),
-            "module_title": lesson.module.title if lesson.module else "",
-            "course_id": str(lesson.module.course_id) if lesson.module else "",
-            "course_name": lesson.module.course.name if lesson.module and lesson.module.course else "",
-            "title": lesson.title,
-            "description": lesson.description or "",
-            "order": lesson.order,
-            "pptx_url": lesson.pptx_url,
-            "homework_url": lesson.homework_url,
-        })
+    for course, course_modules in trees:
+        for module, lessons in course_modules:
+            for lesson in lessons:
+                serialized_lessons.append({
+                    "id": str(lesson.id),
+                    "module_id": str(lesson.module_id),
+                    "module_title": module.title,
+                    "course_id": str(module.course_id),
+                    "course_name": course.name,
+                    "title": lesson.title,
+                    "description": lesson.description or "",
+                    "order": lesson.order,
+                    "pptx_url": lesson.pptx_url,
+                    "homework_url": lesson.homework_url,
+                })
     
     return serialized_lessons
 
@@ -768,7 +496,7 @@ async def get_teacher_lessons(
 async def get_course_students(
     course_id: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Получить студентов на курсах преподавателя"""
     # Получаем курсы преподавателя
@@ -843,7 +571,7 @@ async def create_lesson(
     pptx_file: UploadFile = File(None),
     homework_file: UploadFile = File(None),
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Создать урок в модуле"""
     try:
@@ -894,10 +622,14 @@ async def create_lesson(
         homework_url = None
         
         if pptx_file:
-            pptx_url = await save_file(pptx_file)
+            stored = await uploads.save_upload(pptx_file, uploads.LESSON_PRESENTATION)
+            await blob_store.add_ref(db, stored)
+            pptx_url = stored.url
         
         if homework_file:
-            homework_url = await save_file(homework_file)
+            stored = await uploads.save_upload(homework_file, uploads.LESSON_HOMEWORK)
+            await blob_store.add_ref(db, stored)
+            homework_url = stored.url
         
         # Создаем урок
         lesson = models.CourseLesson(
@@ -912,6 +644,7 @@ async def create_lesson(
         db.add(lesson)
         await db.commit()
         await db.refresh(lesson)
+        await catalog_cache.bump_course(module.course_id)
         
         return {
             "id": str(lesson.id),
@@ -922,6 +655,9 @@ async def create_lesson(
             "pptx_url": lesson.pptx_url,
             "homework_url": lesson.homework_url,
         }
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"Ошибка при создании урока: {str(e)}")
@@ -930,7 +666,7 @@ async def create_lesson(
 async def get_lesson(
     lesson_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Получить информацию об уроке"""
     try:
@@ -992,7 +728,7 @@ async def update_lesson(
     pptx_file: UploadFile = File(None),
     homework_file: UploadFile = File(None),
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    current_user: Principal = Depends(require_role("teacher"))
 ):
     """Обновить урок"""
     try:
@@ -1058,13 +794,21 @@ async def update_lesson(
             lesson.description = description
         
         # Асинхронно сохраняем файлы
+        # Старый файл теряет ссылку и будет удален сборщиком мусора, если больше не нужен
         if pptx_file:
-            lesson.pptx_url = await save_file(pptx_file)
+            stored = await uploads.save_upload(pptx_file, uploads.LESSON_PRESENTATION)
+            await blob_store.add_ref(db, stored)
+            await blob_store.release(db, lesson.pptx_url)
+            lesson.pptx_url = stored.url
         if homework_file:
-            lesson.homework_url = await save_file(homework_file)
+            stored = await uploads.save_upload(homework_file, uploads.LESSON_HOMEWORK)
+            await blob_store.add_ref(db, stored)
+            await blob_store.release(db, lesson.homework_url)
+            lesson.homework_url = stored.url
         
         await db.commit()
         await db.refresh(lesson)
+        await catalog_cache.bump_course(course.id)
         
         return {
             "id": str(lesson.id),
@@ -1075,6 +819,9 @@ async def update_lesson(
             "pptx_url": lesson.pptx_url,
             "homework_url": lesson.homework_url
         }
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"Ошибка при обновлении урока: {str(e)}")
@@ -1082,27 +829,9 @@ async def update_lesson(
 @router.get("/download/{filename:path}")
 async def download_file(
     filename: str,
-    db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("teacher"))
+    request: Request,
+    name: Optional[str] = Query(None, description="Имя файла для сохранения (по умолчанию - из пути)"),
+    current_user: Principal = Depends(require_role("teacher"))
 ):
-    """Скачать файл из папки uploads"""
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    
-    # Проверяем, существует ли файл
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Файл не найден")
-    
-    # Определяем MIME-тип файла
-    mime_type, _ = mimetypes.guess_type(file_path)
-    if mime_type is None:
-        mime_type = "application/octet-stream"
-    
-    # Возвращаем файл с правильными заголовками
-    return FileResponse(
-        path=file_path,
-        filename=filename,
-        media_type=mime_type,
-        headers={
-            "Content-Disposition": f"attachment; filename={filename}"
-        }
-    )
\ No newline at end of file
+    """Скачать файл из папки uploads (с докачкой по Range; за nginx - через X-Accel-Redirect)"""
+    return downloads.file_response(request, filename, download_name=name or os.path.basename(filename))
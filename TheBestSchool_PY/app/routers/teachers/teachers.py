@@ -1,5 +1,5 @@
 # app/routers/teachers/teacher.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List, Optional
@@ -8,8 +8,10 @@ from sqlalchemy import distinct
 import models
 import schemas
 import crud
-from dependencies import get_db
-from auth import get_current_user, require_role
+import pagination
+import teacher_queries
+from database import get_db
+from auth import Principal, get_current_user, require_role
 
 router = APIRouter(
     prefix="/api/teachers",
@@ -27,7 +29,7 @@ router = APIRouter(
 async def create_teacher(
     teacher: schemas.TeacherCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("admin"))
+    current_user: Principal = Depends(require_role("admin"))
 ):
     """Создать нового преподавателя (админ)"""
     # Проверяем, есть ли уже пользователь с таким email
@@ -44,30 +46,25 @@ async def create_teacher(
 # ---------------------------
 @router.get("", response_model=List[schemas.TeacherResponse])
 async def get_teachers(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     search: Optional[str] = Query(None),
     active_only: bool = Query(True),
+    cursor: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("admin"))
+    current_user: Principal = Depends(require_role("admin"))
 ):
-    """Получить список всех преподавателей (админ)"""
-    teachers = await crud.get_users_by_type(db, "teacher", skip, limit)
-    
-    # Фильтрация по поиску
-    if search:
-        search_lower = search.lower()
-        teachers = [
-            t for t in teachers 
-            if (t.name and search_lower in t.name.lower()) or
-               (t.surname and search_lower in t.surname.lower()) or
-               (t.email and search_lower in t.email.lower()) or
-               (t.department and search_lower in t.department.lower())
-        ]
-    
-    # Фильтрация по активности
-    if active_only:
-        teachers = [t for t in teachers if t.active]
+    """
+    Получить список всех преподавателей (админ)
+    - search: поиск по email, ФИО, телефону и кафедре
+    - active_only: только активные преподаватели
+    - cursor: значение заголовка X-Next-Cursor предыдущей страницы (вместо skip)
+    """
+    teachers, next_cursor = await teacher_queries.get_teachers_page(
+        db, search=search, active_only=active_only, skip=skip, limit=limit, cursor=cursor
+    )
+    pagination.set_next_cursor(response, next_cursor)
     
     return teachers
 
@@ -79,7 +76,7 @@ async def get_teachers(
 async def get_teacher(
     teacher_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("admin"))
+    current_user: Principal = Depends(require_role("admin"))
 ):
     """Получить информацию о преподавателе по ID (админ)"""
     teacher = await crud.get_user(db, teacher_id)
@@ -124,7 +121,7 @@ async def update_teacher(
 async def delete_teacher(
     teacher_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("admin"))
+    current_user: Principal = Depends(require_role("admin"))
 ):
     """Удалить преподавателя (админ)"""
     teacher = await crud.get_user(db, teacher_id)
@@ -145,7 +142,7 @@ async def delete_teacher(
 async def get_teacher_stats_admin(
     teacher_id: str,
     db: AsyncSession = Depends(get_db),
-    current_user: models.User = Depends(require_role("admin"))
+    current_user: Principal = Depends(require_role("admin"))
 ):
     """Получить статистику по преподавателю (админ)"""
     teacher = await crud.get_user(db, teacher_id)
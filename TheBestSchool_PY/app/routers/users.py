@@ -1,47 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import Optional
-from jose import jwt, JWTError
 from uuid import UUID
 
 from database import get_db
 from models import User
-from auth import SECRET_KEY, ALGORITHM
+from auth import get_current_user
 
 router = APIRouter(prefix="/api/v1/users", tags=["users"])
 
-async def get_current_user(
-    authorization: Optional[str] = Header(None),
-    db: AsyncSession = Depends(get_db)
-) -> User:
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Неавторизованный доступ")
-    
-    token = authorization[7:]
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Неверный токен")
-        
-        try:
-            user_uuid = UUID(user_id)
-        except ValueError:
-            raise HTTPException(status_code=401, detail="Неверный формат ID пользователя")
-        
-        # Приводим UUID к строке, чтобы сравнение с varchar работало
-        result = await db.execute(select(User).where(User.id == str(user_uuid)))
-        user = result.scalar_one_or_none()
-        if not user:
-            raise HTTPException(status_code=404, detail="Пользователь не найден")
-        
-        return user
-    except JWTError as e:
-        raise HTTPException(status_code=401, detail=f"Неверный токен: {str(e)}")
-
-
 @router.get("/me")
 async def read_current_user(
     current_user: User = Depends(get_current_user)
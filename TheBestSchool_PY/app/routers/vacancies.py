@@ -1,20 +1,50 @@
 # app/vacancies.py - дополненная версия
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+import asyncio
+import json
+import time
+import uuid
 import models
-from database import get_db
+import vacancy_analysis
+import vacancy_jobs
+from auth import get_current_principal
+from principal_cache import Principal
+from course_recommender import course_index, extract_keywords
+from database import AsyncSessionLocal, get_db
 
 router = APIRouter(prefix="/api/v1/vacancies", tags=["vacancies"])
 
+MAX_BATCH_VACANCIES = 200
+# Сколько вакансий пакетного запроса считается за один проход (и отдается одной порцией NDJSON)
+BATCH_CHUNK_SIZE = 16
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Максимальное ожидание результата в long-poll GET /requests/{id}?wait=...
+MAX_JOB_WAIT_SECONDS = 30
+
 # Модель для анализа вакансий
 class VacancyAnalysisRequest(BaseModel):
     title: str
     links: List[str]
     level: Optional[str] = "junior"
+    # keywords - совпадения ключевых слов названия; bm25 - ранжирование по названию,
+    # описанию и навыкам сохраненных вакансий
+    ranking: Literal["keywords", "bm25"] = "keywords"
+
+class VacancyBatchItem(BaseModel):
+    title: str
+    links: List[str] = []
+
+class VacancyBatchRequest(BaseModel):
+    vacancies: List[VacancyBatchItem] = Field(..., min_length=1, max_length=MAX_BATCH_VACANCIES)
+    ranking: Literal["keywords", "bm25"] = "keywords"
+    limit: int = Field(5, ge=1, le=20)
 
 @router.get("/")
 async def get_vacancies(
@@ -65,115 +95,116 @@ async def analyze_vacancies(
 ):
     """Анализ вакансий и рекомендация курсов"""
     try:
-        title = request.title.strip()
-        links = request.links
-        level = request.level
-        
-        if not title:
-            raise HTTPException(status_code=400, detail="Не указано название вакансии")
-        
-        if not links:
-            raise HTTPException(status_code=400, detail="Не указаны ссылки на вакансии")
-        
-        # Парсим ID вакансий из ссылок
-        vacancy_ids = []
-        for link in links:
-            if isinstance(link, str) and "hh.ru/vacancy/" in link:
-                # Извлекаем ID вакансии из URL
-                import re
-                match = re.search(r'hh\.ru/vacancy/(\d+)', link)
-                if match:
-                    vacancy_ids.append(match.group(1))
-        
-        # Получаем все курсы
-        courses_query = select(models.Course).where(models.Course.is_public == True)
-        courses_result = await db.execute(courses_query)
-        all_courses = courses_result.scalars().all()
-        
-        # Простой анализ ключевых слов
-        keywords = set(word.lower() for word in title.split() if len(word) > 2)
-        
-        # Добавляем типичные ключевые слова по категориям
-        category_keywords = {
-            "it": {"frontend", "backend", "react", "python", "javascript", "java", "devops", "data"},
-            "finance": {"finance", "analyst", "accounting", "budget", "investment", "bank"},
-            "law": {"law", "lawyer", "legal", "corporate", "contract", "justice"},
-            "marketing": {"marketing", "digital", "smm", "seo", "content", "advertising"},
-            "management": {"management", "project", "manager", "team", "lead", "product"},
-            "geology": {"geology", "geologist", "mining", "oil", "gas", "resources"},
-            "design": {"design", "designer", "ui", "ux", "interface", "graphic"},
-            "medicine": {"medicine", "clinical", "research", "healthcare", "medical"}
-        }
-        
-        # Рекомендуем курсы на основе ключевых слов
-        recommended_courses = []
-        for course in all_courses:
-            score = 0
-            reasons = []
-            
-            # Проверяем совпадение по названию вакансии
-            course_name_lower = course.name.lower()
-            for keyword in keywords:
-                if keyword in course_name_lower:
-                    score += 3
-                    reasons.append(f"Ключевое слово '{keyword}' в названии курса")
-            
-            # Проверяем совпадение по описанию
-            course_desc_lower = (course.description or "").lower()
-            for keyword in keywords:
-                if keyword in course_desc_lower:
-                    score += 1
-                    reasons.append(f"Ключевое слово '{keyword}' в описании курса")
-            
-            # Проверяем по категорийным ключевым словам
-            if course.category in category_keywords:
-                category_words = category_keywords[course.category]
-                matched_keywords = keywords.intersection(category_words)
-                if matched_keywords:
-                    score += len(matched_keywords) * 2
-                    reasons.append(f"Совпадение по категорийным ключевым словам")
-            
-            if score > 0:
-                recommended_courses.append({
-                    "id": course.id,
-                    "name": course.name,
-                    "description": course.description,
-                    "category": course.category,
-                    "category_name": course.category_name,
-                    "category_color": course.category_color,
-                    "duration": course.duration,
-                    "score": score,
-                    "reasons": reasons[:3]
-                })
-        
-        # Сортируем по убыванию релевантности
-        recommended_courses.sort(key=lambda x: x["score"], reverse=True)
-        
-        return {
-            "analysis_id": f"analysis_{int(datetime.now().timestamp())}",
-            "vacancy": {
-                "title": title,
-                "links": links,
-                "parsed_ids": vacancy_ids,
-                "level": level
-            },
-            "recommendations": {
-                "total_courses_found": len(recommended_courses),
-                "top_courses": recommended_courses[:5],
-                "suggested_plan": {
-                    "duration_estimate": "4-6 месяцев",
-                    "weekly_hours": "15-20 часов",
-                    "starting_point": recommended_courses[0]["name"] if recommended_courses else "Базовые курсы"
-                }
-            },
-            "analysis_date": datetime.now().isoformat(),
-            "next_steps": [
-                "Выберите наиболее релевантный курс из рекомендаций",
-                "Изучите программу курса",
-                "Создайте учебный план с учетом вашего уровня",
-                "Начните с первого модуля выбранного курса"
-            ]
-        }
-        
+        return await vacancy_analysis.analyze_vacancy(db, request.title, request.links, request.level, request.ranking)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка анализа вакансий: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Ошибка анализа вакансий: {str(e)}")
+
+@router.post("/analyze/batch")
+async def analyze_vacancies_batch(
+    payload: VacancyBatchRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Анализ нескольких вакансий за один запрос: индекс курсов проверяется один раз,
+    сохраненные вакансии и карточки курсов читаются общими запросами, вакансии
+    оцениваются пачками по BATCH_CHUNK_SIZE. С заголовком Accept: application/x-ndjson
+    результаты отдаются построчно по мере подсчета, иначе - одним JSON.
+    """
+    items = [(item.title.strip(), vacancy_analysis.parse_vacancy_ids(item.links)) for item in payload.vacancies]
+    if payload.ranking == "bm25":
+        texts = await vacancy_analysis.vacancy_texts(db, [vacancy_id for _, ids in items for vacancy_id in ids])
+    else:
+        await course_index.ensure_current(db)
+
+    async def results(session: AsyncSession):
+        for start in range(0, len(items), BATCH_CHUNK_SIZE):
+            chunk = [(index, title, ids) for index, (title, ids) in enumerate(items[start:start + BATCH_CHUNK_SIZE], start)]
+            valid = [(index, title, ids) for index, title, ids in chunk if title]
+            if payload.ranking == "bm25":
+                scored = await vacancy_analysis.bm25_recommendations(
+                    session, [vacancy_analysis.bm25_query(title, ids, texts) for _, title, ids in valid], payload.limit
+                )
+            else:
+                scored = course_index.recommend_many([extract_keywords(title) for _, title, _ in valid], payload.limit)
+            by_index = {index: result for (index, _, _), result in zip(valid, scored)}
+
+            for index, title, ids in chunk:
+                if index not in by_index:
+                    yield {"index": index, "title": title, "error": "Не указано название вакансии"}
+                    continue
+                total_found, top_courses = by_index[index]
+                yield {
+                    "index": index,
+                    "title": title,
+                    "parsed_ids": ids,
+                    "total_courses_found": total_found,
+                    "top_courses": top_courses,
+                }
+            await asyncio.sleep(0)
+
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        async def ndjson():
+            # Генератор работает после возврата из обработчика: сессия get_db к этому
+            # моменту может быть уже закрыта, поэтому карточки курсов читаются через свою
+            async with AsyncSessionLocal() as session:
+                async for result in results(session):
+                    yield json.dumps(jsonable_encoder(result), ensure_ascii=False) + "\n"
+        return StreamingResponse(ndjson(), media_type=NDJSON_MEDIA_TYPE)
+
+    return {
+        "analysis_date": datetime.now().isoformat(),
+        "ranking": payload.ranking,
+        "results": [result async for result in results(db)],
+    }
+
+# ============ ОЧЕРЕДЬ АНАЛИЗА ============
+@router.post("/requests", status_code=202)
+async def create_analysis_request(
+    payload: VacancyAnalysisRequest,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Поставить анализ вакансии в очередь. Анализ выполняет vacancy_worker.py,
+    результат - GET /requests/{id} (с ?wait=N - ждать готовности до N секунд).
+    """
+    if not payload.title.strip():
+        raise HTTPException(status_code=400, detail="Не указано название вакансии")
+    if not payload.links:
+        raise HTTPException(status_code=400, detail="Не указаны ссылки на вакансии")
+
+    job = await vacancy_jobs.enqueue(
+        db, current_user.id, payload.title, payload.links, payload.level, payload.ranking
+    )
+    response.headers["Location"] = f"{router.prefix}/requests/{job.id}"
+    return vacancy_jobs.serialize_job(job)
+
+@router.get("/requests/{request_id}")
+async def get_analysis_request(
+    request_id: uuid.UUID,
+    wait: float = Query(0, ge=0, le=MAX_JOB_WAIT_SECONDS, description="Ждать завершения до N секунд (long-poll)"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Статус и результат анализа из очереди"""
+    deadline = time.monotonic() + wait
+    while True:
+        job = await db.scalar(
+            select(models.UserVacancyRequest)
+            .where(models.UserVacancyRequest.id == request_id)
+            .execution_options(populate_existing=True)
+        )
+        if job is None or (job.user_id != current_user.id and current_user.type != "admin"):
+            raise HTTPException(status_code=404, detail="Запрос на анализ не найден")
+
+        remaining = deadline - time.monotonic()
+        if job.status in vacancy_jobs.FINISHED_STATUSES or remaining <= 0:
+            return vacancy_jobs.serialize_job(job)
+
+        # Пока ждем, соединение возвращается в пул
+        await db.rollback()
+        await asyncio.sleep(min(vacancy_jobs.VACANCY_JOB_POLL_INTERVAL, remaining))
@@ -0,0 +1,335 @@
+# app/teacher_queries.py - агрегирующие запросы для панели преподавателя
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, distinct, literal, null, union_all, and_, literal_column
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.sql import Select
+import models
+import pagination
+import user_search
+
+RECENT_ACTIVITIES_PER_KIND = 5
+RECENT_SUBMISSIONS_DAYS = 7
+
+# Студенты преподавателя упорядочены по ФИО; id делает ключ уникальным
+TEACHER_STUDENTS_KEYSET = pagination.Keyset(
+    "teacher.students", models.User.surname, models.User.name, models.User.id
+)
+# Список преподавателей: порядок совпадает с индексом ix_users_type_active_surname
+TEACHERS_KEYSET = pagination.Keyset(
+    "teachers", models.User.surname, models.User.name, models.User.id
+)
+
+
+def _teacher_course_students_subquery(teacher_id):
+    """Число студентов преподавателя по каждому курсу (по назначенным заданиям)"""
+    return (
+        select(
+            models.CourseModule.course_id.label("course_id"),
+            func.count(distinct(models.LessonAssignment.user_id)).label("student_count"),
+        )
+        .select_from(models.LessonAssignment)
+        .join(models.CourseLesson, models.LessonAssignment.lesson_id == models.CourseLesson.id)
+        .join(models.CourseModule, models.CourseLesson.module_id == models.CourseModule.id)
+        .where(models.LessonAssignment.assigned_by == teacher_id)
+        .group_by(models.CourseModule.course_id)
+        .subquery()
+    )
+
+
+async def get_teacher_courses_with_counts(
+    db: AsyncSession,
+    teacher_id,
+    skip: int = 0,
+    limit: Optional[int] = None
+) -> List[tuple]:
+    """Курсы, где преподаватель назначал задания, вместе с числом студентов (1 запрос)"""
+    per_course = _teacher_course_students_subquery(teacher_id)
+    query = (
+        select(models.Course, per_course.c.student_count)
+        .join(per_course, per_course.c.course_id == models.Course.id)
+        .order_by(models.Course.created_at.desc())
+    )
+    if skip:
+        query = query.offset(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    return result.all()
+
+
+def teacher_students_query(teacher_id, search: Optional[str] = None) -> Select:
+    """
+    Студенты преподавателя вместе с числом заданий и курсов.
+    Строки результата: (User, assignments_count, course_count)
+    """
+    per_student = (
+        select(
+            models.LessonAssignment.user_id.label("user_id"),
+            func.count(models.LessonAssignment.id).label("assignments_count"),
+            func.count(distinct(models.CourseModule.course_id)).label("course_count"),
+        )
+        .select_from(models.LessonAssignment)
+        .join(models.CourseLesson, models.LessonAssignment.lesson_id == models.CourseLesson.id)
+        .join(models.CourseModule, models.CourseLesson.module_id == models.CourseModule.id)
+        .where(models.LessonAssignment.assigned_by == teacher_id)
+        .group_by(models.LessonAssignment.user_id)
+        .subquery()
+    )
+
+    query = select(
+        models.User,
+        per_student.c.assignments_count,
+        per_student.c.course_count,
+    ).join(per_student, per_student.c.user_id == models.User.id)
+    return user_search.apply_user_search(query, search)
+
+
+async def get_teacher_students_with_counts(
+    db: AsyncSession,
+    teacher_id,
+    search: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> Tuple[List[tuple], Optional[str]]:
+    """
+    Страница студентов преподавателя с агрегатами (1 запрос) и курсор следующей страницы.
+    С курсором используется keyset-пагинация, без него - OFFSET (skip).
+    """
+    query = TEACHER_STUDENTS_KEYSET.paginate(teacher_students_query(teacher_id, search), cursor, skip, limit)
+    result = await db.execute(query)
+    return TEACHER_STUDENTS_KEYSET.split(
+        result.all(), limit, lambda row: (row.User.surname, row.User.name, row.User.id)
+    )
+
+
+async def get_teacher_stats(db: AsyncSession, teacher_id) -> Dict[str, Any]:
+    """Сводная статистика преподавателя одним запросом"""
+    teacher_assignments = models.LessonAssignment.assigned_by == teacher_id
+
+    student_ids = (
+        select(models.LessonAssignment.user_id)
+        .where(teacher_assignments)
+    )
+    courses_count = (
+        select(func.count(distinct(models.CourseModule.course_id)))
+        .select_from(models.LessonAssignment)
+        .join(models.CourseLesson, models.LessonAssignment.lesson_id == models.CourseLesson.id)
+        .join(models.CourseModule, models.CourseLesson.module_id == models.CourseModule.id)
+        .where(teacher_assignments)
+        .scalar_subquery()
+    )
+    students_count = (
+        select(func.count(distinct(models.LessonAssignment.user_id)))
+        .where(teacher_assignments)
+        .scalar_subquery()
+    )
+    assignments_count = (
+        select(func.count(models.LessonAssignment.id))
+        .where(teacher_assignments)
+        .scalar_subquery()
+    )
+    avg_progress = (
+        select(func.avg(models.User.progress_percent))
+        .where(models.User.id.in_(student_ids))
+        .scalar_subquery()
+    )
+
+    row = (await db.execute(
+        select(
+            courses_count.label("courses"),
+            students_count.label("students"),
+            assignments_count.label("assignments"),
+            avg_progress.label("avg_progress"),
+        )
+    )).one()
+
+    return {
+        "courses": row.courses or 0,
+        "students": row.students or 0,
+        "assignments": row.assignments or 0,
+        "avg_progress": round(float(row.avg_progress or 0), 1),
+    }
+
+
+async def get_recent_activities(db: AsyncSession, teacher_id, limit: int = 10) -> List[Dict[str, Any]]:
+    """Последние назначения и сданные работы преподавателя (1 запрос UNION ALL)"""
+    week_ago = datetime.now() - timedelta(days=RECENT_SUBMISSIONS_DAYS)
+
+    assignments = (
+        select(
+            literal("assignment").label("kind"),
+            models.LessonAssignment.id.label("id"),
+            models.LessonAssignment.assigned_at.label("date"),
+            models.User.surname.label("surname"),
+            models.User.name.label("name"),
+            models.CourseLesson.title.label("lesson_title"),
+        )
+        .join(models.User, models.LessonAssignment.user_id == models.User.id)
+        .join(models.CourseLesson, models.LessonAssignment.lesson_id == models.CourseLesson.id)
+        .where(models.LessonAssignment.assigned_by == teacher_id)
+        .order_by(models.LessonAssignment.assigned_at.desc())
+        .limit(RECENT_ACTIVITIES_PER_KIND)
+        .subquery()
+    )
+    submissions = (
+        select(
+            literal("submission").label("kind"),
+            models.LessonSubmission.id.label("id"),
+            models.LessonSubmission.created_at.label("date"),
+            models.User.surname.label("surname"),
+            models.User.name.label("name"),
+            null().label("lesson_title"),
+        )
+        .join(models.LessonAssignment, models.LessonSubmission.assignment_id == models.LessonAssignment.id)
+        .join(models.User, models.LessonSubmission.user_id == models.User.id)
+        .where(
+            models.LessonAssignment.assigned_by == teacher_id,
+            models.LessonSubmission.created_at >= week_ago
+        )
+        .order_by(models.LessonSubmission.created_at.desc())
+        .limit(RECENT_ACTIVITIES_PER_KIND)
+        .subquery()
+    )
+    combined = union_all(select(assignments), select(submissions)).subquery()
+
+    result = await db.execute(
+        select(combined)
+        .order_by(combined.c.date.desc().nulls_last())
+        .limit(limit)
+    )
+
+    activities = []
+    for row in result.all():
+        if row.kind == "assignment":
+            activities.append({
+                "id": f"assignment_{row.id}",
+                "type": "assignment",
+                "message": f"Назначен урок '{row.lesson_title}' студенту {row.surname} {row.name}",
+                "date": row.date.isoformat() if row.date else None,
+                "icon": "fa-tasks",
+                "color": "text-blue-600",
+            })
+        else:
+            activities.append({
+                "id": f"submission_{row.id}",
+                "type": "submission",
+                "message": f"Студент {row.surname} {row.name} сдал задание",
+                "date": row.date.isoformat() if row.date else None,
+                "icon": "fa-file-upload",
+                "color": "text-green-600",
+            })
+    return activities
+
+
+async def get_teachers_with_course_assignments(
+    db: AsyncSession,
+    course_id=None,
+    search: Optional[str] = None,
+    skip: int = 0,
+    limit: Optional[int] = None
+) -> List[tuple]:
+    """
+    Активные преподаватели вместе с их активными назначениями на курсы (1 запрос).
+    Назначения собираются в JSON-массив через json_agg; is_assigned считается
+    в том же проходе, если передан course_id. Без limit - все преподаватели.
+    Строки результата: (User, assigned_courses, is_assigned)
+    """
+    assigned_courses = func.coalesce(
+        func.json_agg(
+            func.json_build_object(
+                "course_id", models.Course.id,
+                "course_name", models.Course.name,
+                "assigned_at", models.TeacherCourseAssignment.assigned_at,
+            )
+        ).filter(models.Course.id.isnot(None)),
+        literal_column("'[]'::json"),
+        type_=JSON,
+    ).label("assigned_courses")
+
+    if course_id is not None:
+        is_assigned = func.coalesce(
+            func.bool_or(models.TeacherCourseAssignment.course_id == course_id), False
+        ).label("is_assigned")
+    else:
+        is_assigned = literal(None).label("is_assigned")
+
+    query = (
+        select(models.User, assigned_courses, is_assigned)
+        .outerjoin(
+            models.TeacherCourseAssignment,
+            and_(
+                models.TeacherCourseAssignment.teacher_id == models.User.id,
+                models.TeacherCourseAssignment.status == "active",
+            )
+        )
+        .outerjoin(models.Course, models.TeacherCourseAssignment.course_id == models.Course.id)
+        .where(models.User.type == "teacher", models.User.active == True)
+        .group_by(models.User.id)
+    )
+
+    query = user_search.apply_user_search(query, search, extra_columns=[models.User.department])
+
+    query = query.order_by(models.User.surname, models.User.name, models.User.id)
+    if skip:
+        query = query.offset(skip)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    return result.all()
+
+
+def _active_course_counts_subquery():
+    """Число активных назначений на курсы по каждому преподавателю"""
+    return (
+        select(
+            models.TeacherCourseAssignment.teacher_id.label("teacher_id"),
+            func.count(models.TeacherCourseAssignment.id).label("courses_count"),
+        )
+        .where(models.TeacherCourseAssignment.status == "active")
+        .group_by(models.TeacherCourseAssignment.teacher_id)
+        .subquery()
+    )
+
+
+def teachers_query(
+    search: Optional[str] = None,
+    active_only: bool = False,
+    with_courses_count: bool = False
+) -> Select:
+    """
+    Преподаватели с поиском по email, ФИО, телефону и кафедре.
+    Все фильтры выполняются в SQL, так что страница всегда полная.
+    С with_courses_count строки результата: (User, courses_count) - число активных
+    назначений на курсы считается в том же запросе.
+    """
+    if with_courses_count:
+        per_teacher = _active_course_counts_subquery()
+        query = (
+            select(models.User, func.coalesce(per_teacher.c.courses_count, 0).label("courses_count"))
+            .outerjoin(per_teacher, per_teacher.c.teacher_id == models.User.id)
+        )
+    else:
+        query = select(models.User)
+    query = query.where(models.User.type == "teacher")
+    if active_only:
+        query = query.where(models.User.active == True)
+    return user_search.apply_user_search(query, search, extra_columns=[models.User.department])
+
+
+async def get_teachers_page(
+    db: AsyncSession,
+    search: Optional[str] = None,
+    active_only: bool = False,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> Tuple[List[models.User], Optional[str]]:
+    """Страница преподавателей (1 запрос) и курсор следующей страницы"""
+    query = TEACHERS_KEYSET.paginate(teachers_query(search, active_only), cursor, skip, limit)
+    result = await db.execute(query)
+    return TEACHERS_KEYSET.split(
+        result.scalars().all(), limit, lambda teacher: (teacher.surname, teacher.name, teacher.id)
+    )
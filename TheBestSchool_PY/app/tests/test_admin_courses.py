@@ -0,0 +1,100 @@
+import asyncio
+import uuid
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import models
+from auth import get_current_principal
+from conftest import session
+from database import get_db
+from principal_cache import Principal
+from routers import admin
+
+
+async def _seed_courses(engine, count: int):
+    async with session(engine) as db:
+        student = models.User(email=f"{uuid.uuid4()}@example.com", surname="Student", name="Test", password="x", type="apprentice")
+        db.add(student)
+        for i in range(count):
+            course = models.Course(name=f"Course {uuid.uuid4()}", description="", category="it", category_name="IT")
+            db.add(course)
+            db.add_all(models.CourseModule(course=course, order=order, title=f"Module {order}") for order in range(3))
+            db.add(models.UserCourseProgress(user=student, course=course))
+        await db.commit()
+
+
+async def _seed_teachers(engine, count: int):
+    async with session(engine) as db:
+        admin_user = models.User(email=f"{uuid.uuid4()}@example.com", surname="Admin", name="Test", password="x", type="admin")
+        course = models.Course(name=f"Course {uuid.uuid4()}", description="", category="it", category_name="IT")
+        db.add_all([admin_user, course])
+        for i in range(count):
+            teacher = models.User(email=f"{uuid.uuid4()}@example.com", surname=f"Teacher {uuid.uuid4()}", name="Test", password="x", type="teacher")
+            db.add(teacher)
+            await db.flush()
+            db.add(models.TeacherCourseAssignment(teacher_id=teacher.id, course_id=course.id, assigned_by=admin_user.id, status="active"))
+            db.add(models.TeacherCourseAssignment(teacher_id=teacher.id, course_id=course.id, assigned_by=admin_user.id, status="inactive"))
+        await db.commit()
+
+
+def _client(engine) -> TestClient:
+    app = FastAPI()
+    app.include_router(admin.router)
+
+    async def override_get_db():
+        async with session(engine) as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_principal] = lambda: Principal(id=uuid.uuid4(), type="admin", active=True)
+    return TestClient(app)
+
+
+def test_admin_courses_statement_count(engine):
+    """Страница курсов - один SQL-запрос, сколько бы курсов на ней ни было"""
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+    client = _client(engine)
+
+    counts, seeded = {}, 0
+    for total in (2, 10):
+        asyncio.run(_seed_courses(engine, total - seeded))
+        seeded = total
+        statements.clear()
+        response = client.get("/api/admin/courses", params={"limit": 50})
+        assert response.status_code == 200
+        assert len(response.json()) == total
+        assert all(course["student_count"] == 1 for course in response.json())
+        counts[total] = len(statements)
+
+    assert counts[2] == counts[10] == 1
+
+
+def test_admin_teachers_statement_count(engine):
+    """Страница преподавателей с числом курсов - один SQL-запрос (плюс оценка total на первой странице)"""
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count_statement)
+    client = _client(engine)
+
+    counts, seeded = {}, 0
+    for total in (2, 10):
+        asyncio.run(_seed_teachers(engine, total - seeded))
+        seeded = total
+        statements.clear()
+        response = client.get("/api/admin/users/teachers", params={"limit": 50, "skip": 1})
+        assert response.status_code == 200
+        assert len(response.json()) == total - 1
+        assert all(teacher["courses_count"] == 1 for teacher in response.json())
+        counts[total] = len(statements)
+
+    assert counts[2] == counts[10] == 1
@@ -0,0 +1,42 @@
+import tempfile
+import uuid
+from types import SimpleNamespace
+
+from course_ranking import QUERY_TITLE_WEIGHT, CourseMatrix, stem
+
+
+def _course(name: str, description: str, category_name: str = "IT"):
+    return SimpleNamespace(id=uuid.uuid4(), name=name, description=description, category_name=category_name)
+
+
+COURSES = [
+    _course("Разработка на Python", "Backend-разработчики: FastAPI, базы данных, тестирование"),
+    _course("Управление проектами", "Бюджетирование и планирование проектов", "Управление"),
+    _course("Frontend", "JavaScript, React и верстка интерфейсов"),
+]
+
+
+def test_stemming_ru_en():
+    assert stem("разработчика") == stem("разработчики")
+    assert stem("databases") == stem("database")
+
+
+def test_rank_matches_inflected_forms():
+    matrix = CourseMatrix.build("test", COURSES)
+    total, top = matrix.rank([("Python разработчик", QUERY_TITLE_WEIGHT), ("опыт с базой данных", 1.0)], limit=2)
+    assert total == 1
+    assert top[0][0] == str(COURSES[0].id)
+    assert "python" in top[0][2]
+
+
+def test_rank_many_matches_rank_and_survives_reload():
+    matrix = CourseMatrix.build("test", COURSES)
+    queries = [
+        [("Менеджер проектов", QUERY_TITLE_WEIGHT), ("планирование, бюджет", 1.0)],
+        [("React developer", QUERY_TITLE_WEIGHT)],
+    ]
+    with tempfile.TemporaryDirectory() as root:
+        matrix.save(root)
+        loaded = CourseMatrix.load(root, "test")
+        assert loaded is not None
+        assert loaded.rank_many(queries, limit=3) == [matrix.rank(query, limit=3) for query in queries]
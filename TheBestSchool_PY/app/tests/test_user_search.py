@@ -0,0 +1,27 @@
+import asyncio
+
+from sqlalchemy import select
+
+import models
+import user_search
+from conftest import session
+
+
+def test_estimate_count_with_search(engine):
+    async def scenario():
+        async with session(engine) as db:
+            db.add_all([
+                models.User(email="ivanov@example.com", surname="Ivanov", name="Petr", password="x", type="apprentice"),
+                models.User(email="under_score@example.com", surname="Petrov", name="Ivan", password="x", type="apprentice"),
+            ])
+            await db.commit()
+
+            # Спецсимволы LIKE в поиске экранируются и не ломают EXPLAIN
+            for search in ("ivanov petr", "under_score", "100%", "back\\slash"):
+                query = user_search.apply_user_search(select(models.User.id), search)
+                assert await user_search.estimate_count(db, query) >= 0
+
+            query = user_search.apply_user_search(select(models.User.id), "IVANOV")
+            assert len((await db.execute(query)).scalars().all()) == 1
+
+    asyncio.run(scenario())
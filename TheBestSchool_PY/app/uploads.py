@@ -0,0 +1,278 @@
+# app/uploads.py - потоковое сохранение загружаемых файлов с ограничениями
+import asyncio
+import hashlib
+import os
+import re
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, FrozenSet, Optional
+from uuid import uuid4
+
+import aiofiles
+import aiofiles.os as aios
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_URL_PREFIX = "/uploads"
+BLOB_DIR_NAME = "blobs"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MB = 1024 * 1024
+
+# Одновременные загрузки на воркер: всего и от одного пользователя
+UPLOAD_MAX_CONCURRENT = int(os.getenv("UPLOAD_MAX_CONCURRENT", "16"))
+UPLOAD_MAX_PER_USER = int(os.getenv("UPLOAD_MAX_PER_USER", "2"))
+# Сколько загрузка может ждать общего слота, прежде чем получить 503
+UPLOAD_QUEUE_TIMEOUT = float(os.getenv("UPLOAD_QUEUE_TIMEOUT", "30"))
+# Запас на заголовки частей multipart и текстовые поля формы сверх размера файлов
+UPLOAD_FORM_OVERHEAD = 1 * MB
+
+
+class UploadPolicy:
+    """Допустимые расширения и максимальный размер для одного вида загрузок"""
+
+    def __init__(self, name: str, extensions, max_bytes: int):
+        self.name = name
+        self.extensions: FrozenSet[str] = frozenset(extensions)
+        self.max_bytes = max_bytes
+
+    def check_extension(self, filename: Optional[str]) -> str:
+        ext = os.path.splitext(filename or "")[1].lower()
+        if ext not in self.extensions:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Недопустимый тип файла {ext or '(без расширения)'}. "
+                       f"Разрешены: {', '.join(sorted(self.extensions))}"
+            )
+        return ext
+
+
+# Презентации и домашние задания к урокам, работы студентов
+LESSON_PRESENTATION = UploadPolicy(
+    "lesson_presentation",
+    {".ppt", ".pptx", ".odp", ".pdf"},
+    int(os.getenv("UPLOAD_MAX_LESSON_MB", "100")) * MB,
+)
+LESSON_HOMEWORK = UploadPolicy(
+    "lesson_homework",
+    {".pdf", ".doc", ".docx", ".odt", ".txt", ".ppt", ".pptx", ".xls", ".xlsx", ".zip", ".rar", ".7z"},
+    int(os.getenv("UPLOAD_MAX_LESSON_MB", "100")) * MB,
+)
+SUBMISSION = UploadPolicy(
+    "submission",
+    {".docx", ".pdf", ".zip"},
+    int(os.getenv("UPLOAD_MAX_SUBMISSION_MB", "50")) * MB,
+)
+
+
+class StoredUpload:
+    """
+    Результат сохранения: публичный URL, путь на диске, размер и SHA-256 содержимого.
+    blob_path - путь блоба относительно UPLOAD_DIR (ключ в таблице upload_blobs).
+    """
+
+    def __init__(self, url: str, path: str, blob_path: str, filename: str, size: int, sha256: str):
+        self.url = url
+        self.path = path
+        self.blob_path = blob_path
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+
+
+def blob_path_for(sha256: str, ext: str) -> str:
+    """Путь блоба относительно UPLOAD_DIR: blobs/<2 символа хэша>/<хэш><расширение>"""
+    return f"{BLOB_DIR_NAME}/{sha256[:2]}/{sha256}{ext}"
+
+
+def blob_path_from_url(url: Optional[str]) -> Optional[str]:
+    """Путь блоба по URL файла или None для старых файлов вне хранилища блобов"""
+    prefix = f"{UPLOAD_URL_PREFIX}/{BLOB_DIR_NAME}/"
+    if not url or not url.startswith(prefix):
+        return None
+    return url[len(UPLOAD_URL_PREFIX) + 1:]
+
+
+async def save_upload(file: UploadFile, policy: UploadPolicy) -> StoredUpload:
+    """
+    Сохранить загруженный файл, читая его кусками по UPLOAD_CHUNK_SIZE:
+    память не зависит от размера файла. Данные пишутся во временный файл
+    и переносятся на место только целиком, так что недокачанный или
+    слишком большой файл никогда не виден по URL.
+    Хранилище адресуется содержимым: имя файла - его SHA-256, поэтому
+    повторная загрузка того же файла не занимает место на диске.
+    Ссылки на блобы учитывает blob_store (add_ref/release).
+    """
+    ext = policy.check_extension(file.filename)
+    tmp_dir = os.path.join(UPLOAD_DIR, BLOB_DIR_NAME, "tmp")
+    await aios.makedirs(tmp_dir, exist_ok=True)
+
+    tmp_path = os.path.join(tmp_dir, f"{uuid4()}.part")
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > policy.max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Файл слишком большой (максимум {policy.max_bytes // MB} МБ)"
+                    )
+                digest.update(chunk)
+                await out.write(chunk)
+
+        sha256 = digest.hexdigest()
+        blob_path = blob_path_for(sha256, ext)
+        path = os.path.join(UPLOAD_DIR, blob_path)
+        try:
+            # Такое содержимое уже хранится - копия не нужна; mtime обновляем,
+            # чтобы сборщик мусора не удалил блоб до сохранения ссылки на него
+            os.utime(path)
+        except FileNotFoundError:
+            await aios.makedirs(os.path.dirname(path), exist_ok=True)
+            await aios.rename(tmp_path, path)
+        else:
+            await aios.remove(tmp_path)
+    except BaseException:
+        try:
+            await aios.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return StoredUpload(
+        url=f"{UPLOAD_URL_PREFIX}/{blob_path}",
+        path=path,
+        blob_path=blob_path,
+        filename=file.filename,
+        size=size,
+        sha256=sha256,
+    )
+
+
+class UploadLimiter:
+    """
+    Ограничение одновременных загрузок: не больше max_per_user от одного
+    пользователя (сверх - сразу 429) и не больше max_concurrent на воркер
+    (остальные ждут до queue_timeout, затем 503). Так несколько больших
+    загрузок не забирают весь диск и пул потоков у остальных запросов.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = UPLOAD_MAX_CONCURRENT,
+        max_per_user: int = UPLOAD_MAX_PER_USER,
+        queue_timeout: float = UPLOAD_QUEUE_TIMEOUT
+    ):
+        self.max_per_user = max_per_user
+        self.queue_timeout = queue_timeout
+        self._global = asyncio.Semaphore(max_concurrent)
+        self._per_user: Dict[str, int] = {}
+
+    async def acquire(self, user_key):
+        key = str(user_key)
+        if self._per_user.get(key, 0) >= self.max_per_user:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Не больше {self.max_per_user} одновременных загрузок",
+                headers={"Retry-After": "5"},
+            )
+        self._per_user[key] = self._per_user.get(key, 0) + 1
+        try:
+            # asyncio.timeout, а не wait_for: тот может потерять уже выданный слот
+            async with asyncio.timeout(self.queue_timeout):
+                await self._global.acquire()
+        except TimeoutError:
+            self._release_user(key)
+            raise HTTPException(
+                status_code=503,
+                detail="Слишком много загрузок, повторите попытку позже",
+                headers={"Retry-After": "10"},
+            )
+        except BaseException:
+            self._release_user(key)
+            raise
+
+    def release(self, user_key):
+        self._global.release()
+        self._release_user(str(user_key))
+
+    def _release_user(self, key: str):
+        self._per_user[key] -= 1
+        if not self._per_user[key]:
+            del self._per_user[key]
+
+    @asynccontextmanager
+    async def slot(self, user_key):
+        await self.acquire(user_key)
+        try:
+            yield
+        finally:
+            self.release(user_key)
+
+
+upload_limiter = UploadLimiter()
+
+# Маршруты с загрузкой файлов: метод, путь и наибольший допустимый размер тела
+UPLOAD_ROUTES = (
+    ("POST", r"/api/student/submissions/[^/]+/lessons/[^/]+/submission", SUBMISSION.max_bytes),
+    ("POST", r"/api/teacher/lessons", LESSON_PRESENTATION.max_bytes + LESSON_HOMEWORK.max_bytes),
+    ("PUT", r"/api/teacher/lessons/[^/]+", LESSON_PRESENTATION.max_bytes + LESSON_HOMEWORK.max_bytes),
+)
+
+
+class UploadGuardMiddleware:
+    """
+    ASGI-прослойка для маршрутов загрузки (UPLOAD_ROUTES). Starlette читает все
+    тело multipart и пишет его во временные файлы еще до вызова обработчика,
+    поэтому лимиты проверяются здесь, до чтения тела:
+    - без Content-Length - 411, больше лимита маршрута - 413 (тело не читается);
+    - слот upload_limiter (429 / 503) занимается до приема тела и держится до ответа.
+    user_key(headers) - ключ пользователя для лимита по токену (None - по IP клиента).
+    Ограничение размера отдельного файла по-прежнему проверяет save_upload.
+    """
+
+    def __init__(self, app, user_key: Callable[[Headers], Optional[str]], routes=UPLOAD_ROUTES):
+        self.app = app
+        self.user_key = user_key
+        self.routes = [(method, re.compile(pattern), max_bytes + UPLOAD_FORM_OVERHEAD) for method, pattern, max_bytes in routes]
+
+    def _limit(self, scope) -> Optional[int]:
+        for method, pattern, max_bytes in self.routes:
+            if scope["method"] == method and pattern.fullmatch(scope["path"]):
+                return max_bytes
+        return None
+
+    async def __call__(self, scope, receive, send):
+        limit = self._limit(scope) if scope["type"] == "http" else None
+        headers = Headers(scope=scope) if limit is not None else None
+        if headers is None or not headers.get("content-type", "").startswith("multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        # h11/httptools не дают прислать тело длиннее Content-Length
+        length = headers.get("content-length")
+        if length is None or not length.isdigit():
+            error = HTTPException(status_code=411, detail="Требуется заголовок Content-Length")
+        elif int(length) > limit:
+            error = HTTPException(status_code=413, detail=f"Слишком большой запрос (максимум {limit // MB} МБ)")
+        else:
+            user_key = self.user_key(headers) or (scope.get("client") or ("unknown",))[0]
+            try:
+                await upload_limiter.acquire(user_key)
+            except HTTPException as e:
+                error = e
+            else:
+                try:
+                    await self.app(scope, receive, send)
+                finally:
+                    upload_limiter.release(user_key)
+                return
+
+        response = JSONResponse({"detail": error.detail}, status_code=error.status_code, headers=error.headers)
+        await response(scope, receive, send)
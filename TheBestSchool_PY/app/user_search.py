@@ -0,0 +1,93 @@
+# app/user_search.py - общий поиск пользователей для списков админа и преподавателя
+import json
+from typing import Optional, Sequence
+
+from sqlalchemy import func, literal_column, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+import models
+
+# Заголовок с оценкой общего числа строк (отдается на первой странице списков)
+TOTAL_ESTIMATE_HEADER = "X-Total-Count-Estimate"
+
+USER_SEARCH_COLUMNS = (
+    models.User.email,
+    models.User.surname,
+    models.User.name,
+    models.User.patronymic,
+    models.User.phone,
+)
+
+
+def _user_search_text():
+    """
+    Строка поиска пользователя. Выражение повторяет models.USER_SEARCH_SQL
+    (константы - литералы, а не параметры), поэтому PostgreSQL использует
+    триграммный индекс ix_users_search_trgm для LIKE '%...%'.
+    """
+    parts = [func.coalesce(column, literal_column("''")) for column in USER_SEARCH_COLUMNS]
+    expression = parts[0]
+    for part in parts[1:]:
+        expression = expression.op("||")(literal_column("' '")).op("||")(part)
+    return func.lower(expression)
+
+
+USER_SEARCH_TEXT = _user_search_text()
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _lower_column(column):
+    """lower(coalesce(column, '')) - в том же виде, что и выражения триграммных индексов"""
+    return func.lower(func.coalesce(column, literal_column("''")))
+
+
+def apply_user_search(query: Select, search: Optional[str], extra_columns: Sequence = ()) -> Select:
+    """
+    Добавить к запросу по models.User условие поиска по email, ФИО и телефону.
+    Каждое слово должно встречаться в строке поиска (порядок не важен),
+    так что "Иванов Петр" находит пользователя сразу по фамилии и имени.
+    extra_columns - дополнительные столбцы, в которых слово может встретиться
+    вместо строки поиска (например, кафедра преподавателя).
+    """
+    if not search:
+        return query
+    extra = [_lower_column(column) for column in extra_columns]
+    for word in search.lower().split():
+        pattern = f"%{_escape_like(word)}%"
+        conditions = [USER_SEARCH_TEXT.like(pattern, escape="\\")]
+        conditions += [column.like(pattern, escape="\\") for column in extra]
+        query = query.where(or_(*conditions))
+    return query
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) над запросом; параметры остаются связанными"""
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def estimate_count(db: AsyncSession, query: Select) -> int:
+    """
+    Оценка числа строк по плану PostgreSQL (EXPLAIN) вместо точного COUNT(*).
+    Точность зависит от свежести статистики (ANALYZE); для пагинации этого достаточно.
+    Запрос компилируется диалектом соединения (с настройками сервера) и выполняется
+    с параметрами, а не с подставленными литералами.
+    """
+    result = await db.execute(Explain(query.order_by(None).limit(None).offset(None)))
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
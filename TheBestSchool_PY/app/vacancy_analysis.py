@@ -0,0 +1,130 @@
+# app/vacancy_analysis.py - анализ вакансии и подбор курсов (общий для API и фонового обработчика)
+import asyncio
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import course_ranking
+import models
+from course_recommender import course_card, course_index, extract_keywords
+
+HH_VACANCY_RE = re.compile(r'hh\.ru/vacancy/(\d+)')
+
+
+def parse_vacancy_ids(links: List[str]) -> List[str]:
+    """ID вакансий hh.ru из ссылок"""
+    vacancy_ids = []
+    for link in links:
+        if isinstance(link, str) and "hh.ru/vacancy/" in link:
+            match = HH_VACANCY_RE.search(link)
+            if match:
+                vacancy_ids.append(match.group(1))
+    return vacancy_ids
+
+
+async def vacancy_texts(db: AsyncSession, vacancy_ids: List[str]) -> Dict[str, str]:
+    """Тексты сохраненных вакансий (название, описание, навыки) по hh_id - одним запросом"""
+    if not vacancy_ids:
+        return {}
+    result = await db.execute(
+        select(models.Vacancy.hh_id, models.Vacancy.title, models.Vacancy.description, models.Vacancy.skills)
+        .where(models.Vacancy.hh_id.in_(set(vacancy_ids)))
+    )
+    return {vacancy.hh_id: course_ranking.vacancy_query_text(vacancy) for vacancy in result.all()}
+
+
+def bm25_query(title: str, vacancy_ids: List[str], texts: Dict[str, str]):
+    query = [(title, course_ranking.QUERY_TITLE_WEIGHT)]
+    query += [(texts[vacancy_id], 1.0) for vacancy_id in vacancy_ids if vacancy_id in texts]
+    return query
+
+
+async def bm25_recommendations(db: AsyncSession, queries: list, limit: int = 5):
+    """Рекомендации BM25 для нескольких запросов: один проход по матрице и один запрос карточек курсов"""
+    matrix = await course_ranking.course_ranking.ensure_current(db)
+    ranked_all = await asyncio.to_thread(matrix.rank_many, queries, limit)
+
+    course_ids = {course_id for _, ranked in ranked_all for course_id, _, _ in ranked}
+    courses = {}
+    if course_ids:
+        result = await db.execute(select(models.Course).where(models.Course.id.in_(course_ids)))
+        courses = {str(course.id): course for course in result.scalars().all()}
+
+    return [
+        (total_found, [
+            {
+                **course_card(courses[course_id]),
+                "score": round(score, 3),
+                "reasons": [f"Совпадение по словам: {', '.join(words[:5])}"],
+            }
+            for course_id, score, words in ranked
+            if course_id in courses
+        ])
+        for total_found, ranked in ranked_all
+    ]
+
+
+async def _rank_bm25(db: AsyncSession, title: str, vacancy_ids: List[str], limit: int = 5):
+    """Рекомендации BM25: название вакансии плюс описание и навыки уже сохраненных вакансий"""
+    texts = await vacancy_texts(db, vacancy_ids)
+    return (await bm25_recommendations(db, [bm25_query(title, vacancy_ids, texts)], limit))[0]
+
+
+async def analyze_vacancy(
+    db: AsyncSession,
+    title: str,
+    links: List[str],
+    level: Optional[str] = "junior",
+    ranking: str = "keywords"
+) -> dict:
+    """
+    Полный результат анализа вакансии (тело ответа /analyze).
+    Ошибки во входных данных - HTTPException 400.
+    """
+    title = (title or "").strip()
+
+    if not title:
+        raise HTTPException(status_code=400, detail="Не указано название вакансии")
+
+    if not links:
+        raise HTTPException(status_code=400, detail="Не указаны ссылки на вакансии")
+
+    # Парсим ID вакансий из ссылок
+    vacancy_ids = parse_vacancy_ids(links)
+
+    if ranking == "bm25":
+        total_found, recommended_courses = await _rank_bm25(db, title, vacancy_ids)
+    else:
+        # Рекомендуем курсы по индексу (строится при старте, обновляется при изменении каталога)
+        await course_index.ensure_current(db)
+        total_found, recommended_courses = course_index.recommend(extract_keywords(title), limit=5)
+
+    return {
+        "analysis_id": f"analysis_{int(datetime.now().timestamp())}",
+        "vacancy": {
+            "title": title,
+            "links": links,
+            "parsed_ids": vacancy_ids,
+            "level": level
+        },
+        "recommendations": {
+            "total_courses_found": total_found,
+            "top_courses": recommended_courses,
+            "suggested_plan": {
+                "duration_estimate": "4-6 месяцев",
+                "weekly_hours": "15-20 часов",
+                "starting_point": recommended_courses[0]["name"] if recommended_courses else "Базовые курсы"
+            }
+        },
+        "analysis_date": datetime.now().isoformat(),
+        "next_steps": [
+            "Выберите наиболее релевантный курс из рекомендаций",
+            "Изучите программу курса",
+            "Создайте учебный план с учетом вашего уровня",
+            "Начните с первого модуля выбранного курса"
+        ]
+    }
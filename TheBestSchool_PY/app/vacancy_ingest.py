@@ -0,0 +1,256 @@
+# app/vacancy_ingest.py - пакетная загрузка вакансий из выгрузок (JSONL / JSONL.gz)
+import asyncio
+import gzip
+import html
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+INGEST_BATCH_SIZE = 5000
+STAGING_TABLE = "vacancies_staging"
+STAGING_COLUMNS = (
+    "ord", "hh_id", "title", "company", "salary", "experience", "employment", "description", "skills", "url",
+)
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+
+@dataclass
+class IngestStats:
+    lines: int = 0
+    parsed: int = 0
+    skipped: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.parsed / self.elapsed if self.elapsed else 0.0
+
+
+# ============ ЧТЕНИЕ И НОРМАЛИЗАЦИЯ ============
+def iter_records(path: str, stats: IngestStats) -> Iterator[dict]:
+    """Объекты из JSONL-файла (.gz распаковывается на лету), по одному - память не растет с размером"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            stats.lines += 1
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                stats.skipped += 1
+                continue
+            if isinstance(record, dict):
+                yield record
+            else:
+                stats.skipped += 1
+
+
+def _clean(text) -> Optional[str]:
+    if text is None:
+        return None
+    text = _SPACE_RE.sub(" ", str(text)).strip()
+    return text or None
+
+
+def _name(value) -> Optional[str]:
+    """Поле hh.ru вида {"id": ..., "name": ...} или уже строка"""
+    if isinstance(value, dict):
+        value = value.get("name")
+    return _clean(value)
+
+
+def normalize_skills(raw) -> List[str]:
+    """
+    Навыки списком строк: из key_skills hh.ru ([{"name": ...}]), списка строк или
+    строки через запятую. Пробелы схлопываются, повторы (без учета регистра) убираются.
+    """
+    if raw is None:
+        return []
+    if isinstance(raw, str):
+        raw = raw.split(",")
+    skills, seen = [], set()
+    for item in raw:
+        skill = _name(item)
+        if skill and skill.lower() not in seen:
+            seen.add(skill.lower())
+            skills.append(skill)
+    return skills
+
+
+def _salary(raw) -> Optional[str]:
+    if not isinstance(raw, dict):
+        return _clean(raw)
+    parts = []
+    if raw.get("from"):
+        parts.append(f"от {raw['from']}")
+    if raw.get("to"):
+        parts.append(f"до {raw['to']}")
+    if parts and raw.get("currency"):
+        parts.append(raw["currency"])
+    return " ".join(parts) or None
+
+
+def _description(raw) -> Optional[str]:
+    # В выгрузках hh.ru описание - HTML; в базе храним текст (его же разбирает BM25)
+    if raw is None:
+        return None
+    return _clean(html.unescape(_TAG_RE.sub(" ", str(raw))))
+
+
+def normalize(record: dict) -> Optional[Tuple]:
+    """
+    Строка для промежуточной таблицы (без ord) из записи выгрузки: формат API hh.ru
+    (id, name, employer, key_skills, alternate_url) или плоский формат модели Vacancy.
+    None - записи без id или названия.
+    """
+    hh_id = _clean(record.get("hh_id") or record.get("id"))
+    title = _clean(record.get("title") or record.get("name"))
+    if not hh_id or not title:
+        return None
+    return (
+        hh_id,
+        title,
+        _name(record.get("company") or record.get("employer")),
+        _salary(record.get("salary")),
+        _name(record.get("experience")),
+        _name(record.get("employment")),
+        _description(record.get("description")),
+        json.dumps(normalize_skills(record.get("skills", record.get("key_skills"))), ensure_ascii=False),
+        _clean(record.get("url") or record.get("alternate_url")),
+    )
+
+
+def iter_rows(paths: Iterable[str], stats: IngestStats) -> Iterator[Tuple]:
+    for path in paths:
+        for record in iter_records(path, stats):
+            row = normalize(record)
+            if row is None:
+                stats.skipped += 1
+                continue
+            stats.parsed += 1
+            yield row
+
+
+def batches(rows: Iterator[Tuple], size: int = INGEST_BATCH_SIZE) -> Iterator[List[Tuple]]:
+    batch = []
+    for row in rows:
+        # ord - порядок в выгрузке: из повторов одного hh_id побеждает последний
+        batch.append((len(batch), *row))
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ============ ЗАГРУЗКА ============
+_CREATE_STAGING_SQL = f"""
+CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+    ord INTEGER,
+    hh_id VARCHAR,
+    title VARCHAR,
+    company VARCHAR,
+    salary VARCHAR,
+    experience VARCHAR,
+    employment VARCHAR,
+    description TEXT,
+    skills TEXT,
+    url VARCHAR
+) ON COMMIT DELETE ROWS
+"""
+
+# Повторы hh_id внутри пачки схлопываются (ON CONFLICT не может задеть строку дважды),
+# неизмененные вакансии не переписываются; xmax = 0 - строка вставлена, а не обновлена
+_UPSERT_SQL = f"""
+INSERT INTO vacancies (id, hh_id, title, company, salary, experience, employment, description, skills, url, parsed_at)
+SELECT gen_random_uuid(), hh_id, title, company, salary, experience, employment, description, skills::json, url, now()
+FROM (
+    SELECT DISTINCT ON (hh_id) * FROM {STAGING_TABLE} ORDER BY hh_id, ord DESC
+) AS s
+ON CONFLICT (hh_id) DO UPDATE SET
+    title = EXCLUDED.title,
+    company = EXCLUDED.company,
+    salary = EXCLUDED.salary,
+    experience = EXCLUDED.experience,
+    employment = EXCLUDED.employment,
+    description = EXCLUDED.description,
+    skills = EXCLUDED.skills,
+    url = EXCLUDED.url,
+    parsed_at = now()
+WHERE (vacancies.title, vacancies.company, vacancies.salary, vacancies.experience,
+       vacancies.employment, vacancies.description, vacancies.skills::text, vacancies.url)
+    IS DISTINCT FROM
+      (EXCLUDED.title, EXCLUDED.company, EXCLUDED.salary, EXCLUDED.experience,
+       EXCLUDED.employment, EXCLUDED.description, EXCLUDED.skills::text, EXCLUDED.url)
+RETURNING (xmax = 0) AS inserted
+"""
+
+
+async def _load_batch(connection, batch: List[Tuple], stats: IngestStats):
+    """COPY пачки в промежуточную таблицу и один INSERT ... ON CONFLICT в vacancies"""
+    # Промежуточная таблица очищается при commit (ON COMMIT DELETE ROWS)
+    async with connection.transaction():
+        await connection.copy_records_to_table(STAGING_TABLE, records=batch, columns=STAGING_COLUMNS)
+        result = await connection.fetch(_UPSERT_SQL)
+    inserted = sum(1 for row in result if row["inserted"])
+    distinct = len({row[1] for row in batch})
+    stats.inserted += inserted
+    stats.updated += len(result) - inserted
+    stats.unchanged += distinct - len(result)
+
+
+async def ingest(
+    engine: AsyncEngine,
+    paths: Iterable[str],
+    batch_size: int = INGEST_BATCH_SIZE,
+    on_batch=None
+) -> IngestStats:
+    """
+    Загрузить вакансии из файлов выгрузок. Файлы читаются и разбираются в потоке,
+    пока предыдущая пачка идет в базу через COPY (asyncpg напрямую, без ORM).
+    on_batch(stats) вызывается после каждой пачки - для вывода прогресса.
+    """
+    stats = IngestStats()
+    batch_iter = batches(iter_rows(paths, stats), batch_size)
+
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        connection = raw.driver_connection
+        await connection.execute(_CREATE_STAGING_SQL)
+
+        batch = await asyncio.to_thread(next, batch_iter, None)
+        while batch is not None:
+            next_batch = asyncio.create_task(asyncio.to_thread(next, batch_iter, None))
+            try:
+                await _load_batch(connection, batch, stats)
+            except BaseException:
+                next_batch.cancel()
+                raise
+            if on_batch is not None:
+                on_batch(stats)
+            batch = await next_batch
+    return stats
+
+
+def parse_only(paths: Iterable[str], batch_size: int = INGEST_BATCH_SIZE, on_batch=None) -> IngestStats:
+    """Только чтение и нормализация без базы - проверить выгрузку и скорость разбора"""
+    stats = IngestStats()
+    for _ in batches(iter_rows(paths, stats), batch_size):
+        if on_batch is not None:
+            on_batch(stats)
+    return stats
@@ -0,0 +1,212 @@
+# app/vacancy_jobs.py - фоновая очередь анализа вакансий на таблице user_vacancy_requests
+import asyncio
+import os
+from datetime import timedelta
+from typing import List, Optional, Set
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+import vacancy_analysis
+from database import AsyncSessionLocal
+
+# Одновременно обрабатываемых задач в одном процессе-обработчике
+VACANCY_JOB_CONCURRENCY = int(os.getenv("VACANCY_JOB_CONCURRENCY", "4"))
+# Как часто пустая очередь проверяется на новые задачи (и как часто long-poll смотрит статус)
+VACANCY_JOB_POLL_INTERVAL = float(os.getenv("VACANCY_JOB_POLL_INTERVAL", "1"))
+# Сколько секунд может идти один анализ
+VACANCY_JOB_TIMEOUT = float(os.getenv("VACANCY_JOB_TIMEOUT", "120"))
+# Задача в processing дольше этого считается брошенной (обработчик упал) и берется снова
+VACANCY_JOB_STALE_SECONDS = int(os.getenv("VACANCY_JOB_STALE_SECONDS", "300"))
+VACANCY_JOB_MAX_ATTEMPTS = int(os.getenv("VACANCY_JOB_MAX_ATTEMPTS", "3"))
+
+PENDING = "pending"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+FINISHED_STATUSES = (COMPLETED, FAILED)
+
+Job = models.UserVacancyRequest
+
+
+def serialize_job(job: models.UserVacancyRequest) -> dict:
+    return {
+        "id": str(job.id),
+        "status": job.status,
+        "vacancy_title": job.vacancy_title,
+        "vacancy_links": job.vacancy_links,
+        "user_level": job.user_level,
+        "ranking": job.ranking,
+        "attempts": job.attempts,
+        "analysis_result": job.analysis_result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "processed_at": job.processed_at.isoformat() if job.processed_at else None,
+    }
+
+
+async def enqueue(
+    db: AsyncSession,
+    user_id,
+    title: str,
+    links: List[str],
+    level: Optional[str] = "junior",
+    ranking: str = "keywords"
+) -> models.UserVacancyRequest:
+    """Поставить анализ в очередь; результат запишет обработчик"""
+    job = Job(
+        user_id=user_id,
+        vacancy_title=title.strip(),
+        vacancy_links=links,
+        user_level=level,
+        ranking=ranking,
+        status=PENDING,
+        attempts=0,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def claim(db: AsyncSession, limit: int) -> list:
+    """
+    Взять до limit задач: новые и брошенные (processing дольше VACANCY_JOB_STALE_SECONDS).
+    FOR UPDATE SKIP LOCKED - несколько обработчиков разбирают очередь без блокировок
+    друг друга и не берут одну задачу дважды. Транзакция короткая: сам анализ идет уже
+    после commit, строка не остается заблокированной.
+    """
+    stale_before = func.now() - timedelta(seconds=VACANCY_JOB_STALE_SECONDS)
+
+    # Брошенные задачи, исчерпавшие попытки, больше не берем
+    await db.execute(
+        update(Job)
+        .where(
+            Job.status == PROCESSING,
+            Job.started_at < stale_before,
+            Job.attempts >= VACANCY_JOB_MAX_ATTEMPTS,
+        )
+        .values(status=FAILED, error="Превышено время обработки", processed_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+    candidates = (
+        select(Job.id)
+        .where(or_(
+            Job.status == PENDING,
+            and_(Job.status == PROCESSING, Job.started_at < stale_before),
+        ))
+        .order_by(Job.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(Job)
+        .where(Job.id.in_(candidates.scalar_subquery()))
+        .values(status=PROCESSING, started_at=func.now(), attempts=Job.attempts + 1)
+        .returning(Job.id, Job.vacancy_title, Job.vacancy_links, Job.user_level, Job.ranking, Job.attempts)
+        .execution_options(synchronize_session=False)
+    )
+    jobs = result.all()
+    await db.commit()
+    return jobs
+
+
+async def _finish(db: AsyncSession, job, **values):
+    # attempts - признак владения: если задачу уже забрал другой обработчик
+    # как брошенную, наш результат не перезаписывает его работу
+    await db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == PROCESSING, Job.attempts == job.attempts)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def process(job):
+    """Выполнить одну взятую задачу и записать результат или ошибку"""
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await asyncio.wait_for(
+                vacancy_analysis.analyze_vacancy(db, job.vacancy_title, job.vacancy_links, job.user_level, job.ranking),
+                timeout=VACANCY_JOB_TIMEOUT,
+            )
+    except HTTPException as e:
+        # Ошибка во входных данных - повтор не поможет
+        values = dict(status=FAILED, error=str(e.detail), processed_at=func.now())
+    except Exception as e:
+        retry = job.attempts < VACANCY_JOB_MAX_ATTEMPTS
+        values = dict(
+            status=PENDING if retry else FAILED,
+            error=f"{type(e).__name__}: {e}",
+            processed_at=None if retry else func.now(),
+        )
+    else:
+        values = dict(
+            status=COMPLETED,
+            analysis_result=jsonable_encoder(result),
+            error=None,
+            processed_at=func.now(),
+        )
+
+    # Итог пишется в новой сессии: после отмены по таймауту посреди запроса
+    # соединение анализа непригодно, и задача иначе висела бы в processing
+    async with AsyncSessionLocal() as db:
+        await _finish(db, job, **values)
+
+
+class VacancyJobWorker:
+    """
+    Обработчик очереди: до concurrency задач одновременно (asyncio-задачи).
+    Запускается отдельным процессом (vacancy_worker.py) - пропускная способность
+    растет добавлением процессов, HTTP-воркеры анализом не заняты.
+    """
+
+    def __init__(self, concurrency: int = VACANCY_JOB_CONCURRENCY, poll_interval: float = VACANCY_JOB_POLL_INTERVAL):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.processed = 0
+        self._stop = asyncio.Event()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def stop(self):
+        self._stop.set()
+
+    def _done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        self.processed += 1
+        if not task.cancelled() and task.exception() is not None:
+            print(f"❌ Ошибка обработки задачи: {task.exception()}")
+
+    async def _idle(self):
+        """Ждать освобождения слота, новых задач (poll_interval) или остановки"""
+        stop_waiter = asyncio.ensure_future(self._stop.wait())
+        await asyncio.wait([stop_waiter, *self._tasks], timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+        stop_waiter.cancel()
+
+    async def run(self):
+        while not self._stop.is_set():
+            free = self.concurrency - len(self._tasks)
+            jobs = []
+            if free > 0:
+                try:
+                    async with AsyncSessionLocal() as db:
+                        jobs = await claim(db, free)
+                except Exception as e:
+                    print(f"❌ Не удалось получить задачи из очереди: {e}")
+
+            for job in jobs:
+                task = asyncio.create_task(process(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._done)
+
+            # Очередь не пуста и слоты есть - сразу берем следующие задачи
+            if not jobs or len(self._tasks) >= self.concurrency:
+                await self._idle()
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Обработчик очереди анализа вакансий (user_vacancy_requests).
+
+Запуск (из каталога app); процессов можно запускать сколько угодно -
+задачи распределяются через SELECT ... FOR UPDATE SKIP LOCKED:
+    python vacancy_worker.py
+    VACANCY_JOB_CONCURRENCY=8 python vacancy_worker.py
+"""
+
+import asyncio
+import signal
+
+from vacancy_jobs import VACANCY_JOB_CONCURRENCY, VacancyJobWorker
+
+
+async def main():
+    worker = VacancyJobWorker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Новые задачи не берем, начатые доводим до конца
+        loop.add_signal_handler(sig, worker.stop)
+
+    print(f"👷 Обработчик очереди анализа вакансий запущен (одновременно задач: {VACANCY_JOB_CONCURRENCY})")
+    await worker.run()
+    print(f"✅ Обработчик остановлен, выполнено задач: {worker.processed}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())